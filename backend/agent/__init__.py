@@ -2,4 +2,11 @@
 Fourthbranch package initialization
 """
 
-from .run import topic_generator
+
+
+def __getattr__(name):
+    # Imported on first use: run pulls in LangGraph, the model clients and every search SDK
+    if name == "topic_generator":
+        from .run import topic_generator
+        return topic_generator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,333 @@
+"""
+Record/replay cassettes for LLM and search calls.
+
+Every report run picks different topics, plans and sources, so pipeline changes
+cannot be compared on identical inputs. With CASSETTE_MODE=record, every chat
+model call, search API call and wrapped tool call of a real run is appended to
+CASSETTE_PATH (gzipped JSON lines) with its latency. With CASSETTE_MODE=replay
+the recorded responses are served back after their recorded latency, or at once
+with CASSETTE_MODE=replay_fast, so the run can be repeated offline.
+
+Chat model calls go through LangChain's global LLM cache (set_llm_cache), so any
+model is covered without changes to the graph. Searches are recorded per query by
+execute_search, and tools such as the topic agent's Tavily search by wrap_tool.
+
+Calls are matched by their exact request first. A replayed run whose config
+differs from the recording (e.g. more queries, a different depth) makes requests
+that were never recorded; those get the recorded response whose request shares
+the most words with it, among calls to the same target: the same model with the
+same bound tools and output schema, the same search API or the same tool. So config
+changes can be compared on the same data, and a structured output call is never
+answered with another schema's response. Identical requests are served in recorded
+order.
+
+Recorded calls are written to the file by a background thread, in batches, so the
+event loop never waits on compression or disk I/O.
+"""
+
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+from langchain_core.tools import BaseTool, StructuredTool
+
+CASSETTE_MODES = ("off", "record", "replay", "replay_fast")
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassette.jsonl.gz")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _request_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+
+def _llm_target(llm_string: str) -> str:
+    # llm_string serializes the model and its call parameters, bound tools and output schema included
+    return hashlib.sha256(llm_string.encode()).hexdigest()
+
+
+class Cassette:
+    """Recorded calls, loaded from and appended to a gzipped JSON lines file.
+
+    Args:
+        path: The cassette file
+        mode: One of CASSETTE_MODES other than "off"
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in CASSETTE_MODES or mode == "off":
+            raise ValueError(f"Unknown cassette mode: {mode}. Expected one of record, replay, replay_fast")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_target: Dict[tuple, List[Dict[str, Any]]] = {}
+        self._replayed: Dict[str, int] = {}
+        self._pending: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        if self.replaying:
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode in ("replay", "replay_fast")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}. Record one with CASSETTE_MODE=record")
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                entry["words"] = _words(entry["request"])
+                self._entries.setdefault(entry["key"], []).append(entry)
+                self._by_target.setdefault((entry["kind"], entry.get("target")), []).append(entry)
+
+    def record(self, kind: str, target: str, key: str, request: str, response: Any, latency: float) -> None:
+        """Queues a call to be appended to the cassette file by the writer thread."""
+        line = json.dumps({"kind": kind, "target": target, "key": key, "request": request,
+                           "latency": round(latency, 4), "response": response}, default=str)
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name="cassette-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+        self._pending.put(line)
+
+    def _write_pending(self) -> None:
+        while True:
+            lines = [self._pending.get()]
+            while not self._pending.empty():
+                lines.append(self._pending.get_nowait())
+            done = None in lines
+            lines = [line for line in lines if line is not None]
+            if lines:
+                # Each batch is its own gzip member, so a crashed run keeps what it recorded
+                with gzip.open(self.path, "at", encoding="utf-8") as f:
+                    f.write("".join(line + "\n" for line in lines))
+            if done:
+                return
+
+    def close(self) -> None:
+        """Writes out the calls still queued; called at exit."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._pending.put(None)
+            writer.join()
+
+    def lookup(self, kind: str, target: str, key: str, request: str) -> Optional[Dict[str, Any]]:
+        """
+        Finds the recorded call to replay for a request.
+
+        Args:
+            kind: "llm", "search" or "tool"
+            target: What was called: the model's llm_string, the search API or the tool name
+            key: Hash of the exact request
+            request: The request's text, for nearest-match lookup
+
+        Returns:
+            Optional[Dict[str, Any]]: The recorded entry, or None if nothing was recorded for the target
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries:
+                # Identical requests are served in recorded order, the last one repeating
+                index = self._replayed.get(key, 0)
+                self._replayed[key] = index + 1
+                return entries[min(index, len(entries) - 1)]
+
+        # Never fall back to another target: its response may not parse as this call's output
+        candidates = self._by_target.get((kind, target))
+        if not candidates:
+            return None
+        words = _words(request)
+        return max(candidates, key=lambda entry: len(words & entry["words"]) / (len(words | entry["words"]) or 1))
+
+    async def delay(self, entry: Dict[str, Any]) -> None:
+        """Waits out a recorded call's latency, unless replaying fast."""
+        if self.mode == "replay" and entry["latency"]:
+            await asyncio.sleep(entry["latency"])
+
+    async def search(self, search_api: str, query_list: List[str], params: Dict[str, Any],
+                     run: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """
+        Records or replays a search call, per query.
+
+        Args:
+            search_api: The search API
+            query_list: The queries
+            params: The search parameters, part of the exact-match key
+            run: Makes the real call
+
+        Returns:
+            List[Dict[str, Any]]: One search response per query
+        """
+        if self.replaying:
+            entries = [self.lookup("search", search_api, _request_key(search_api, query, params), query)
+                       for query in query_list]
+            if all(entries):
+                # The queries ran concurrently, so the call took as long as the slowest
+                await self.delay(max(entries, key=lambda entry: entry["latency"]))
+                return [{**entry["response"], "query": query} for entry, query in zip(entries, query_list)]
+            print(f"Warning: No {search_api} search recorded in {self.path}, searching live")
+
+        started_at = time.perf_counter()
+        responses = await run()
+        if self.recording and len(responses) == len(query_list):
+            latency = time.perf_counter() - started_at
+            for query, response in zip(query_list, responses):
+                self.record("search", search_api, _request_key(search_api, query, params), query, response, latency)
+        return responses
+
+
+class CassetteLLMCache(BaseCache):
+    """LLM cache that records chat model responses to a cassette, or serves them from it."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self._lock = threading.Lock()
+        self._started: Dict[str, deque] = {}
+
+    def _replay_entry(self, prompt: str, llm_string: str) -> Optional[Dict[str, Any]]:
+        entry = self.cassette.lookup("llm", _llm_target(llm_string), _request_key(prompt, llm_string), prompt)
+        if entry is None:
+            print(f"Warning: No LLM call recorded in {self.cassette.path}, calling the model")
+        return entry
+
+    def _start_recording(self, prompt: str, llm_string: str) -> None:
+        # A miss is followed by the real call and update(); time it from here
+        with self._lock:
+            self._started.setdefault(_request_key(prompt, llm_string), deque()).append(time.perf_counter())
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if self.cassette.recording:
+            self._start_recording(prompt, llm_string)
+            return None
+        entry = self._replay_entry(prompt, llm_string)
+        if entry is None:
+            return None
+        if self.cassette.mode == "replay" and entry["latency"]:
+            time.sleep(entry["latency"])
+        return [loads(generation) for generation in entry["response"]]
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if self.cassette.recording:
+            self._start_recording(prompt, llm_string)
+            return None
+        entry = self._replay_entry(prompt, llm_string)
+        if entry is None:
+            return None
+        await self.cassette.delay(entry)
+        return [loads(generation) for generation in entry["response"]]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if not self.cassette.recording:
+            return
+        key = _request_key(prompt, llm_string)
+        with self._lock:
+            starts = self._started.get(key)
+            started_at = starts.popleft() if starts else time.perf_counter()
+            if starts is not None and not starts:
+                del self._started[key]
+        self.cassette.record("llm", _llm_target(llm_string), key, prompt,
+                             [dumps(generation) for generation in return_val], time.perf_counter() - started_at)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._started.clear()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Returns the cassette configured by CASSETTE_MODE and CASSETTE_PATH, or None when off."""
+    global _cassette
+    if CASSETTE_MODE == "off":
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+    return _cassette
+
+
+_installed = False
+
+
+def install_cassette() -> None:
+    """Routes every chat model call through the cassette, if one is configured. Safe to call repeatedly."""
+    global _installed
+    cassette = get_cassette()
+    if cassette is None:
+        return
+    with _cassette_lock:
+        if _installed:
+            return
+        _installed = True
+    print(f"Cassette {cassette.mode}: {cassette.path}")
+    set_llm_cache(CassetteLLMCache(cassette))
+
+
+def wrap_tool(tool: BaseTool) -> BaseTool:
+    """
+    Returns a tool whose calls are recorded to or replayed from the cassette.
+
+    Args:
+        tool: The tool to wrap, e.g. the topic agent's TavilySearchResults
+
+    Returns:
+        BaseTool: The tool itself when no cassette is configured, otherwise a tool with
+            the same name, description and arguments going through the cassette
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return tool
+
+    async def call(**kwargs: Any) -> Any:
+        request = json.dumps(kwargs, sort_keys=True, default=str)
+        key = _request_key(tool.name, request)
+        if cassette.replaying:
+            entry = cassette.lookup("tool", tool.name, key, request)
+            if entry is not None:
+                await cassette.delay(entry)
+                return entry["response"]
+            print(f"Warning: No {tool.name} call recorded in {cassette.path}, calling the tool")
+
+        started_at = time.perf_counter()
+        response = await tool.ainvoke(kwargs)
+        if cassette.recording:
+            cassette.record("tool", tool.name, key, request, response, time.perf_counter() - started_at)
+        return response
+
+    def call_sync(**kwargs: Any) -> Any:
+        return asyncio.run(call(**kwargs))
+
+    return StructuredTool.from_function(func=call_sync, coroutine=call, name=tool.name,
+                                        description=tool.description, args_schema=tool.args_schema)
@@ -0,0 +1,162 @@
+"""
+Per-provider circuit breakers for search APIs.
+
+When a provider degrades, every section of every concurrent report used to wait out
+its own timeout or error. Each provider now has a breaker over its most recent calls:
+once enough of them fail (errors or timeouts) or are slow, the breaker opens and
+select_and_execute_search skips the provider, going straight to the next one in the
+fallback list. After OPEN_SECONDS a single probe call is let through (half-open); it
+closes the breaker on success and reopens it on failure.
+
+allow_request() hands out a ticket that the call passes back with its outcome, so
+that only the probe's own outcome (or abandonment) decides a half-open breaker.
+
+Breakers are process-wide and thread-safe, like the rate limiters, since reports
+run on the server loop and in worker threads.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+WINDOW_SIZE = 20  # Recent calls considered
+MIN_CALLS = 5  # Calls needed in the window before the breaker can open
+FAILURE_RATE_THRESHOLD = 0.5
+SLOW_CALL_SECONDS = 30.0
+SLOW_CALL_RATE_THRESHOLD = 0.8
+OPEN_SECONDS = 30.0  # Time an open breaker waits before probing
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Ticket of calls let through while the breaker is closed; probes get increasing tickets
+CLOSED_TICKET = 0
+
+
+class CircuitBreaker:
+    """Breaker over a sliding window of call outcomes.
+
+    Args:
+        name: Provider name, used in logs
+        window_size: Number of recent calls considered
+        min_calls: Calls needed in the window before the breaker can open
+        failure_rate_threshold: Fraction of failed calls that opens the breaker
+        slow_call_seconds: Calls taking longer than this count as slow
+        slow_call_rate_threshold: Fraction of slow calls that opens the breaker
+        open_seconds: Seconds an open breaker rejects calls before letting a probe through
+    """
+
+    def __init__(self, name: str, window_size: int = WINDOW_SIZE, min_calls: int = MIN_CALLS,
+                 failure_rate_threshold: float = FAILURE_RATE_THRESHOLD,
+                 slow_call_seconds: float = SLOW_CALL_SECONDS,
+                 slow_call_rate_threshold: float = SLOW_CALL_RATE_THRESHOLD,
+                 open_seconds: float = OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window_size)  # (failed, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_ticket: Optional[int] = None  # Ticket of the half-open probe in flight
+        self._last_ticket = CLOSED_TICKET
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> Optional[int]:
+        """
+        Admits a call to the provider; half-open breakers admit one probe at a time.
+
+        Returns:
+            Optional[int]: The call's ticket, to pass to record_success, record_failure
+                or release, or None if the call must not go to the provider
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return None
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probe_ticket is not None:
+                    return None
+                self._last_ticket += 1
+                self._probe_ticket = self._last_ticket
+                return self._probe_ticket
+            return CLOSED_TICKET
+
+    def record_success(self, ticket: int, seconds: float) -> None:
+        """Records a call that completed, and how long it took."""
+        self._record(ticket, failed=False, slow=seconds > self.slow_call_seconds)
+
+    def record_failure(self, ticket: int) -> None:
+        """Records a call that raised or timed out."""
+        self._record(ticket, failed=True, slow=False)
+
+    def release(self, ticket: int) -> None:
+        """Records a call abandoned before completing (e.g. cancelled), without counting it."""
+        with self._lock:
+            if ticket == self._probe_ticket:
+                self._probe_ticket = None
+
+    def _record(self, ticket: int, failed: bool, slow: bool) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                # Calls admitted before the breaker opened do not decide the probe
+                if ticket != self._probe_ticket:
+                    return
+                self._probe_ticket = None
+                if failed or slow:
+                    self._open()
+                else:
+                    print(f"Circuit for {self.name} search closed after a successful probe")
+                    self._state = CLOSED
+                    self._calls.clear()
+                return
+            if self._state == OPEN:
+                return
+
+            self._calls.append((failed, slow))
+            if len(self._calls) >= self.min_calls:
+                failure_rate = sum(f for f, _ in self._calls) / len(self._calls)
+                slow_rate = sum(s for _, s in self._calls) / len(self._calls)
+                if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                    self._open()
+
+    def _open(self) -> None:
+        print(f"Warning: Circuit for {self.name} search opened; skipping it for {self.open_seconds}s")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.times_opened += 1
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Returns the process-wide circuit breaker for a search provider."""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def get_circuit_states() -> Dict[str, Any]:
+    """Returns the state of every provider's breaker for the metrics endpoint."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: {"state": breaker.state, "times_opened": breaker.times_opened}
+            for name, breaker in breakers.items()}
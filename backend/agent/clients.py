@@ -0,0 +1,178 @@
+"""
+Process-wide registry of long-lived search provider clients.
+
+Search calls used to build a fresh SDK client, HTTP session or thread pool on every
+call, paying the TLS handshake and pool warm-up each time. Clients here are created
+lazily on first use and reused until shutdown.
+
+Async clients (httpx, aiohttp) are bound to the event loop they were created on, so
+they are cached per loop: the API server shares one set on its loop, while each
+generate_report() run under asyncio.run() gets its own and closes it with
+close_loop_clients() before the loop ends. Thread-safe, loop-agnostic clients (the
+Exa SDK, the scraping thread pool) are shared by the whole process.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict
+
+import httpx
+
+TAVILY_API_URL = "https://api.tavily.com"
+
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+_shared_clients: Dict[str, Any] = {}
+_shared_lock = threading.Lock()
+# Options each named httpx client was created with, to catch conflicting registrations
+_http_client_options: Dict[str, Dict[str, Any]] = {}
+
+
+def loop_client(name: str, factory: Callable[[], Any]) -> Any:
+    """Returns the object registered under name for the running loop, creating it with factory."""
+    loop = asyncio.get_running_loop()
+    clients = _loop_clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None or getattr(client, "is_closed", False) or getattr(client, "closed", False):
+        client = clients[name] = factory()
+    return client
+
+
+def shared_client(name: str, factory: Callable[[], Any]) -> Any:
+    """Returns the process-wide object registered under name, creating it with factory."""
+    with _shared_lock:
+        client = _shared_clients.get(name)
+        if client is None:
+            client = _shared_clients[name] = factory()
+        return client
+
+
+def get_http_client(name: str = "default", **kwargs) -> httpx.AsyncClient:
+    """
+    Returns the pooled httpx client registered under name for the running loop.
+
+    Args:
+        name: Registry key; use one name per distinct client configuration
+        **kwargs: httpx.AsyncClient options; every caller of a name must pass the same ones
+
+    Returns:
+        httpx.AsyncClient: A keep-alive client
+
+    Raises:
+        ValueError: If name is already registered with different options
+    """
+    kwargs.setdefault("limits", httpx.Limits(max_connections=100, max_keepalive_connections=20,
+                                             keepalive_expiry=60.0))
+    with _shared_lock:
+        options = _http_client_options.setdefault(name, kwargs)
+    if options != kwargs:
+        raise ValueError(f"HTTP client {name} is already registered with different options; "
+                         f"use another name for this configuration")
+    return loop_client(f"httpx:{name}", lambda: httpx.AsyncClient(**kwargs))
+
+
+def _tavily_api_key() -> str:
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        raise ValueError("TAVILY_API_KEY is not set")
+    return api_key
+
+
+class TavilyAuth(httpx.Auth):
+    """Bearer auth read from TAVILY_API_KEY on every request, so a rotated key applies at once."""
+
+    def auth_flow(self, request: httpx.Request):
+        request.headers["Authorization"] = f"Bearer {_tavily_api_key()}"
+        yield request
+
+
+# One instance, so that every caller registers the tavily client with equal options
+_tavily_auth = TavilyAuth()
+
+
+def get_tavily_client() -> httpx.AsyncClient:
+    """
+    Pooled client for the Tavily REST API.
+
+    The API key is kept out of the client's options and attached per request.
+
+    Raises:
+        ValueError: If TAVILY_API_KEY is not set
+    """
+    _tavily_api_key()
+    return get_http_client(
+        "tavily",
+        base_url=TAVILY_API_URL,
+        headers={"Content-Type": "application/json"},
+        auth=_tavily_auth,
+        timeout=180.0,
+    )
+
+
+def get_aiohttp_session():
+    """Shared aiohttp session for the running loop."""
+    import aiohttp
+
+    return loop_client("aiohttp", aiohttp.ClientSession)
+
+
+def get_exa_client():
+    """Shared Exa SDK client (synchronous, safe to use from executor threads)."""
+    from exa_py import Exa
+
+    return shared_client("exa", lambda: Exa(api_key=f"{os.getenv('EXA_API_KEY')}"))
+
+
+def get_linkup_client():
+    """Shared Linkup SDK client."""
+    from linkup import LinkupClient
+
+    return shared_client("linkup", LinkupClient)
+
+
+def get_scraping_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Shared thread pool for blocking scraping calls (Google result pages)."""
+    return shared_client("scraping_executor", lambda: concurrent.futures.ThreadPoolExecutor(
+        max_workers=5, thread_name_prefix="scraping"))
+
+
+async def _close(client: Any) -> None:
+    close = getattr(client, "aclose", None) or getattr(client, "close", None)
+    if close is None:
+        return
+    result = close()
+    if asyncio.iscoroutine(result):
+        await result
+
+
+async def close_loop_clients() -> None:
+    """Closes the async clients created on the running loop."""
+    clients = _loop_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            await _close(client)
+        except Exception as e:
+            print(f"Warning: Failed to close client {client!r}: {str(e)}")
+
+
+async def close_clients() -> None:
+    """Closes the running loop's async clients and every process-wide client.
+
+    Called from the FastAPI lifespan on shutdown.
+    """
+    await close_loop_clients()
+
+    with _shared_lock:
+        shared = list(_shared_clients.values())
+        _shared_clients.clear()
+
+    for client in shared:
+        if isinstance(client, concurrent.futures.Executor):
+            client.shutdown(wait=False)
+            continue
+        try:
+            await _close(client)
+        except Exception as e:
+            print(f"Warning: Failed to close client {client!r}: {str(e)}")
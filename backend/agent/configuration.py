@@ -1,7 +1,7 @@
 import os
 from enum import Enum
 from dataclasses import dataclass, fields
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
@@ -19,6 +19,16 @@ DEFAULT_REPORT_STRUCTURE = """Use this structure to create a report on the user-
    - Aim for 1 structural element (either a list of table) that distills the main body sections
    - Provide a concise summary of the report"""
 
+# How full page content is retrieved, per search API:
+#   "eager" - with every result, as part of the search call
+#   "lazy"  - snippets and scores first, then full content only for the top_k results
+#             per query scoring at least min_score (Google has no scores: top_k by rank)
+#   "off"   - snippets only
+DEFAULT_RAW_CONTENT_POLICY = {
+    "tavily": {"mode": "lazy", "top_k": 3, "min_score": None},
+    "googlesearch": {"mode": "lazy", "top_k": 3},
+}
+
 class SearchAPI(Enum):
     PERPLEXITY = "perplexity"
     TAVILY = "tavily"
@@ -48,6 +58,14 @@ class Configuration:
     writer_model_kwargs: Optional[Dict[str, Any]] = None # kwargs for writer_model
     search_api: SearchAPI = SearchAPI.TAVILY # Default to TAVILY
     search_api_config: Optional[Dict[str, Any]] = None
+    raw_content_policy: Optional[Dict[str, Dict[str, Any]]] = None # Per search API, overrides DEFAULT_RAW_CONTENT_POLICY
+    hedge_search_api: Optional[SearchAPI] = None # Secondary search API raced against search_api when it is slow
+    hedge_delay: Optional[float] = None # Seconds before hedging; defaults to search_api's rolling p90 latency
+    search_api_fallbacks: Optional[List[SearchAPI]] = None # Tried in order when search_api fails or its circuit is open
+    auto_approve_plan: bool = False # Start section research right after planning, skipping the human_feedback interrupt
+    reuse_planning_search: bool = True # Let sections covered by the planning search write before searching
+    planning_search_min_coverage: float = 0.6 # Fraction of a section's keywords the planning search must contain
+    grading_policy: str = "budget_aware" # When write_section runs the grader: always, never, budget_aware or heuristic_first
 
     # Multi-agent specific configuration
     supervisor_model: str = "openai:gpt-4.1" # Model for supervisor agent in multi-agent setup
@@ -66,4 +84,5 @@ class Configuration:
             for f in fields(cls)
             if f.init
         }
-        return cls(**{k: v for k, v in values.items() if v})
+        # Drop unset values only, so False and 0 can override defaults
+        return cls(**{k: v for k, v in values.items() if v is not None and v != ""})
@@ -0,0 +1,183 @@
+"""
+Content-level near-duplicate detection for search results.
+
+Wire stories (AP, Reuters, ...) are republished verbatim by dozens of outlets, so
+URL-level deduplication lets the same article into a prompt many times. Each
+source gets a 64-bit SimHash over word shingles of its text; sources whose
+signatures differ in at most a few bits are treated as copies and collapse to the
+highest-scoring one.
+
+Pages from the same outlet share navigation, footers and other template text, which
+would pull the signatures of different articles together. Before signing, lines
+that recur across several sources of the same host are stripped; a page made only
+of such lines is a copy of another page of its host and keeps its full text.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+# Only the beginning of a page (after stripping shared boilerplate) is signed;
+# syndicated copies diverge (if at all) in the trailing boilerplate, and this bounds
+# the cost on very long pages.
+MAX_SIGNED_CHARS = 20_000
+# Texts shorter than this many shingles (search snippets, error notes) are too short
+# for a stable signature and are never merged.
+MIN_SHINGLES = 40
+DEFAULT_MAX_HAMMING_DISTANCE = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    Computes the 64-bit SimHash of a text over word shingles.
+
+    Args:
+        text: The text to sign
+
+    Returns:
+        Optional[int]: The signature, or None if the text is too short to sign reliably
+    """
+    return _simhash_prefix(text[:MAX_SIGNED_CHARS])
+
+
+# Keyed on the signed prefix so a source seen by several sections is only signed once
+# without the cache pinning whole pages in memory.
+@lru_cache(maxsize=512)
+def _simhash_prefix(text: str) -> Optional[int]:
+    words = _WORD_RE.findall(text.lower())
+    num_shingles = len(words) - SHINGLE_SIZE + 1
+    if num_shingles < MIN_SHINGLES:
+        return None
+
+    # Count set bits per position column-wise over the binary renderings; this keeps
+    # the per-shingle work in C instead of a 64-step Python loop.
+    rows = [format(_shingle_hash(" ".join(words[i:i + SHINGLE_SIZE])), "064b")
+            for i in range(num_shingles)]
+    threshold = num_shingles / 2
+    signature = 0
+    for position, column in enumerate(zip(*rows)):
+        if column.count("1") > threshold:
+            signature |= 1 << (SIMHASH_BITS - 1 - position)
+    return signature
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two signatures."""
+    return bin(a ^ b).count("1")
+
+
+def _source_text(source: Dict[str, Any]) -> str:
+    return source.get('raw_content') or source.get('content') or ""
+
+
+def _host(url: Optional[str]) -> Optional[str]:
+    host = (urlsplit(url or "").hostname or "").lower()
+    return host.removeprefix("www.") or None
+
+
+def strip_shared_boilerplate(texts: List[str], hosts: List[Optional[str]]) -> List[str]:
+    """
+    Removes lines that recur across texts from the same host (navigation, footers, ...).
+
+    Args:
+        texts: Page texts
+        hosts: Host of each text; texts without a host are left as they are
+
+    Returns:
+        List[str]: The texts without shared lines; a text made only of lines shared with
+            other pages of its host is returned unchanged
+    """
+    page_lines = [[line.strip() for line in text.splitlines()] for text in texts]
+    counts: Dict[tuple, int] = {}
+    for host, lines in zip(hosts, page_lines):
+        if host is not None:
+            for line in set(lines):
+                if line:
+                    counts[(host, line)] = counts.get((host, line), 0) + 1
+
+    stripped = []
+    for text, host, lines in zip(texts, hosts, page_lines):
+        body = [line for line in lines if line and counts.get((host, line), 0) < 2]
+        # Nothing of its own: the same article as another page of the host
+        stripped.append("\n".join(body) if body else text)
+    return stripped
+
+
+def collapse_near_duplicates(sources: List[Dict[str, Any]],
+                             max_distance: int = DEFAULT_MAX_HAMMING_DISTANCE) -> List[Dict[str, Any]]:
+    """
+    Collapses near-duplicate sources to their highest-scoring representative.
+
+    Signatures are split into max_distance + 1 bands. Two signatures within
+    max_distance bits of each other must agree exactly on at least one band, so only
+    sources sharing a band are compared.
+
+    Args:
+        sources: Search result dicts (title, url, content, score, raw_content)
+        max_distance: Maximum Hamming distance between signatures of duplicates
+
+    Returns:
+        List[dict]: One source per cluster, in order of each cluster's first appearance.
+            Representatives that absorbed copies get a 'duplicate_urls' list.
+    """
+    band_bits = SIMHASH_BITS // (max_distance + 1)
+    band_mask = (1 << band_bits) - 1
+
+    # Highest score first so each cluster is founded by its best member; unscored
+    # results (e.g. Google) keep their original order behind scored ones.
+    ranked = sorted(range(len(sources)),
+                    key=lambda i: (-(sources[i].get('score') or 0.0), i))
+
+    texts = strip_shared_boilerplate([_source_text(source) for source in sources],
+                                     [_host(source.get('url')) for source in sources])
+    signatures = [simhash(text) for text in texts]
+    buckets: Dict[tuple, List[int]] = {}
+    cluster_of: Dict[int, int] = {}  # source index -> representative index
+
+    for i in ranked:
+        signature = signatures[i]
+        if signature is None:
+            cluster_of[i] = i
+            continue
+
+        bands = [(band, signature >> (band * band_bits) & band_mask)
+                 for band in range(max_distance + 1)]
+        representative = None
+        for key in bands:
+            for candidate in buckets.get(key, ()):
+                if hamming_distance(signature, signatures[candidate]) <= max_distance:
+                    representative = candidate
+                    break
+            if representative is not None:
+                break
+
+        if representative is None:
+            cluster_of[i] = i
+            for key in bands:
+                buckets.setdefault(key, []).append(i)
+        else:
+            cluster_of[i] = representative
+
+    members: Dict[int, List[int]] = {}
+    for i in range(len(sources)):
+        members.setdefault(cluster_of[i], []).append(i)
+
+    collapsed = []
+    for representative, indices in sorted(members.items(), key=lambda item: min(item[1])):
+        source = sources[representative]
+        duplicates = [sources[i]['url'] for i in indices if i != representative]
+        if duplicates:
+            source = {**source, 'duplicate_urls': duplicates}
+        collapsed.append(source)
+
+    return collapsed
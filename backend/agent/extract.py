@@ -0,0 +1,104 @@
+"""
+HTML-to-text and HTML-to-markdown extraction off the event loop.
+
+Parsing a large news page takes tens of milliseconds of pure CPU; done on the
+event loop it stalls every other concurrent section and SSE stream. Extraction
+runs in a bounded process pool instead, with lxml as the parser (selectolax is
+used for plain text when installed) and page boilerplate stripped first.
+
+Set EXTRACTION_WORKERS=0 to extract in a thread instead, e.g. on hosts where
+worker processes are not available.
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import re
+
+from backend.agent.clients import shared_client
+
+# Elements that never carry article text
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe",
+                    "nav", "header", "footer", "aside", "form"]
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", min(4, os.cpu_count() or 1)))
+
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+def _soup(html: str):
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        soup = BeautifulSoup(html, "lxml")
+    except FeatureNotFound:
+        # lxml not installed
+        soup = BeautifulSoup(html, "html.parser")
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+    return soup
+
+
+def html_to_text(html: str) -> str:
+    """
+    Extracts the readable text of an HTML page, without boilerplate.
+
+    Args:
+        html: The page's HTML
+
+    Returns:
+        str: Text content with runs of blank lines collapsed
+    """
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        text = _soup(html).get_text("\n")
+    else:
+        tree = HTMLParser(html)
+        tree.strip_tags(BOILERPLATE_TAGS)
+        root = tree.body or tree.root
+        text = root.text(separator="\n") if root is not None else ""
+
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def html_to_markdown(html: str) -> str:
+    """
+    Converts an HTML page to markdown, without boilerplate.
+
+    Args:
+        html: The page's HTML
+
+    Returns:
+        str: Markdown content
+    """
+    from markdownify import MarkdownConverter
+
+    return MarkdownConverter().convert_soup(_soup(html))
+
+
+def get_extraction_executor() -> concurrent.futures.Executor:
+    """Shared process pool for extraction, closed with the other shared clients."""
+    # Forking the multithreaded server could copy locks held by other threads into the
+    # workers and deadlock them, so workers are started from a clean process instead
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return shared_client("extraction_executor", lambda: concurrent.futures.ProcessPoolExecutor(
+        max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context(start_method)))
+
+
+async def _run_extraction(fn, html: str) -> str:
+    if EXTRACTION_WORKERS <= 0:
+        return await asyncio.to_thread(fn, html)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_extraction_executor(), fn, html)
+
+
+async def extract_text(html: str) -> str:
+    """Runs html_to_text in the extraction pool."""
+    return await _run_extraction(html_to_text, html)
+
+
+async def extract_markdown(html: str) -> str:
+    """Runs html_to_markdown in the extraction pool."""
+    return await _run_extraction(html_to_markdown, html)
@@ -0,0 +1,209 @@
+"""
+Concurrent page fetching with per-host politeness.
+
+scrape_pages and Google full-content fetching both go through one FetchScheduler.
+Requests to different hosts run in parallel up to a global ceiling, while each host
+gets its own concurrency limit and a minimum interval between request starts, so a
+batch of URLs takes about as long as its slowest host rather than the sum of all of
+them. The underlying client speaks HTTP/2 when the h2 package is installed, which
+lets requests to the same host share one connection. Per-host state is kept for the
+MAX_TRACKED_HOSTS most recently used hosts; idle hosts beyond that are forgotten.
+
+Bodies are streamed and reading stops at a byte budget: only the first ~16K
+characters of a page survive prompt truncation, so there is no point holding
+multi-MB pages in memory. Binary or oversized responses are rejected from their
+Content-Type / Content-Length before the body is read at all.
+"""
+
+import asyncio
+import importlib.util
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from backend.agent.clients import get_http_client, loop_client
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_PER_HOST_CONCURRENCY = 2
+DEFAULT_PER_HOST_INTERVAL = 0.25  # Seconds between request starts to the same host
+DEFAULT_TIMEOUT = 10.0  # Per connect/read timeout in seconds
+DEFAULT_TOTAL_TIMEOUT = float(os.getenv("FETCH_TOTAL_TIMEOUT", 20.0))
+# Bytes of body read before the download is cut off
+DEFAULT_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 1_000_000))
+# Hosts whose politeness state is kept; idle hosts beyond this are forgotten, least recent first
+MAX_TRACKED_HOSTS = int(os.getenv("FETCH_MAX_TRACKED_HOSTS", 1024))
+# Responses declaring a larger Content-Length are not downloaded at all
+DEFAULT_MAX_CONTENT_LENGTH = int(os.getenv("FETCH_MAX_CONTENT_LENGTH", 10_000_000))
+
+TEXT_CONTENT_TYPES = ("text/", "application/xhtml+xml", "application/xml", "application/json",
+                      "application/ld+json", "application/rss+xml", "application/atom+xml")
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching a single URL."""
+    url: str
+    status_code: Optional[int] = None
+    content_type: str = ""
+    text: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+    skipped: Optional[str] = None  # Why the body was not downloaded (binary, too large)
+    truncated: bool = False  # Whether reading stopped at the byte budget
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status_code == 200
+
+
+class _HostSlot:
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.next_start = 0.0
+        self.users = 0  # Fetches holding or waiting for the slot
+
+    def idle(self, now: float) -> bool:
+        return self.users == 0 and self.next_start <= now
+
+
+class FetchScheduler:
+    """Schedules page fetches with a global ceiling and per-host limits.
+
+    Args:
+        max_concurrency: Maximum requests in flight across all hosts
+        per_host_concurrency: Maximum requests in flight to a single host
+        per_host_interval: Minimum seconds between request starts to the same host
+        timeout: Connect and per-read timeout in seconds
+        total_timeout: Timeout in seconds for a whole request, body included
+        max_bytes: Bytes of body read before the download is cut off
+        max_content_length: Declared Content-Length above which the body is not downloaded
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 per_host_concurrency: int = DEFAULT_PER_HOST_CONCURRENCY,
+                 per_host_interval: float = DEFAULT_PER_HOST_INTERVAL,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 total_timeout: float = DEFAULT_TOTAL_TIMEOUT,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_content_length: int = DEFAULT_MAX_CONTENT_LENGTH):
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_interval = per_host_interval
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.max_content_length = max_content_length
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._hosts: "OrderedDict[str, _HostSlot]" = OrderedDict()
+
+    def _client(self) -> httpx.AsyncClient:
+        return get_http_client("fetch", follow_redirects=True, http2=HTTP2_AVAILABLE,
+                               timeout=self.timeout)
+
+    def _host_slot(self, host: str) -> _HostSlot:
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(self.per_host_concurrency)
+            if len(self._hosts) > MAX_TRACKED_HOSTS:
+                self._forget_idle_hosts()
+        self._hosts.move_to_end(host)
+        return slot
+
+    def _forget_idle_hosts(self) -> None:
+        # Only hosts with nothing in flight and past their interval can be dropped
+        # without loosening their politeness limits
+        now = time.monotonic()
+        for host in [host for host, slot in self._hosts.items() if slot.idle(now)]:
+            if len(self._hosts) <= MAX_TRACKED_HOSTS:
+                break
+            del self._hosts[host]
+
+    async def _wait_for_host_turn(self, slot: _HostSlot) -> None:
+        now = time.monotonic()
+        start = max(now, slot.next_start)
+        slot.next_start = start + self.per_host_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _download(self, url: str, headers: Optional[Dict[str, str]], timeout: float) -> FetchResult:
+        async with self._client().stream("GET", url, headers=headers, timeout=timeout) as response:
+            result = FetchResult(
+                url=url,
+                status_code=response.status_code,
+                content_type=response.headers.get("Content-Type", ""),
+                headers=dict(response.headers),
+            )
+            if response.status_code != 200:
+                return result
+
+            content_type = result.content_type.lower()
+            if content_type and not content_type.startswith(TEXT_CONTENT_TYPES):
+                result.skipped = f"binary content type {result.content_type}"
+                return result
+
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_content_length:
+                result.skipped = f"content length {content_length} exceeds {self.max_content_length} bytes"
+                return result
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= self.max_bytes:
+                    # Stop reading; leaving the block closes the stream
+                    del body[self.max_bytes:]
+                    result.truncated = True
+                    break
+
+            result.text = body.decode(response.encoding or "utf-8", errors="replace")
+            return result
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+                    timeout: Optional[float] = None) -> FetchResult:
+        """
+        Fetches a single URL, waiting for its host's turn and a global slot.
+
+        Args:
+            url: The URL to fetch
+            headers: Optional request headers
+            timeout: Connect and per-read timeout for this request; defaults to the
+                scheduler's. The total timeout is raised to at least this much.
+
+        Returns:
+            FetchResult: Status, content type and decoded text (up to max_bytes), or why
+                the body was skipped, or the error
+        """
+        timeout = timeout or self.timeout
+        total_timeout = max(self.total_timeout, timeout)
+        slot = self._host_slot(urlsplit(url).hostname or "")
+        slot.users += 1
+        try:
+            # Queue on the host first so hosts waiting out their politeness interval do
+            # not hold global slots.
+            async with slot.semaphore:
+                await self._wait_for_host_turn(slot)
+                async with self._global:
+                    try:
+                        return await asyncio.wait_for(self._download(url, headers, timeout), total_timeout)
+                    except asyncio.TimeoutError:
+                        return FetchResult(url=url, error=f"Timed out after {total_timeout}s")
+                    except Exception as e:
+                        return FetchResult(url=url, error=str(e) or type(e).__name__)
+        finally:
+            slot.users -= 1
+
+    async def fetch_all(self, urls: List[str], headers: Optional[Dict[str, str]] = None,
+                        timeout: Optional[float] = None) -> List[FetchResult]:
+        """Fetches all URLs concurrently; results are returned in input order."""
+        return await asyncio.gather(*(self.fetch(url, headers=headers, timeout=timeout) for url in urls))
+
+
+def get_fetch_scheduler() -> FetchScheduler:
+    """Returns the scheduler shared by every fetch on the running event loop."""
+    return loop_client("fetch_scheduler", FetchScheduler)
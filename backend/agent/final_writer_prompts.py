@@ -1,11 +1,12 @@
-from backend.db import supabase
+from langchain_core.messages import HumanMessage, SystemMessage
 
+from backend.db import supabase
 
-def form_final_writer_system_prompt(writing_style: str):
-    return f"""
-    You are a writer with a writing style:
-    {writing_style}
-    You are given a report and you need to write a news article.
+# Static instructions shared by every writing style. Together with the report they
+# form the cacheable prefix of the final-writer prompt (see final_writer_messages).
+FINAL_WRITER_SYSTEM_PROMPT = """
+    You are a writer. You are given a report and you need to write a news article
+    in the writing style requested by the user.
 
     You should *ALWAYS*:
 
@@ -63,6 +64,106 @@ def form_final_writer_system_prompt(writing_style: str):
     </relevant_topics>
     """
 
+WRITING_STYLE_INSTRUCTIONS = {
+    "short": "short and concise summary that only cover the most important information",
+    "depth": "in-depth detailed analysis that includes every part of the report",
+    "informal": "informal and casual language written in a way that is easy to understand. Never use any jargon or technical terms. Never use formal words or phrases. Never use journalistic language. Never use any words that are not commonly used in everyday conversation.",
+    "formal": "formal and professional language written by a professional journalist",
+    "satirical": "all sentences should be satirical, witty and comedic language in the same style of the Daily Show by Jon Stewart and Trevor Noah. You should make the readers laugh and feel like they are watching a comedy show. You should start the article with a joke or a funny hook. You should end the article with a joke or a funny sentence.",
+    "straight": "straight-laced and objective language written by a professional journalist. Never use any witty or comedic language.",
+}
+
+
+def writing_style_instructions(preferred_writing_style: list[str]) -> str:
+    """Returns the writer instructions for a combination of writing styles, one per line."""
+    return "".join(f"{WRITING_STYLE_INSTRUCTIONS[style]}\n"
+                   for style in WRITING_STYLE_INSTRUCTIONS if style in preferred_writing_style)
+
+
+def final_writer_messages(report: str, writing_style: str) -> list:
+    """
+    Builds the final-writer messages with the report in a cacheable prefix.
+
+    The static instructions and the report go into one system block marked for
+    Anthropic prompt caching, and the writing style follows in the user message, so
+    every style variant of a report reuses the cached prefix.
+
+    Args:
+        report: The research report, or its brief (see variant_source)
+        writing_style: Writing style instructions (see writing_style_instructions)
+
+    Returns:
+        list: Messages for the final writer
+    """
+    return [
+        SystemMessage(content=[{
+            "type": "text",
+            "text": f"{FINAL_WRITER_SYSTEM_PROMPT}\n\n<report>\n{report}\n</report>",
+            "cache_control": {"type": "ephemeral"},
+        }]),
+        HumanMessage(content=f"Your writing style:\n{writing_style}\nPlease write a news article based on the report in this writing style."),
+    ]
+
+
+REPORT_BRIEF_SYSTEM_PROMPT = """
+    You are a research editor. You are given a research report and you need to distill it
+    into a fact sheet that journalists will write news articles from.
+
+    You should *ALWAYS*:
+
+    1. keep every key claim, direct quote, number, date and distinct viewpoint in the report.
+    2. copy direct quotes, numbers and URLs exactly as they appear in the report.
+    Never paraphrase a direct quote and never invent one.
+    3. attach the supporting source URLs from the report's "Sources" sections to each claim, quote and number.
+    4. list every source from the report's "Sources" sections.
+    5. leave out anything that is not in the report.
+    """
+
+
+def report_brief_messages(report: str) -> list:
+    """Builds the messages that distill a report into a ReportBrief."""
+    return [
+        SystemMessage(content=REPORT_BRIEF_SYSTEM_PROMPT),
+        HumanMessage(content=f"You are given with this report:\n{report}\n\nPlease distill it into a fact sheet."),
+    ]
+
+
+def format_report_brief(brief) -> str:
+    """
+    Renders a ReportBrief as a compact markdown fact sheet for the final writer.
+
+    Args:
+        brief: The ReportBrief
+
+    Returns:
+        str: The fact sheet, ending with a "Sources" section like the full report
+    """
+    def cite(urls):
+        urls = [url for url in urls if url]
+        return f" ({', '.join(urls)})" if urls else ""
+
+    lines = ["# Fact sheet", "", brief.summary, "", "## Key claims"]
+    lines += [f"- {item.claim}{cite(item.source_urls)}" for item in brief.key_claims]
+    if brief.quotes:
+        lines += ["", "## Direct quotes"]
+        lines += [f'- "{item.quote}" - {item.speaker}{cite([item.source_url])}' for item in brief.quotes]
+    if brief.numbers:
+        lines += ["", "## Numbers"]
+        lines += [f"- {item.value}: {item.context}{cite([item.source_url])}" for item in brief.numbers]
+    if brief.perspectives:
+        lines += ["", "## Perspectives"]
+        lines += [f"- {perspective}" for perspective in brief.perspectives]
+    lines += ["", "### Sources"]
+    lines += [f"[{i}] {source.title}: {source.url}" for i, source in enumerate(brief.sources, 1)]
+    return "\n".join(lines)
+
+
+def variant_source(report: str, brief: str, writing_style: list[str]) -> str:
+    """In-depth variants are written from the full report, the others from the brief if there is one."""
+    if "depth" in writing_style or not brief:
+        return report
+    return brief
+
 
 def topic_generator_system_prompt(political_leaning: str, user_request: str):
     # Get the existing topics that were already written
@@ -9,3 +9,29 @@ class FinalNewsArticle(BaseModel):
     opposite_view: str = Field(default="",
                                description="If the bias is conservative, write a detailed analysis of the opposite liberal view. If the bias is liberal, write a detailed analysis of the opposite conservative view. If the bias is neutral, leave this empty.")
     relevant_topics: list[str] = Field(description="A list of relevant topics to the news article.")
+
+class BriefClaim(BaseModel):
+    claim: str = Field(description="A key factual claim made in the report, in one sentence.")
+    source_urls: list[str] = Field(default_factory=list, description="URLs from the report's sources that support the claim.")
+
+class BriefQuote(BaseModel):
+    quote: str = Field(description="A direct quote exactly as it appears in the report.")
+    speaker: str = Field(description="Who said it.")
+    source_url: str = Field(default="", description="URL of the source the quote comes from.")
+
+class BriefNumber(BaseModel):
+    value: str = Field(description="A number, statistic or date from the report, with its unit.")
+    context: str = Field(description="What the number measures or refers to.")
+    source_url: str = Field(default="", description="URL of the source the number comes from.")
+
+class BriefSource(BaseModel):
+    title: str = Field(description="Title of the source.")
+    url: str = Field(description="URL of the source.")
+
+class ReportBrief(BaseModel):
+    summary: str = Field(description="A two to three sentence summary of the report.")
+    key_claims: list[BriefClaim] = Field(description="The report's key factual claims, most important first.")
+    quotes: list[BriefQuote] = Field(default_factory=list, description="Direct quotes from the report.")
+    numbers: list[BriefNumber] = Field(default_factory=list, description="Key numbers, statistics and dates from the report.")
+    perspectives: list[str] = Field(default_factory=list, description="Distinct viewpoints or positions described in the report, one sentence each.")
+    sources: list[BriefSource] = Field(description="Every source listed in the report.")
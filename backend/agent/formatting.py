@@ -0,0 +1,188 @@
+"""
+Formatting helpers that turn search results, scraped pages and report sections
+into prompt context.
+
+Search payloads routinely run to several hundred KB, so raw page content is never
+interpolated into an f-string (which copies it once more before it is appended).
+Most formatters collect their pieces in a list and join them once;
+format_search_results keeps growing its output with ``+=``, which measured faster
+and leaner there. Run benchmarks/bench_formatting.py before changing either.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.agent.dedup import DEFAULT_MAX_HAMMING_DISTANCE, collapse_near_duplicates
+from backend.agent.state import Section
+
+SECTION_RULE = "=" * 80
+SUBSECTION_RULE = "-" * 80
+REPORT_SECTION_RULE = "=" * 60
+
+
+def write_source_blocks(parts: List[str], sources: Iterable[Dict[str, Any]], max_tokens_per_source: int = 5000,
+                        include_raw_content: bool = True) -> None:
+    """
+    Appends the formatted block for each source to parts, in order.
+
+    Args:
+        parts: List collecting the pieces of the output
+        sources: Iterable of search result dicts (title, url, content, raw_content)
+        max_tokens_per_source: Approximate token budget for each source's raw content
+        include_raw_content: Whether to include the (truncated) raw content
+    """
+    append = parts.append
+    # Using rough estimate of 4 characters per token
+    char_limit = max_tokens_per_source * 4
+    raw_content_label = f"Full source content limited to {max_tokens_per_source} tokens: "
+
+    for source in sources:
+        # Clear section separator, then a subsection separator under the title
+        append(f"{SECTION_RULE}\nSource: {source['title']}\n{SUBSECTION_RULE}\nURL: {source['url']}\n===\n")
+        if source.get('duplicate_urls'):
+            append(f"Also published at: {', '.join(source['duplicate_urls'])}\n===\n")
+        append(f"Most relevant content from source: {source['content']}\n===\n")
+        if include_raw_content:
+            # Handle None raw_content
+            raw_content = source.get('raw_content', '')
+            if raw_content is None:
+                raw_content = ''
+                print(
+                    f"Warning: No raw_content found for source {source['url']}")
+            append(raw_content_label)
+            if len(raw_content) > char_limit:
+                append(raw_content[:char_limit])
+                append("... [truncated]")
+            else:
+                append(raw_content)
+            append("\n\n")
+        append(f"{SECTION_RULE}\n\n")  # End section separator
+
+
+def deduplicate_and_format_sources(search_response, max_tokens_per_source=5000, include_raw_content=True,
+                                   near_duplicate_distance=DEFAULT_MAX_HAMMING_DISTANCE):
+    """
+    Takes a list of search responses and formats them into a readable string.
+    Limits the raw_content to approximately max_tokens_per_source tokens.
+
+    Sources are deduplicated by URL and then by content: syndicated copies of the
+    same story collapse to the highest-scoring source, which lists the other URLs.
+
+    Args:
+        search_responses: List of search response dicts, each containing:
+            - query: str
+            - results: List of dicts with fields:
+                - title: str
+                - url: str
+                - content: str
+                - score: float
+                - raw_content: str|None
+        max_tokens_per_source: int
+        include_raw_content: bool
+        near_duplicate_distance: int|None - SimHash distance for near-duplicates, None to disable
+
+    Returns:
+        str: Formatted string with deduplicated sources
+    """
+    # Deduplicate by URL
+    unique_sources = {}
+    for response in search_response:
+        for source in response['results']:
+            unique_sources[source['url']] = source
+
+    sources = list(unique_sources.values())
+    if near_duplicate_distance is not None:
+        sources = collapse_near_duplicates(sources, near_duplicate_distance)
+
+    parts = ["Content from sources:\n"]
+    write_source_blocks(parts, sources,
+                        max_tokens_per_source, include_raw_content)
+    # Same as stripping the joined text, without copying all of it again
+    parts[0] = parts[0].lstrip()
+    parts[-1] = parts[-1].rstrip()
+    return "".join(parts)
+
+
+def format_sections(sections: list[Section]) -> str:
+    """ Format a list of sections into a string """
+    parts = []
+    for idx, section in enumerate(sections, 1):
+        parts.append(f"""
+{REPORT_SECTION_RULE}
+Section {idx}: {section.name}
+{REPORT_SECTION_RULE}
+Description:
+{section.description}
+Requires Research:
+{section.research}
+
+Content:
+{section.content if section.content else '[Not yet written]'}
+
+""")
+    return "".join(parts)
+
+
+def format_search_results(search_results: List[Dict[str, Any]], max_chars_per_source: int = 30000,
+                          near_duplicate_distance: Optional[int] = DEFAULT_MAX_HAMMING_DISTANCE) -> str:
+    """
+    Formats search responses into the "--- SOURCE n ---" layout used by the search tools,
+    keeping the first occurrence of every URL and collapsing syndicated copies.
+
+    Args:
+        search_results: List of search response dicts with a 'results' list
+        max_chars_per_source: Maximum characters of raw content kept per source
+        near_duplicate_distance: SimHash distance for near-duplicates, None to disable
+
+    Returns:
+        str: Formatted string of search results, or an explanatory message if there are none
+    """
+    # Deduplicate results by URL
+    unique_results = {}
+    for response in search_results:
+        for result in response['results']:
+            unique_results.setdefault(result['url'], result)
+
+    sources = list(unique_results.values())
+    if near_duplicate_distance is not None:
+        sources = collapse_near_duplicates(sources, near_duplicate_distance)
+
+    if not sources:
+        return "No valid search results found. Please try different search queries or use a different search API."
+
+    # Grown in place with += rather than joined: every page here is sliced, and holding
+    # all of the slices for a join doubles peak memory (see benchmarks/bench_formatting.py)
+    formatted_output = "Search results: \n\n"
+    for i, result in enumerate(sources):
+        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\nURL: {result['url']}\n\n"
+        if result.get('duplicate_urls'):
+            formatted_output += f"ALSO PUBLISHED AT: {', '.join(result['duplicate_urls'])}\n\n"
+        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
+        if result.get('raw_content'):
+            # Limit content size
+            formatted_output += "FULL CONTENT:\n"
+            formatted_output += result['raw_content'][:max_chars_per_source]
+        formatted_output += f"\n\n{SUBSECTION_RULE}\n"
+
+    return formatted_output
+
+
+def format_scraped_pages(titles: List[str], urls: List[str], pages: List[str]) -> str:
+    """
+    Formats scraped page content with source attribution.
+
+    Args:
+        titles: Page titles, one per URL
+        urls: The scraped URLs
+        pages: Markdown content (or an error note) for each URL
+
+    Returns:
+        str: Formatted string with clear section dividers for every page
+    """
+    parts = ["Search results: \n\n"]
+    append = parts.append
+    for i, (title, url, page) in enumerate(zip(titles, urls, pages)):
+        append(f"\n\n--- SOURCE {i+1}: {title} ---\nURL: {url}\n\nFULL CONTENT:\n ")
+        append(page)
+        append(f"\n\n{SUBSECTION_RULE}\n")
+
+    return "".join(parts)
@@ -0,0 +1,161 @@
+"""
+Grading policies for the section reflection step.
+
+write_section used to run the planner model as a Feedback grader after every draft,
+even when the search budget was already spent and the grade could not change the
+outcome. A grading policy now decides per draft whether the grader runs:
+
+- "always": grade every draft (the original behavior)
+- "never": publish every first draft
+- "budget_aware": skip the grader once search_iterations reaches max_search_depth
+- "heuristic_first": like budget_aware, and also publish drafts that pass a cheap
+  check (long enough, cites enough sources, cites only URLs found in its sources)
+
+Skipped calls are counted per report (graph thread_id), with the seconds saved
+estimated from the mean latency of the grader calls that did run.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+GRADING_POLICIES = ("always", "never", "budget_aware", "heuristic_first")
+DEFAULT_GRADING_POLICY = "budget_aware"
+
+# Estimate for a thinking-enabled grader call until one has been timed
+DEFAULT_GRADER_SECONDS = 15.0
+
+# heuristic_first thresholds; sections are written to 150-200 words
+HEURISTIC_MIN_WORDS = 120
+HEURISTIC_MIN_SOURCES = 2
+
+_URL_RE = re.compile(r"https?://[^\s)\]>]+")
+_SOURCES_HEADING_RE = re.compile(r"^#+\s*Sources\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def passes_heuristic(section_content: str, source_str: str) -> bool:
+    """
+    Cheap check that a section draft is good enough to publish without grading.
+
+    Args:
+        section_content: The drafted section, ending with its ### Sources list
+        source_str: The search results the section was written from
+
+    Returns:
+        bool: Whether the body is long enough and cites enough sources, all of them
+            present in the search results
+    """
+    parts = _SOURCES_HEADING_RE.split(section_content, maxsplit=1)
+    if len(parts) < 2:
+        return False
+    body, sources = parts
+    cited_urls = {url.rstrip(".,;") for url in _URL_RE.findall(sources)}
+    return (len(body.split()) >= HEURISTIC_MIN_WORDS
+            and len(cited_urls) >= HEURISTIC_MIN_SOURCES
+            and all(url in source_str for url in cited_urls))
+
+
+def should_grade(policy: str, section_content: str, source_str: str, search_iterations: int,
+                 max_search_depth: int) -> Tuple[bool, Optional[str]]:
+    """
+    Decides whether a section draft goes to the grader.
+
+    Args:
+        policy: One of GRADING_POLICIES
+        section_content: The drafted section
+        source_str: The search results the section was written from
+        search_iterations: Searches done for the section so far
+        max_search_depth: Maximum searches allowed per section
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether to grade, and if not, why ("policy",
+            "budget_exhausted" or "heuristic_pass")
+
+    Raises:
+        ValueError: If the policy is unknown
+    """
+    if policy not in GRADING_POLICIES:
+        raise ValueError(f"Unknown grading policy: {policy}. Expected one of {', '.join(GRADING_POLICIES)}")
+    if policy == "always":
+        return True, None
+    if policy == "never":
+        return False, "policy"
+    if search_iterations >= max_search_depth:
+        # The section is published whatever the grade
+        return False, "budget_exhausted"
+    if policy == "heuristic_first" and passes_heuristic(section_content, source_str):
+        return False, "heuristic_pass"
+    return True, None
+
+
+@dataclass
+class GradingStats:
+    graded: int = 0
+    grader_seconds: float = 0.0
+    skipped: Dict[str, int] = field(default_factory=dict)
+
+
+_stats: Dict[str, GradingStats] = {}
+_stats_lock = threading.Lock()
+# Process-wide grader latency, for estimating the time saved by skips
+_grader_calls = 0
+_grader_seconds = 0.0
+
+
+def _report_stats(thread_id: str) -> GradingStats:
+    stats = _stats.get(thread_id)
+    if stats is None:
+        stats = _stats[thread_id] = GradingStats()
+    return stats
+
+
+def record_graded(thread_id: Optional[str], seconds: float) -> None:
+    """Records a grader call and its latency for the report run under thread_id."""
+    global _grader_calls, _grader_seconds
+    with _stats_lock:
+        _grader_calls += 1
+        _grader_seconds += seconds
+        if thread_id:
+            stats = _report_stats(thread_id)
+            stats.graded += 1
+            stats.grader_seconds += seconds
+
+
+def record_skipped(thread_id: Optional[str], reason: str) -> None:
+    """Records a grader call skipped for the given reason."""
+    if not thread_id:
+        return
+    with _stats_lock:
+        skipped = _report_stats(thread_id).skipped
+        skipped[reason] = skipped.get(reason, 0) + 1
+
+
+def mean_grader_seconds() -> float:
+    """Mean latency of the grader calls made so far, or DEFAULT_GRADER_SECONDS if none were."""
+    with _stats_lock:
+        return _grader_seconds / _grader_calls if _grader_calls else DEFAULT_GRADER_SECONDS
+
+
+def pop_grading_stats(thread_id: str) -> Dict[str, Any]:
+    """
+    Returns and forgets the grading counts of a finished report run.
+
+    Args:
+        thread_id: The run's graph thread_id
+
+    Returns:
+        Dict[str, Any]: Grader calls made and skipped (by reason), and the estimated
+            seconds saved by the skipped calls
+    """
+    mean_seconds = mean_grader_seconds()
+    with _stats_lock:
+        stats = _stats.pop(thread_id, None) or GradingStats()
+    skipped = sum(stats.skipped.values())
+    return {
+        "graded": stats.graded,
+        "grader_seconds": round(stats.grader_seconds, 2),
+        "skipped": skipped,
+        "skipped_by_reason": stats.skipped,
+        "estimated_seconds_saved": round(skipped * mean_seconds, 2),
+    }
@@ -1,3 +1,4 @@
+import time
 from typing import Literal
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -26,16 +27,20 @@ from backend.agent.prompts import (
     section_writer_inputs
 )
 from backend.agent.configuration import Configuration
+from backend.agent.grading import record_graded, record_skipped, should_grade
+from backend.agent.hedging import configured_search
+from backend.tracing import traced_node
 from backend.agent.utils import (
     format_sections,
+    get_config_flag,
     get_config_value,
-    get_search_params,
-    select_and_execute_search
+    section_context_coverage
 )
 
 # Nodes --
 
 
+@traced_node
 async def generate_report_plan(state: ReportState, config: RunnableConfig):
     """Generate the initial report plan with sections.
 
@@ -61,11 +66,6 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     report_structure = configurable.report_structure
     number_of_queries = configurable.number_of_queries
-    search_api = get_config_value(configurable.search_api)
-    # Get the config dict, default to empty
-    search_api_config = configurable.search_api_config or {}
-    params_to_pass = get_search_params(
-        search_api, search_api_config)  # Filter parameters
 
     # Convert JSON object to string if necessary
     if isinstance(report_structure, dict):
@@ -91,8 +91,8 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     # Web search
     query_list = [query.search_query for query in results.queries]
 
-    # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    # Search the web with parameters (hedged across providers if configured)
+    source_str = await configured_search(configurable, query_list)
 
     # Format system instructions
     system_instructions_sections = report_planner_instructions.format(
@@ -130,9 +130,62 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     # Get sections
     sections = report_sections.sections
 
-    return {"sections": sections}
+    # Keep the planning search results so sections they cover can skip their first search
+    return {"sections": sections, "planning_source_str": source_str}
 
 
+def initiate_section_research(state: ReportState, config: RunnableConfig):
+    """Create parallel research tasks for the planned sections that need research.
+
+    With reuse_planning_search set, sections whose keywords are covered by the planning
+    search results get them as their initial sources, so they start writing right away
+    and only search if the grader asks for more.
+
+    Args:
+        state: Current graph state with the report plan
+        config: Configuration for the workflow
+
+    Returns:
+        List of Send commands for parallel section research and writing
+    """
+    configurable = Configuration.from_runnable_config(config)
+    planning_source_str = state.get("planning_source_str", "")
+    if not get_config_flag(configurable.reuse_planning_search):
+        planning_source_str = ""
+    min_coverage = float(configurable.planning_search_min_coverage)
+
+    sends = []
+    for s in state["sections"]:
+        if not s.research:
+            continue
+        section_state = {"topic": state["topic"], "section": s, "search_iterations": 0}
+        if planning_source_str and section_context_coverage(
+                s.name, s.description, planning_source_str) >= min_coverage:
+            section_state["source_str"] = planning_source_str
+        sends.append(Send("build_section_with_web_research", section_state))
+    return sends
+
+
+def route_report_plan(state: ReportState, config: RunnableConfig):
+    """Route the report plan to human review, or straight to section research.
+
+    With auto_approve_plan set, the plan is approved without the human_feedback
+    interrupt, so the graph runs in a single pass and needs no checkpointer.
+
+    Args:
+        state: Current graph state with the report plan
+        config: Configuration for the workflow
+
+    Returns:
+        "human_feedback", or Send commands for section research
+    """
+    configurable = Configuration.from_runnable_config(config)
+    if get_config_flag(configurable.auto_approve_plan):
+        return initiate_section_research(state, config)
+    return "human_feedback"
+
+
+@traced_node
 def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan", "build_section_with_web_research"]]:
     """Get human feedback on the report plan and route to next steps.
 
@@ -171,12 +224,7 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     # If the user approves the report plan, kick off section writing
     if isinstance(feedback, bool) and feedback is True:
         # Treat this as approve and kick off section writing
-        return Command(goto=[
-            Send("build_section_with_web_research", {
-                 "topic": topic, "section": s, "search_iterations": 0})
-            for s in sections
-            if s.research
-        ])
+        return Command(goto=initiate_section_research(state, config))
 
     # If the user provides feedback, regenerate the report plan
     elif isinstance(feedback, str):
@@ -188,6 +236,7 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
             f"Interrupt value of type {type(feedback)} is not supported.")
 
 
+@traced_node
 async def generate_queries(state: SectionState, config: RunnableConfig):
     """Generate search queries for researching a specific section.
 
@@ -231,6 +280,7 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
     return {"search_queries": queries.queries}
 
 
+@traced_node
 async def search_web(state: SectionState, config: RunnableConfig):
     """Execute web searches for the section queries.
 
@@ -252,21 +302,17 @@ async def search_web(state: SectionState, config: RunnableConfig):
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
-    search_api = get_config_value(configurable.search_api)
-    # Get the config dict, default to empty
-    search_api_config = configurable.search_api_config or {}
-    params_to_pass = get_search_params(
-        search_api, search_api_config)  # Filter parameters
 
     # Web search
     query_list = [query.search_query for query in search_queries]
 
-    # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    # Search the web with parameters (hedged across providers if configured)
+    source_str = await configured_search(configurable, query_list)
 
     return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
 
 
+@traced_node
 async def write_section(state: SectionState, config: RunnableConfig) -> Command[Literal[END, "search_web"]]:
     """Write a section of the report and evaluate if more research is needed.
 
@@ -314,6 +360,17 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     # Write content to the section object
     section.content = section_content.content
 
+    # Skip the grader when its verdict cannot or need not change the outcome
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    grade, skip_reason = should_grade(configurable.grading_policy, section.content, source_str,
+                                      state["search_iterations"], configurable.max_search_depth)
+    if not grade:
+        record_skipped(thread_id, skip_reason)
+        return Command(
+            update={"completed_sections": [section]},
+            goto="END"
+        )
+
     # Grade prompt
     section_grader_message = ("Grade the report and consider follow-up questions for missing information. "
                               "If the grade is 'pass', return empty strings for all follow-up queries. "
@@ -340,8 +397,10 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
         reflection_model = init_chat_model(model=planner_model,
                                            model_provider=planner_provider, model_kwargs=planner_model_kwargs).with_structured_output(Feedback)
     # Generate feedback
+    grading_started = time.perf_counter()
     feedback = await reflection_model.ainvoke([SystemMessage(content=section_grader_instructions_formatted),
                                                HumanMessage(content=section_grader_message)])
+    record_graded(thread_id, time.perf_counter() - grading_started)
 
     # If the section is passing or the max search depth is reached, publish the section to completed sections
     if feedback.grade == "pass" or state["search_iterations"] >= configurable.max_search_depth:
@@ -360,6 +419,7 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
         )
 
 
+@traced_node
 async def write_final_sections(state: SectionState, config: RunnableConfig):
     """Write sections that don't require research using completed sections as context.
 
@@ -404,6 +464,7 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     return {"completed_sections": [section]}
 
 
+@traced_node
 def gather_completed_sections(state: ReportState):
     """Format completed sections as context for writing final sections.
 
@@ -426,6 +487,7 @@ def gather_completed_sections(state: ReportState):
     return {"report_sections_from_research": completed_report_sections}
 
 
+@traced_node
 def compile_final_report(state: ReportState):
     """Compile all sections into the final report.
 
@@ -456,6 +518,18 @@ def compile_final_report(state: ReportState):
     return {"final_report": all_sections}
 
 
+def route_section_start(state: SectionState):
+    """Start a section with writing if it was seeded with planning search results, else with queries.
+
+    Args:
+        state: Initial section state
+
+    Returns:
+        Name of the first node of the section sub-graph
+    """
+    return "write_section" if state.get("source_str") else "generate_queries"
+
+
 def initiate_final_section_writing(state: ReportState):
     """Create parallel tasks for writing non-research sections.
 
@@ -487,7 +561,7 @@ section_builder.add_node("search_web", search_web)
 section_builder.add_node("write_section", write_section)
 
 # Add edges
-section_builder.add_edge(START, "generate_queries")
+section_builder.add_conditional_edges(START, route_section_start, ["generate_queries", "write_section"])
 section_builder.add_edge("generate_queries", "search_web")
 section_builder.add_edge("search_web", "write_section")
 
@@ -505,7 +579,8 @@ builder.add_node("compile_final_report", compile_final_report)
 
 # Add edges
 builder.add_edge(START, "generate_report_plan")
-builder.add_edge("generate_report_plan", "human_feedback")
+builder.add_conditional_edges("generate_report_plan", route_report_plan,
+                              ["human_feedback", "build_section_with_web_research"])
 builder.add_edge("build_section_with_web_research",
                  "gather_completed_sections")
 builder.add_conditional_edges("gather_completed_sections",
@@ -0,0 +1,231 @@
+"""
+Hedged search requests across providers.
+
+A single slow search response holds up a whole section. With hedge_search_api set,
+the graph's searches wait for the primary provider only up to hedge_delay (by default
+the primary's rolling p90 latency); after that the same queries also go to the
+secondary provider, whichever answers first wins and the other request is cancelled.
+
+Latency windows and hedging counters are process-wide and served by
+/metrics/search. A primary request cancelled because the hedge won is still
+sampled, at the time it had run so far: dropping it would leave only the fast
+requests in the window, pull the p90 delay down and make hedging feed on itself.
+Those samples are lower bounds, so the estimated p99 saving (primary p99 minus
+observed p99) stays conservative.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from backend.agent.configuration import Configuration
+from backend.agent.instrumentation import time_search
+from backend.agent.utils import (
+    get_config_value,
+    get_raw_content_policy,
+    get_search_params,
+    select_and_execute_search,
+)
+
+# Hedge after this many seconds until the primary has enough latency samples
+DEFAULT_HEDGE_DELAY = 5.0
+MIN_LATENCY_SAMPLES = 20
+LATENCY_WINDOW_SIZE = 500
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latencies, in seconds."""
+
+    def __init__(self, size: int = LATENCY_WINDOW_SIZE):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Returns the q-th quantile (0-1) of the window, or None if it is empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self),
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+        }
+
+
+class HedgingStats:
+    """Process-wide latency windows and hedging counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.provider_latency: Dict[str, LatencyWindow] = {}
+        # End-to-end latency of searches issued with hedging enabled
+        self.hedged_search_latency = LatencyWindow()
+        self.primary_apis = set()
+        # Running totals; the latency window only holds the most recent searches
+        self.searches = 0
+        self.fired = 0
+        self.secondary_wins = 0
+
+    def latency(self, search_api: str) -> LatencyWindow:
+        with self._lock:
+            window = self.provider_latency.get(search_api)
+            if window is None:
+                window = self.provider_latency[search_api] = LatencyWindow()
+            return window
+
+    def record_search(self, search_api: str, seconds: float, hedged: bool, secondary_won: bool) -> None:
+        """Records a search issued with hedging enabled on primary search_api."""
+        self.hedged_search_latency.record(seconds)
+        with self._lock:
+            self.primary_apis.add(search_api)
+            self.searches += 1
+            self.fired += hedged
+            self.secondary_wins += secondary_won
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = dict(self.provider_latency)
+            primary_apis = set(self.primary_apis)
+            searches, fired, secondary_wins = self.searches, self.fired, self.secondary_wins
+        observed = self.hedged_search_latency.summary()
+        primary_p99 = max((providers[api].percentile(0.99) or 0.0 for api in primary_apis if api in providers),
+                          default=0.0)
+        return {
+            "searches": searches,
+            "hedges_fired": fired,
+            "secondary_wins": secondary_wins,
+            "hedge_rate": fired / searches if searches else 0.0,
+            "search_latency": observed,
+            "provider_latency": {name: window.summary() for name, window in providers.items()},
+            "estimated_p99_saved_seconds": max(0.0, primary_p99 - (observed["p99"] or primary_p99)),
+        }
+
+
+hedging_stats = HedgingStats()
+
+
+def get_hedging_stats() -> Dict[str, Any]:
+    """Returns hedging counters and latency percentiles for the metrics endpoint."""
+    return hedging_stats.snapshot()
+
+
+async def _timed_search(search_api: str, query_list: List[str], search_api_config: Optional[Dict[str, Any]],
+                        raw_content_policy: Optional[Dict[str, Dict[str, Any]]],
+                        fallback_search_apis: Optional[List[str]] = None) -> str:
+    start = time.perf_counter()
+    try:
+        with time_search(search_api):
+            result = await select_and_execute_search(
+                search_api, query_list, get_search_params(search_api, search_api_config),
+                get_raw_content_policy(search_api, raw_content_policy), fallback_search_apis, search_api_config,
+                raw_content_policy)
+    except asyncio.CancelledError:
+        # Lost the race to the hedge: it took at least this long
+        hedging_stats.latency(search_api).record(time.perf_counter() - start)
+        raise
+    hedging_stats.latency(search_api).record(time.perf_counter() - start)
+    return result
+
+
+async def hedged_search(search_api: str, hedge_search_api: str, query_list: List[str],
+                        search_api_config: Optional[Dict[str, Any]] = None,
+                        raw_content_policy: Optional[Dict[str, Dict[str, Any]]] = None,
+                        hedge_delay: Optional[float] = None,
+                        fallback_search_apis: Optional[List[str]] = None) -> str:
+    """
+    Runs the queries on the primary API, racing the secondary API against it if it is slow or fails.
+
+    Args:
+        search_api: Primary search API
+        hedge_search_api: Secondary search API, queried once the primary exceeds hedge_delay
+            or fails before it
+        query_list: List of search queries to execute
+        search_api_config: Search API configuration, filtered per API
+        raw_content_policy: Per-API raw content policy overrides
+        hedge_delay: Seconds to wait for the primary before hedging; defaults to the
+            primary's p90 latency (DEFAULT_HEDGE_DELAY until enough samples exist)
+        fallback_search_apis: Search APIs the primary fails over to (see select_and_execute_search)
+
+    Returns:
+        str: Formatted search results from whichever API answered first
+    """
+    if hedge_delay is None:
+        window = hedging_stats.latency(search_api)
+        hedge_delay = window.percentile(0.9) if len(window) >= MIN_LATENCY_SAMPLES else DEFAULT_HEDGE_DELAY
+
+    def start(api, fallbacks=None):
+        return asyncio.create_task(_timed_search(api, query_list, search_api_config, raw_content_policy, fallbacks))
+
+    started_at = time.perf_counter()
+    primary = start(search_api, fallback_search_apis)
+    started = [primary]
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        # Hedge when the primary is slow, and also when it has already failed
+        hedged = not done or primary.exception() is not None
+        if hedged:
+            started.append(start(hedge_search_api))
+            tasks.add(started[-1])
+
+        winner = None
+        while tasks and winner is None:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+        if winner is None:
+            # Both failed; surface the primary's error
+            return primary.result()
+
+        hedging_stats.record_search(search_api, time.perf_counter() - started_at, hedged,
+                                    secondary_won=winner is not primary)
+        return winner.result()
+    finally:
+        for task in started:
+            task.cancel()
+        # Retrieve the losers' errors and cancellations, so they are not logged as never retrieved
+        await asyncio.gather(*started, return_exceptions=True)
+
+
+async def configured_search(configurable: Configuration, query_list: List[str]) -> str:
+    """
+    Runs a graph search as configured: on search_api, failing over to search_api_fallbacks
+    and hedged with hedge_search_api if set.
+
+    Args:
+        configurable: The run's configuration
+        query_list: List of search queries to execute
+
+    Returns:
+        str: Formatted search results
+    """
+    search_api = get_config_value(configurable.search_api)
+    search_api_config = configurable.search_api_config or {}
+    fallbacks = configurable.search_api_fallbacks or []
+    if isinstance(fallbacks, str):
+        # Comma-separated when set through the environment
+        fallbacks = [api.strip() for api in fallbacks.split(",") if api.strip()]
+    fallbacks = [get_config_value(api) for api in fallbacks]
+
+    if configurable.hedge_search_api:
+        hedge_search_api = get_config_value(configurable.hedge_search_api)
+        if hedge_search_api != search_api:
+            hedge_delay = float(configurable.hedge_delay) if configurable.hedge_delay is not None else None
+            return await hedged_search(search_api, hedge_search_api, query_list, search_api_config,
+                                       configurable.raw_content_policy, hedge_delay, fallbacks)
+
+    return await _timed_search(search_api, query_list, search_api_config, configurable.raw_content_policy,
+                               fallbacks)
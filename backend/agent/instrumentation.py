@@ -0,0 +1,510 @@
+"""
+LLM usage recording and research pipeline instrumentation.
+
+LLMUsageRecorder is a LangChain callback handler that records, for every chat model
+call it is attached to, the input tokens split into uncached, cache-read and
+cache-write tokens, output tokens, latency and time to first token (models must
+stream for TTFT to be measured). It is used to confirm that the style variants of
+a report hit the prompt cache.
+
+PipelineCallbackHandler records where a report run spends its time: the wall time
+of every graph node, and the latency, tokens (thinking included), cache hits and
+estimated cost of every chat model call, attributed to the node that made it.
+Searches are recorded by time_search() with their wall time and the time spent
+queued on provider rate limiters. Everything is tagged with the run's graph
+thread_id, aggregated into process-wide histograms (served by /metrics/pipeline)
+and into a per-run summary returned by pop_run_summary().
+"""
+
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Anthropic bills cache writes at 1.25x and cache reads at 0.1x the input token price
+CACHE_WRITE_PRICE_MULTIPLIER = 1.25
+CACHE_READ_PRICE_MULTIPLIER = 0.1
+
+# USD per million (input, output) tokens, matched by model name prefix
+MODEL_PRICES = {
+    "claude-opus-4": (15.0, 75.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-3-7-sonnet": (3.0, 15.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-opus": (15.0, 75.0),
+    "claude-3-haiku": (0.25, 1.25),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+}
+
+# Anthropic counts thinking as output tokens without reporting it separately, so
+# it is estimated from the thinking blocks' length when no count is reported
+CHARS_PER_TOKEN = 4
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 50000, 100000)
+
+# Per-run summaries kept for runs whose summary is never popped
+MAX_TRACKED_RUNS = 256
+
+current_thread_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "current_thread_id", default=None)
+_search_queue_seconds: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "search_queue_seconds", default=None)
+
+
+def _usage_metadata(response: LLMResult) -> Dict[str, Any]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage
+    return {}
+
+
+class LLMUsageRecorder(BaseCallbackHandler):
+    """Records token usage, cache hits, latency and TTFT of chat model calls.
+
+    Pass it in the call's callbacks; a label can be given in the call's metadata under
+    "usage_label" (e.g. the writing style).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[UUID, Dict[str, Any]] = {}
+        self.records: List[Dict[str, Any]] = []
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._calls[run_id] = {
+                "label": (metadata or {}).get("usage_label"),
+                "started_at": time.perf_counter(),
+                "first_token_at": None,
+            }
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            call = self._calls.get(run_id)
+            if call is not None and call["first_token_at"] is None:
+                call["first_token_at"] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        ended_at = time.perf_counter()
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+
+        usage = _usage_metadata(response)
+        details = usage.get("input_token_details") or {}
+        cache_read = details.get("cache_read") or 0
+        cache_creation = details.get("cache_creation") or 0
+        # LangChain reports input_tokens including cached tokens
+        uncached = max(0, (usage.get("input_tokens") or 0) - cache_read - cache_creation)
+        first_token_at = call["first_token_at"]
+
+        record = {
+            "label": call["label"],
+            "input_tokens": uncached,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_creation,
+            "output_tokens": usage.get("output_tokens") or 0,
+            # Input cost in uncached-token equivalents
+            "billed_input_tokens": round(uncached + CACHE_WRITE_PRICE_MULTIPLIER * cache_creation
+                                         + CACHE_READ_PRICE_MULTIPLIER * cache_read),
+            "latency_seconds": round(ended_at - call["started_at"], 3),
+            "ttft_seconds": round(first_token_at - call["started_at"], 3) if first_token_at else None,
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._calls.pop(run_id, None)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals over all recorded calls, with the per-call records."""
+        with self._lock:
+            records = list(self.records)
+        return {
+            "calls": len(records),
+            "cache_hits": sum(1 for record in records if record["cache_read_input_tokens"]),
+            "input_tokens": sum(record["input_tokens"] for record in records),
+            "cache_read_input_tokens": sum(record["cache_read_input_tokens"] for record in records),
+            "cache_creation_input_tokens": sum(record["cache_creation_input_tokens"] for record in records),
+            "billed_input_tokens": sum(record["billed_input_tokens"] for record in records),
+            "records": records,
+        }
+
+
+def model_price(model_name: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Returns the (input, output) USD price per million tokens of a model, if known."""
+    if not model_name:
+        return None
+    return next((price for prefix, price in MODEL_PRICES.items() if model_name.startswith(prefix)), None)
+
+
+def estimate_cost(model_name: Optional[str], input_tokens: int, cache_read: int, cache_creation: int,
+                  output_tokens: int) -> Optional[float]:
+    """
+    Estimates the USD cost of a chat model call.
+
+    Args:
+        model_name: The model's name
+        input_tokens: Uncached input tokens
+        cache_read: Input tokens read from the prompt cache
+        cache_creation: Input tokens written to the prompt cache
+        output_tokens: Output tokens, thinking included
+
+    Returns:
+        Optional[float]: The estimated cost, or None if the model has no known price
+    """
+    price = model_price(model_name)
+    if price is None:
+        return None
+    input_price, output_price = price
+    billed_input = (input_tokens + CACHE_WRITE_PRICE_MULTIPLIER * cache_creation
+                    + CACHE_READ_PRICE_MULTIPLIER * cache_read)
+    return (billed_input * input_price + output_tokens * output_price) / 1_000_000
+
+
+def _thinking_tokens(response: LLMResult, usage: Dict[str, Any]) -> int:
+    reported = (usage.get("output_token_details") or {}).get("reasoning")
+    if reported:
+        return reported
+    chars = 0
+    for generations in response.generations:
+        for generation in generations:
+            content = getattr(getattr(generation, "message", None), "content", None)
+            if isinstance(content, list):
+                chars += sum(len(block.get("thinking") or "") for block in content
+                             if isinstance(block, dict) and block.get("type") == "thinking")
+    return chars // CHARS_PER_TOKEN
+
+
+class Histogram:
+    """Cumulative histogram over fixed bucket upper bounds, like Prometheus histograms."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (0-1), or None if empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            # Cumulative, like Prometheus' le buckets: observations less than or equal to each bound
+            "buckets": {str(bound): count
+                        for bound, count in zip(self.buckets + ("+Inf",), itertools.accumulate(self.counts))},
+        }
+
+
+def _new_run_summary() -> Dict[str, Any]:
+    return {
+        "nodes": {},
+        "llm": {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "thinking_tokens": 0,
+                "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0, "cache_hits": 0,
+                "cost_usd": 0.0, "unpriced_calls": 0},
+        "search": {"calls": 0, "failures": 0, "seconds": 0.0, "queue_seconds": 0.0},
+    }
+
+
+class PipelineMetrics:
+    """Process-wide histograms and per-run totals of a research pipeline's nodes, LLM calls and searches."""
+
+    def __init__(self, max_runs: int = MAX_TRACKED_RUNS):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_runs = max_runs
+
+    def _observe(self, metric: str, label: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        histogram = self._histograms.get((metric, label))
+        if histogram is None:
+            histogram = self._histograms[(metric, label)] = Histogram(buckets)
+        histogram.observe(value)
+
+    def _run(self, thread_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not thread_id:
+            return None
+        run = self._runs.get(thread_id)
+        if run is None:
+            run = self._runs[thread_id] = _new_run_summary()
+            while len(self._runs) > self._max_runs:
+                self._runs.popitem(last=False)
+        return run
+
+    @staticmethod
+    def _node(run: Dict[str, Any], node: str) -> Dict[str, Any]:
+        totals = run["nodes"].get(node)
+        if totals is None:
+            totals = run["nodes"][node] = {"calls": 0, "seconds": 0.0, "llm_calls": 0,
+                                           "llm_seconds": 0.0, "cost_usd": 0.0}
+        return totals
+
+    def record_node(self, thread_id: Optional[str], node: str, seconds: float) -> None:
+        """Records one execution of a graph node."""
+        with self._lock:
+            self._observe("node_seconds", node, seconds)
+            run = self._run(thread_id)
+            if run is not None:
+                totals = self._node(run, node)
+                totals["calls"] += 1
+                totals["seconds"] += seconds
+
+    def record_llm(self, thread_id: Optional[str], node: Optional[str], record: Dict[str, Any]) -> None:
+        """Records a chat model call (see PipelineCallbackHandler.on_llm_end for the record's keys)."""
+        model = record["model"] or "unknown"
+        with self._lock:
+            self._observe("llm_seconds", model, record["latency_seconds"])
+            if record["ttft_seconds"] is not None:
+                self._observe("llm_ttft_seconds", model, record["ttft_seconds"])
+            self._observe("llm_input_tokens", model, record["input_tokens"] + record["cache_read_input_tokens"]
+                          + record["cache_creation_input_tokens"], TOKEN_BUCKETS)
+            self._observe("llm_output_tokens", model, record["output_tokens"], TOKEN_BUCKETS)
+            if record["cost_usd"] is not None:
+                self._counters["llm_cost_usd"] = self._counters.get("llm_cost_usd", 0.0) + record["cost_usd"]
+
+            run = self._run(thread_id)
+            if run is None:
+                return
+            llm = run["llm"]
+            llm["calls"] += 1
+            llm["seconds"] += record["latency_seconds"]
+            for key in ("input_tokens", "output_tokens", "thinking_tokens", "cache_read_input_tokens",
+                        "cache_creation_input_tokens"):
+                llm[key] += record[key]
+            llm["cache_hits"] += bool(record["cache_read_input_tokens"])
+            if record["cost_usd"] is None:
+                llm["unpriced_calls"] += 1
+            else:
+                llm["cost_usd"] += record["cost_usd"]
+            if node:
+                totals = self._node(run, node)
+                totals["llm_calls"] += 1
+                totals["llm_seconds"] += record["latency_seconds"]
+                totals["cost_usd"] += record["cost_usd"] or 0.0
+
+    def record_search(self, thread_id: Optional[str], search_api: str, seconds: float, queue_seconds: float,
+                      failed: bool) -> None:
+        """Records a search call, with the time it spent waiting on rate limiters."""
+        with self._lock:
+            self._observe("search_seconds", search_api, seconds)
+            self._observe("search_queue_seconds", search_api, queue_seconds)
+            run = self._run(thread_id)
+            if run is not None:
+                search = run["search"]
+                search["calls"] += 1
+                search["failures"] += failed
+                search["seconds"] += seconds
+                search["queue_seconds"] += queue_seconds
+
+    def pop_run(self, thread_id: str) -> Dict[str, Any]:
+        """Returns and forgets the totals of a finished run, rounded for display."""
+        with self._lock:
+            run = self._runs.pop(thread_id, None) or _new_run_summary()
+        for totals in run["nodes"].values():
+            for key in ("seconds", "llm_seconds"):
+                totals[key] = round(totals[key], 3)
+            totals["cost_usd"] = round(totals["cost_usd"], 4)
+        run["llm"]["seconds"] = round(run["llm"]["seconds"], 3)
+        run["llm"]["cost_usd"] = round(run["llm"]["cost_usd"], 4)
+        for key in ("seconds", "queue_seconds"):
+            run["search"][key] = round(run["search"][key], 3)
+        return run
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            histograms = {}
+            for (metric, label), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(metric, {})[label] = histogram.snapshot()
+            return {
+                "histograms": histograms,
+                "llm_cost_usd": round(self._counters.get("llm_cost_usd", 0.0), 4),
+                "runs_in_progress": len(self._runs),
+            }
+
+
+pipeline_metrics = PipelineMetrics()
+
+
+class PipelineCallbackHandler(BaseCallbackHandler):
+    """Records graph node and chat model timings, tokens and costs into pipeline_metrics.
+
+    Attach it to a graph run's callbacks. The thread_id is read from the run's
+    metadata (LangGraph copies the configurable there), falling back to
+    current_thread_id; chat model calls are attributed to the node they run in.
+    """
+
+    # Only takes a lock and reads the clock, so it need not run in an executor
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: Dict[UUID, Tuple[Optional[str], str, float]] = {}
+        self._calls: Dict[UUID, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _thread_id(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+        return (metadata or {}).get("thread_id") or current_thread_id.get()
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # Nested runnables inherit langgraph_node; only the node's own run carries its name
+        if node and kwargs.get("name") == node:
+            with self._lock:
+                self._nodes[run_id] = (self._thread_id(metadata), node, time.perf_counter())
+
+    def _end_node(self, run_id: UUID) -> None:
+        with self._lock:
+            started = self._nodes.pop(run_id, None)
+        if started is not None:
+            thread_id, node, started_at = started
+            pipeline_metrics.record_node(thread_id, node, time.perf_counter() - started_at)
+
+    def on_chain_end(self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_node(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # Interrupts and errors end a node too; its time up to then still counts
+        self._end_node(run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        model = (metadata.get("ls_model_name") or (serialized.get("kwargs") or {}).get("model")
+                 or (serialized.get("kwargs") or {}).get("model_name"))
+        with self._lock:
+            self._calls[run_id] = {
+                "thread_id": self._thread_id(metadata),
+                # Calls outside the graph (e.g. the final writer) can name their stage in metadata
+                "node": metadata.get("langgraph_node") or metadata.get("pipeline_stage"),
+                "model": model,
+                "started_at": time.perf_counter(),
+                "first_token_at": None,
+            }
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            call = self._calls.get(run_id)
+            if call is not None and call["first_token_at"] is None:
+                call["first_token_at"] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        ended_at = time.perf_counter()
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+
+        usage = _usage_metadata(response)
+        details = usage.get("input_token_details") or {}
+        cache_read = details.get("cache_read") or 0
+        cache_creation = details.get("cache_creation") or 0
+        uncached = max(0, (usage.get("input_tokens") or 0) - cache_read - cache_creation)
+        output_tokens = usage.get("output_tokens") or 0
+        first_token_at = call["first_token_at"]
+
+        pipeline_metrics.record_llm(call["thread_id"], call["node"], {
+            "model": call["model"],
+            "input_tokens": uncached,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_creation,
+            "output_tokens": output_tokens,
+            "thinking_tokens": _thinking_tokens(response, usage),
+            "cost_usd": estimate_cost(call["model"], uncached, cache_read, cache_creation, output_tokens),
+            "latency_seconds": ended_at - call["started_at"],
+            "ttft_seconds": first_token_at - call["started_at"] if first_token_at else None,
+        })
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._calls.pop(run_id, None)
+
+
+pipeline_callback = PipelineCallbackHandler()
+
+
+def record_queue_wait(seconds: float) -> None:
+    """Adds time spent waiting on a rate limiter to the search being timed, if any."""
+    waits = _search_queue_seconds.get()
+    if waits is not None:
+        waits.append(seconds)
+
+
+@contextlib.contextmanager
+def time_search(search_api: str) -> Iterator[None]:
+    """
+    Records the wall time and rate limiter queue time of a search under the current thread_id.
+
+    Args:
+        search_api: The search API being called
+
+    Yields:
+        None; the search is recorded as failed if the block raises
+    """
+    waits: List[float] = []
+    token = _search_queue_seconds.set(waits)
+    started_at = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        _search_queue_seconds.reset(token)
+        pipeline_metrics.record_search(current_thread_id.get(), search_api, time.perf_counter() - started_at,
+                                       sum(waits), failed)
+
+
+def pop_run_summary(thread_id: str) -> Dict[str, Any]:
+    """
+    Returns and forgets the pipeline totals of a finished report run.
+
+    Args:
+        thread_id: The run's graph thread_id
+
+    Returns:
+        Dict[str, Any]: Wall time and LLM usage per node, LLM token and cost totals,
+            and search time and rate limiter queue time
+    """
+    return pipeline_metrics.pop_run(thread_id)
+
+
+def get_pipeline_metrics() -> Dict[str, Any]:
+    """Returns the pipeline histograms for the metrics endpoint."""
+    return pipeline_metrics.snapshot()
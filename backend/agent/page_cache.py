@@ -0,0 +1,261 @@
+"""
+Persistent on-disk cache of extracted page content.
+
+Related topics keep pulling the same major-outlet articles, which used to be
+downloaded and parsed again on every run. Extracted text is stored in a local
+SQLite database keyed by canonical URL, together with the page's ETag and
+Last-Modified validators:
+
+- within PAGE_CACHE_MAX_AGE seconds a hit is served without touching the network
+  or the HTML parser;
+- after that the page is revalidated with a conditional GET, and a 304 serves the
+  cached text, again without parsing;
+- once the cache outgrows PAGE_CACHE_MAX_BYTES, least recently used pages are
+  evicted.
+
+PAGE_CACHE_DIR selects the directory (a per-user directory in the system temp dir
+by default, since it is the only writable location on some hosts);
+PAGE_CACHE_MAX_BYTES=0 disables caching. Cached text goes straight into prompts, so
+the cache is only used if its directory belongs to the current user and no one else
+can write to it.
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Literal, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from backend.agent.extract import extract_markdown, extract_text
+from backend.agent.fetch import FetchResult, get_fetch_scheduler
+
+_USER_SUFFIX = f"-{os.getuid()}" if hasattr(os, "getuid") else ""
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR",
+                           os.path.join(tempfile.gettempdir(), f"fourthbranch-page-cache{_USER_SUFFIX}"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+PAGE_CACHE_MAX_AGE = float(os.getenv("PAGE_CACHE_MAX_AGE", 3600))
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ocid", "cmpid", "smid", "ref"}
+
+ExtractionKind = Literal["text", "markdown"]
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalises a URL so trivially different links to the same page share a cache entry.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking
+    parameters (utm_*, fbclid, ...), and sorts the remaining query parameters.
+
+    Args:
+        url: The URL to normalise
+
+    Returns:
+        str: The canonical URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme, parts.port) in {("http", 80), ("https", 443)}:
+        host = f"{host}:{parts.port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS)
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _private_directory(directory: str) -> str:
+    """Creates directory with mode 0o700 if needed, and checks that other users cannot plant files in it."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        info = os.stat(directory)
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{directory} is owned by another user")
+        if info.st_mode & 0o022:
+            raise PermissionError(f"{directory} is writable by other users")
+    return directory
+
+
+@dataclass
+class CachedPage:
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class PageCache:
+    """SQLite-backed LRU cache of extracted page content.
+
+    Args:
+        directory: Directory holding the cache database
+        max_bytes: Total size of cached text above which LRU eviction kicks in
+        max_age: Seconds a cached page is served without revalidation
+    """
+
+    def __init__(self, directory: str = PAGE_CACHE_DIR, max_bytes: int = PAGE_CACHE_MAX_BYTES,
+                 max_age: float = PAGE_CACHE_MAX_AGE):
+        _private_directory(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "pages.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (url, kind)
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self._db.commit()
+        # Running total of cached bytes, so puts do not scan the table. Other processes
+        # sharing the database make it drift, so it is recounted whenever it hits the limit.
+        self._total_bytes = self._count_bytes()
+
+    def _count_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def get(self, url: str, kind: ExtractionKind) -> Optional[CachedPage]:
+        """Returns the cached page for a canonical URL and marks it as recently used."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text, etag, last_modified, fetched_at FROM pages WHERE url = ? AND kind = ?",
+                (url, kind)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE pages SET accessed_at = ? WHERE url = ? AND kind = ?",
+                             (time.time(), url, kind))
+            self._db.commit()
+        return CachedPage(*row)
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return time.time() - page.fetched_at < self.max_age
+
+    def mark_revalidated(self, url: str, kind: ExtractionKind) -> None:
+        """Restarts the freshness window after a 304 Not Modified."""
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ? WHERE url = ? AND kind = ?",
+                             (time.time(), url, kind))
+            self._db.commit()
+
+    def put(self, url: str, kind: ExtractionKind, text: str,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Stores extracted text for a canonical URL, evicting LRU pages if needed."""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            replaced = self._db.execute("SELECT size FROM pages WHERE url = ? AND kind = ?",
+                                        (url, kind)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, kind, text, etag, last_modified, size, now, now))
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._total_bytes = self._count_bytes()
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so a full cache does not evict on every insert
+        target = self.max_bytes * 0.9
+        rows = self._db.execute("SELECT url, kind, size FROM pages ORDER BY accessed_at").fetchall()
+        for url, kind, size in rows:
+            if total <= target:
+                break
+            self._db.execute("DELETE FROM pages WHERE url = ? AND kind = ?", (url, kind))
+            total -= size
+        self._total_bytes = total
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Returns the process-wide page cache, or None when caching is disabled or unavailable."""
+    global _cache
+    if PAGE_CACHE_MAX_BYTES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = PageCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Warning: Page cache disabled: {str(e)}")
+                return None
+        return _cache
+
+
+@dataclass
+class ExtractedPage:
+    """Extracted content of a page, or the fetch that failed to produce it."""
+    url: str
+    text: Optional[str] = None
+    fetch: Optional[FetchResult] = None  # None when served from the cache without a request
+    from_cache: bool = False
+
+
+async def fetch_and_extract(urls: List[str], kind: ExtractionKind,
+                            headers: Optional[Dict[str, str]] = None,
+                            timeout: Optional[float] = None) -> List[ExtractedPage]:
+    """
+    Fetches pages through the shared scheduler and extracts their content, using the page cache.
+
+    Args:
+        urls: URLs to fetch
+        kind: "text" for plain text, "markdown" for markdown
+        headers: Optional request headers
+        timeout: Connect and per-read timeout; defaults to the scheduler's
+
+    Returns:
+        List[ExtractedPage]: One entry per URL, in input order. text is None when the
+            page could not be fetched or extracted; fetch then holds the reason.
+    """
+    cache = get_page_cache()
+    scheduler = get_fetch_scheduler()
+    extract = extract_text if kind == "text" else extract_markdown
+
+    async def process(url):
+        key = canonicalize_url(url)
+        cached = await asyncio.to_thread(cache.get, key, kind) if cache else None
+        if cached is not None and cache.is_fresh(cached):
+            return ExtractedPage(url=url, text=cached.text, from_cache=True)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached.etag:
+                request_headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                request_headers["If-Modified-Since"] = cached.last_modified
+
+        page = await scheduler.fetch(url, headers=request_headers, timeout=timeout)
+        if page.status_code == 304 and cached is not None:
+            await asyncio.to_thread(cache.mark_revalidated, key, kind)
+            return ExtractedPage(url=url, text=cached.text, fetch=page, from_cache=True)
+
+        if page.error is not None or page.skipped is not None or page.status_code != 200:
+            return ExtractedPage(url=url, fetch=page)
+
+        if kind == "markdown" and 'text/html' not in page.content_type:
+            return ExtractedPage(url=url, fetch=page)
+
+        text = await extract(page.text)
+        if cache:
+            await asyncio.to_thread(cache.put, key, kind, text,
+                                    page.headers.get("etag"), page.headers.get("last-modified"))
+        return ExtractedPage(url=url, text=text, fetch=page)
+
+    return await asyncio.gather(*(process(url) for url in urls))
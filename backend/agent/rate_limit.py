@@ -0,0 +1,143 @@
+"""
+Process-wide rate limiting for search providers.
+
+Each provider gets one token bucket shared by every section and every report in the
+process, so concurrent sections pace themselves against the provider's documented
+rate instead of each call sleeping on its own schedule. A 429 from any caller pauses
+the whole bucket, and callers already waiting are queued again behind the pause
+so that they do not all resume at once.
+
+Buckets are loop-agnostic: state is guarded by a thread lock and callers wait with
+asyncio.sleep, because reports run both on the server loop and in worker threads
+under their own asyncio.run().
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from backend.agent.instrumentation import record_queue_wait
+
+# Documented request rates (requests per second, burst)
+DEFAULT_RATE_LIMITS = {
+    "exa": (5.0, 5.0),
+    # NCBI E-utilities: 3 requests/s without an API key, 10 with one
+    "pubmed": (3.0, 3.0),
+    "pubmed_with_api_key": (10.0, 10.0),
+}
+
+
+class AsyncTokenBucket:
+    """Token bucket that hands out reservations in arrival order.
+
+    acquire() deducts its tokens immediately, letting the balance go negative, and
+    sleeps until the deficit has been refilled. Later callers queue behind earlier
+    reservations, which keeps the bucket fair without an asyncio lock. A request for
+    more tokens than the capacity is charged in full and simply waits longer.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.configure(rate, capacity)
+        self._tokens = self.capacity
+        # Refill starts from here; it lies in the future while the bucket is paused
+        self._updated_at = time.monotonic()
+        # Bumped by back_off() so that waiting callers know to queue again
+        self._epoch = 0
+
+    def configure(self, rate: float, capacity: Optional[float] = None) -> None:
+        """Updates the refill rate (tokens per second) and burst capacity."""
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        with self._lock:
+            self.rate = float(rate)
+            self.capacity = float(capacity) if capacity else float(rate)
+
+    def _reserve(self, tokens: float) -> Tuple[int, float]:
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated_at:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            # While paused, the deficit is refilled only from the end of the pause
+            return self._epoch, wait + (self._updated_at - now)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Waits until the tokens are available.
+
+        Args:
+            tokens: Number of tokens (requests) to take
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        epoch, wait = self._reserve(tokens)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+            with self._lock:
+                backed_off = self._epoch != epoch
+            if not backed_off:
+                break
+            # The bucket was paused while waiting; queue again behind the pause
+            epoch, wait = self._reserve(tokens)
+        if waited > 0:
+            record_queue_wait(waited)
+        return waited
+
+    def back_off(self, seconds: float) -> None:
+        """Pauses the bucket for every caller, e.g. after a 429 response.
+
+        The bucket is empty when the pause ends, and callers that were waiting take
+        new reservations, spaced at the refill rate, after it.
+        """
+        with self._lock:
+            self._updated_at = max(self._updated_at, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._epoch += 1
+
+
+_buckets: Dict[str, AsyncTokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, requests_per_second: Optional[float] = None,
+                     burst: Optional[float] = None) -> AsyncTokenBucket:
+    """
+    Returns the process-wide token bucket for a provider, creating it on first use.
+
+    The bucket enforces the provider's limit for the whole process, so the rate it
+    was created with is kept; overrides passed by later callers are ignored.
+
+    Args:
+        provider: Key of the provider (see DEFAULT_RATE_LIMITS)
+        requests_per_second: Overrides the default rate when the bucket is created
+        burst: Overrides the default burst capacity when the bucket is created
+
+    Returns:
+        AsyncTokenBucket: The shared bucket for the provider
+    """
+    default_rate, default_burst = DEFAULT_RATE_LIMITS.get(provider, (1.0, 1.0))
+    rate = requests_per_second or default_rate
+    capacity = burst or (default_burst if not requests_per_second else rate)
+
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            bucket = _buckets[provider] = AsyncTokenBucket(rate, capacity)
+            return bucket
+
+    if (bucket.rate, bucket.capacity) != (rate, capacity):
+        print(f"Warning: {provider} rate limiter already runs at {bucket.rate}/s (burst {bucket.capacity}), "
+              f"ignoring {rate}/s (burst {capacity})")
+    return bucket
+
+
+def is_rate_limit_error(error: Any) -> bool:
+    """Best-effort check for HTTP 429 errors raised by provider SDKs."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "429" in str(error) or "Too Many Requests" in str(error)
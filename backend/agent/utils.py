@@ -1,19 +1,29 @@
 from langchain_core.tools import tool
-from langchain_community.utilities.pubmed import PubMedAPIWrapper
-from langchain_community.retrievers import ArxivRetriever
-from markdownify import markdownify
-from bs4 import BeautifulSoup
-from tavily import AsyncTavilyClient
-from linkup import LinkupClient
-from exa_py import Exa
 from urllib.parse import unquote
 import time
 import httpx
-import aiohttp
-import concurrent
 import random
-import requests
-from backend.agent.state import Section
+import re
+from backend.agent.formatting import (
+    deduplicate_and_format_sources,
+    format_scraped_pages,
+    format_search_results,
+    format_sections,
+)
+from backend.agent.clients import (
+    get_aiohttp_session,
+    get_exa_client,
+    get_http_client,
+    get_linkup_client,
+    get_scraping_executor,
+    get_tavily_client,
+)
+from backend.agent.configuration import DEFAULT_RAW_CONTENT_POLICY
+from backend.agent.cassette import get_cassette
+from backend.agent.circuit_breaker import get_circuit_breaker
+from backend.agent.page_cache import fetch_and_extract
+from backend.agent.rate_limit import get_rate_limiter, is_rate_limit_error
+from backend.tracing import start_span
 import os
 from typing import List, Dict, Any, Optional
 from typing import Union
@@ -35,6 +45,15 @@ def get_config_value(value):
         return value.value
 
 
+def get_config_flag(value) -> bool:
+    """
+    Helper function to handle boolean configuration values, which arrive as strings when set through the environment
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
 def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Filters the search_api_config dictionary to include only parameters accepted by the specified search API.
@@ -48,11 +67,13 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
     """
     # Define accepted parameters for each search API
     SEARCH_API_PARAMS = {
-        "exa": ["max_characters", "num_results", "include_domains", "exclude_domains", "subpages"],
+        "exa": ["max_characters", "num_results", "include_domains", "exclude_domains", "subpages",
+                "requests_per_second", "burst"],
         "tavily": ["max_results", "topic"],
-        "perplexity": [],  # Perplexity accepts no additional parameters
+        "perplexity": ["max_concurrency", "timeout", "max_retries"],
         "arxiv": ["load_max_docs", "get_full_documents", "load_all_available_meta"],
-        "pubmed": ["top_k_results", "email", "api_key", "doc_content_chars_max"],
+        "pubmed": ["top_k_results", "email", "api_key", "doc_content_chars_max",
+                   "requests_per_second", "burst"],
         "linkup": ["depth"],
     }
 
@@ -67,77 +88,72 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
     return {k: v for k, v in search_api_config.items() if k in accepted_params}
 
 
-def deduplicate_and_format_sources(search_response, max_tokens_per_source=5000, include_raw_content=True):
+def get_raw_content_policy(search_api: str, raw_content_policy: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Resolves how full page content is retrieved for the specified search API.
+
+    Args:
+        search_api (str): The search API identifier (e.g., "tavily", "googlesearch").
+        raw_content_policy (Optional[Dict[str, Dict[str, Any]]]): Per-API overrides from the configuration.
+
+    Returns:
+        Dict[str, Any]: The policy ("mode", and "top_k"/"min_score" for lazy mode), with overrides
+            applied over DEFAULT_RAW_CONTENT_POLICY. APIs without a policy default to eager.
+    """
+    policy = {"mode": "eager", **DEFAULT_RAW_CONTENT_POLICY.get(search_api, {})}
+    policy.update((raw_content_policy or {}).get(search_api) or {})
+    return policy
+
+
+def select_for_raw_content(results: List[Dict[str, Any]], top_k: Optional[int] = None,
+                           min_score: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Picks the search results worth fetching full content for.
+
+    Args:
+        results (List[Dict[str, Any]]): Search results with an optional 'score'
+        top_k (Optional[int]): Maximum number of results to pick, None for no limit
+        min_score (Optional[float]): Minimum score a result needs, None for no threshold
+
+    Returns:
+        List[Dict[str, Any]]: The highest-scoring results scoring at least min_score, best first
+    """
+    candidates = [result for result in results
+                  if min_score is None or (result.get('score') or 0.0) >= min_score]
+    candidates.sort(key=lambda result: result.get('score') or 0.0, reverse=True)
+    return candidates if top_k is None else candidates[:top_k]
+
+
+# Words too common to show that a source covers a section
+COVERAGE_STOPWORDS = {
+    "about", "after", "also", "analysis", "and", "are", "background", "before", "between", "both",
+    "conclusion", "context", "could", "current", "each", "from", "have", "how", "including", "into",
+    "introduction", "its", "key", "main", "more", "most", "other", "over", "overview", "section",
+    "should", "some", "such", "than", "that", "the", "their", "them", "these", "they", "this",
+    "those", "through", "topic", "under", "what", "when", "where", "which", "while", "with", "would",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'-]+")
+
+
+def section_context_coverage(section_name: str, section_description: str, source_str: str) -> float:
     """
-    Takes a list of search responses and formats them into a readable string.
-    Limits the raw_content to approximately max_tokens_per_source tokens.
+    Estimates how well existing search results cover a report section.
 
     Args:
-        search_responses: List of search response dicts, each containing:
-            - query: str
-            - results: List of dicts with fields:
-                - title: str
-                - url: str
-                - content: str
-                - score: float
-                - raw_content: str|None
-        max_tokens_per_source: int
-        include_raw_content: bool
+        section_name (str): The section's name
+        section_description (str): The section's description
+        source_str (str): Formatted search results
 
     Returns:
-        str: Formatted string with deduplicated sources
+        float: Fraction (0-1) of the section's distinctive keywords that appear in the sources
     """
-    # Collect all results
-    sources_list = []
-    for response in search_response:
-        sources_list.extend(response['results'])
-
-    # Deduplicate by URL
-    unique_sources = {source['url']: source for source in sources_list}
-
-    # Format output
-    formatted_text = "Content from sources:\n"
-    for i, source in enumerate(unique_sources.values(), 1):
-        formatted_text += f"{'='*80}\n"  # Clear section separator
-        formatted_text += f"Source: {source['title']}\n"
-        formatted_text += f"{'-'*80}\n"  # Subsection separator
-        formatted_text += f"URL: {source['url']}\n===\n"
-        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
-        if include_raw_content:
-            # Using rough estimate of 4 characters per token
-            char_limit = max_tokens_per_source * 4
-            # Handle None raw_content
-            raw_content = source.get('raw_content', '')
-            if raw_content is None:
-                raw_content = ''
-                print(
-                    f"Warning: No raw_content found for source {source['url']}")
-            if len(raw_content) > char_limit:
-                raw_content = raw_content[:char_limit] + "... [truncated]"
-            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
-        formatted_text += f"{'='*80}\n\n"  # End section separator
-
-    return formatted_text.strip()
-
-
-def format_sections(sections: list[Section]) -> str:
-    """ Format a list of sections into a string """
-    formatted_str = ""
-    for idx, section in enumerate(sections, 1):
-        formatted_str += f"""
-{'='*60}
-Section {idx}: {section.name}
-{'='*60}
-Description:
-{section.description}
-Requires Research:
-{section.research}
-
-Content:
-{section.content if section.content else '[Not yet written]'}
-
-"""
-    return formatted_str
+    keywords = {word for word in _WORD_RE.findall(f"{section_name} {section_description}".lower())
+                if len(word) > 3 and word not in COVERAGE_STOPWORDS}
+    if not keywords or not source_str:
+        return 0.0
+    source_words = set(_WORD_RE.findall(source_str.lower()))
+    return len(keywords & source_words) / len(keywords)
 
 
 async def tavily_search_async(search_queries, max_results: int = 5, topic: str = "general", include_raw_content: bool = True):
@@ -166,28 +182,119 @@ async def tavily_search_async(search_queries, max_results: int = 5, topic: str =
                     ]
                 }
     """
-    tavily_async_client = AsyncTavilyClient()
-    search_tasks = []
-    for query in search_queries:
-        search_tasks.append(
-            tavily_async_client.search(
-                query,
-                max_results=max_results,
-                include_raw_content=include_raw_content,
-                topic=topic
-            )
-        )
+    # Call the REST API on the shared keep-alive client; the SDK opens a new
+    # connection for every request.
+    client = get_tavily_client()
+
+    async def search_single_query(query):
+        response = await client.post("/search", json={
+            "query": query,
+            "max_results": max_results,
+            "include_raw_content": include_raw_content,
+            "topic": topic,
+        })
+        response.raise_for_status()
+        return response.json()
 
     # Execute all searches concurrently
-    search_docs = await asyncio.gather(*search_tasks)
+    search_docs = await asyncio.gather(*(search_single_query(query) for query in search_queries))
     return search_docs
 
 
-def perplexity_search(search_queries):
+# Maximum number of URLs the Tavily extract endpoint accepts per request
+TAVILY_EXTRACT_BATCH_SIZE = 20
+
+
+async def tavily_extract_async(urls: List[str]) -> Dict[str, str]:
+    """
+    Fetches the full content of pages with the Tavily extract API.
+
+    Args:
+        urls (List[str]): URLs to extract
+
+    Returns:
+        Dict[str, str]: Raw content by URL; URLs that failed to extract are missing
+    """
+    client = get_tavily_client()
+
+    async def extract_batch(batch):
+        response = await client.post("/extract", json={"urls": batch})
+        response.raise_for_status()
+        return response.json().get("results", [])
+
+    batches = [urls[i:i + TAVILY_EXTRACT_BATCH_SIZE] for i in range(0, len(urls), TAVILY_EXTRACT_BATCH_SIZE)]
+    responses = await asyncio.gather(*(extract_batch(batch) for batch in batches), return_exceptions=True)
+
+    raw_contents = {}
+    for batch, response in zip(batches, responses):
+        if isinstance(response, Exception):
+            print(f"Warning: Tavily extract failed for {len(batch)} URLs: {str(response)}")
+            continue
+        for item in response:
+            if item.get("raw_content"):
+                raw_contents[item["url"]] = item["raw_content"]
+    return raw_contents
+
+
+async def tavily_search_lazy_async(search_queries, max_results: int = 5, topic: str = "general",
+                                   top_k: Optional[int] = 3, min_score: Optional[float] = None):
+    """
+    Performs concurrent two-phase Tavily searches: snippets and scores first, then full
+    content only for the best results of each query.
+
+    Each query is extracted as soon as its own search returns, so queries do not wait
+    on each other between the two phases.
+
+    Args:
+        search_queries (List[str]): List of search queries to process
+        max_results (int): Maximum number of results per query
+        topic (str): Tavily search topic
+        top_k (Optional[int]): Results per query to fetch full content for, None for all
+        min_score (Optional[float]): Minimum score for a result's full content to be fetched
+
+    Returns:
+        List[dict]: Search responses in the tavily_search_async format; results that were
+            not selected (or failed to extract) have no raw_content
+    """
+    async def search_single_query(query):
+        search_doc, = await tavily_search_async([query], max_results=max_results, topic=topic,
+                                                include_raw_content=False)
+        selected = select_for_raw_content(search_doc['results'], top_k, min_score)
+        if selected:
+            raw_contents = await tavily_extract_async([result['url'] for result in selected])
+            for result in selected:
+                result['raw_content'] = raw_contents.get(result['url'])
+        return search_doc
+
+    return await asyncio.gather(*(search_single_query(query) for query in search_queries))
+
+
+async def tavily_search_with_policy(search_queries, raw_content_policy: Dict[str, Any], **kwargs):
+    """Runs a Tavily search retrieving full content as the raw content policy says."""
+    mode = raw_content_policy.get("mode", "eager")
+    if mode == "lazy":
+        return await tavily_search_lazy_async(search_queries, top_k=raw_content_policy.get("top_k"),
+                                              min_score=raw_content_policy.get("min_score"), **kwargs)
+    return await tavily_search_async(search_queries, include_raw_content=mode == "eager", **kwargs)
+
+
+PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
+# Status codes worth retrying: rate limiting and transient server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+async def perplexity_search(search_queries, max_concurrency: int = 3, timeout: float = 60.0, max_retries: int = 3):
     """Search the web using the Perplexity API.
 
+    Queries run concurrently (up to max_concurrency at a time) on a shared keep-alive
+    client. Rate-limited (429) and 5xx responses are retried with exponential backoff,
+    honouring Retry-After when the API sends it.
+
     Args:
         search_queries (List[SearchQuery]): List of search queries to process
+        max_concurrency (int): Maximum number of queries in flight at once. Defaults to 3.
+        timeout (float): Per-request timeout in seconds. Defaults to 60.
+        max_retries (int): Retries per query on 429/5xx and transport errors. Defaults to 3.
 
     Returns:
         List[dict]: List of search responses from Perplexity API, one per query. Each response has format:
@@ -215,9 +322,31 @@ def perplexity_search(search_queries):
         "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}"
     }
 
-    search_docs = []
-    for query in search_queries:
+    client = get_http_client("perplexity")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def post_with_retry(payload):
+        for attempt in range(max_retries + 1):
+            try:
+                response = await client.post(PERPLEXITY_API_URL, headers=headers, json=payload, timeout=timeout)
+            except httpx.TransportError:
+                # Timeouts and dropped connections are retried like 5xx responses
+                if attempt == max_retries:
+                    raise
+                await asyncio.sleep(2 ** attempt + random.random())
+                continue
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt + random.random()
+                print(f"Perplexity returned {response.status_code}, retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                continue
+
+            response.raise_for_status()  # Raise exception for bad status codes
+            return response.json()
 
+    async def process_query(query):
         payload = {
             "model": "sonar-pro",
             "messages": [
@@ -232,15 +361,10 @@ def perplexity_search(search_queries):
             ]
         }
 
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()  # Raise exception for bad status codes
+        async with semaphore:
+            data = await post_with_retry(payload)
 
         # Parse the response
-        data = response.json()
         content = data["choices"][0]["message"]["content"]
         citations = data.get("citations", ["https://perplexity.ai"])
 
@@ -267,23 +391,27 @@ def perplexity_search(search_queries):
             })
 
         # Format response to match Tavily structure
-        search_docs.append({
+        return {
             "query": query,
             "follow_up_questions": None,
             "answer": None,
             "images": [],
             "results": results
-        })
+        }
 
-    return search_docs
+    return await asyncio.gather(*(process_query(query) for query in search_queries))
 
 
 async def exa_search(search_queries, max_characters: Optional[int] = None, num_results=5,
                      include_domains: Optional[List[str]] = None,
                      exclude_domains: Optional[List[str]] = None,
-                     subpages: Optional[int] = None):
+                     subpages: Optional[int] = None,
+                     requests_per_second: Optional[float] = None,
+                     burst: Optional[float] = None):
     """Search the web using the Exa API.
 
+    Queries run concurrently, paced by the process-wide Exa rate limiter.
+
     Args:
         search_queries (List[SearchQuery]): List of search queries to process
         max_characters (int, optional): Maximum number of characters to retrieve for each result's raw content.
@@ -294,6 +422,8 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
         exclude_domains (List[str], optional): List of domains to exclude from search results.
             Cannot be used together with include_domains.
         subpages (int, optional): Number of subpages to retrieve per result. If None, subpages are not retrieved.
+        requests_per_second (float, optional): Overrides Exa's documented 5 requests/s limit.
+        burst (float, optional): Overrides the limiter's burst capacity.
 
     Returns:
         List[dict]: List of search responses from Exa API, one per query. Each response has format:
@@ -319,8 +449,8 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
         raise ValueError(
             "Cannot specify both include_domains and exclude_domains")
 
-    # Initialize Exa client (API key should be configured in your .env file)
-    exa = Exa(api_key=f"{os.getenv('EXA_API_KEY')}")
+    # Shared Exa client (API key should be configured in your .env file)
+    exa = get_exa_client()
 
     # Define the function to process a single query
     async def process_query(query):
@@ -451,36 +581,34 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
             "results": formatted_results
         }
 
-    # Process all queries sequentially with delay to respect rate limit
-    search_docs = []
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests (0.25s = 4 requests per second, well within the 5/s limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(0.25)
+    limiter = get_rate_limiter("exa", requests_per_second, burst)
 
-            result = await process_query(query)
-            search_docs.append(result)
-        except Exception as e:
-            # Handle exceptions gracefully
-            print(f"Error processing query '{query}': {str(e)}")
-            # Add a placeholder result for failed queries to maintain index alignment
-            search_docs.append({
-                "query": query,
-                "follow_up_questions": None,
-                "answer": None,
-                "images": [],
-                "results": [],
-                "error": str(e)
-            })
-
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e):
-                print("Rate limit exceeded. Adding additional delay...")
-                # Add a longer delay if we hit a rate limit
-                await asyncio.sleep(1.0)
+    async def process_query_limited(query, max_retries=2):
+        for attempt in range(max_retries + 1):
+            await limiter.acquire()
+            try:
+                return await process_query(query)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < max_retries:
+                    print("Exa rate limit exceeded. Backing off...")
+                    # Pause every concurrent Exa caller, not just this query
+                    limiter.back_off(1.0 * 2 ** attempt)
+                    continue
+
+                # Handle exceptions gracefully
+                print(f"Error processing query '{query}': {str(e)}")
+                # Add a placeholder result for failed queries to maintain index alignment
+                return {
+                    "query": query,
+                    "follow_up_questions": None,
+                    "answer": None,
+                    "images": [],
+                    "results": [],
+                    "error": str(e)
+                }
 
-    return search_docs
+    # Process all queries concurrently; the shared limiter enforces the rate
+    return await asyncio.gather(*(process_query_limited(query) for query in search_queries))
 
 
 async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents=True, load_all_available_meta=True):
@@ -513,6 +641,9 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
             }
     """
 
+    # Imported on first use to keep the API's cold start fast
+    from langchain_community.retrievers import ArxivRetriever
+
     async def process_single_query(query):
         try:
             # Create retriever for each query
@@ -645,16 +776,23 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
     return search_docs
 
 
-async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_key=None, doc_content_chars_max=4000):
+async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_key=None, doc_content_chars_max=4000,
+                              requests_per_second: Optional[float] = None, burst: Optional[float] = None):
     """
     Performs concurrent searches on PubMed using the PubMedAPIWrapper.
 
+    Queries run concurrently, paced by the process-wide PubMed rate limiter: every
+    E-utilities request (one search, then one fetch per article) waits for its own token.
+    A 429 response backs the limiter off for every concurrent PubMed caller.
+
     Args:
         search_queries (List[str]): List of search queries
         top_k_results (int, optional): Maximum number of documents to return per query. Default is 5.
         email (str, optional): Email address for PubMed API. Required by NCBI.
         api_key (str, optional): API key for PubMed API for higher rate limits.
         doc_content_chars_max (int, optional): Maximum characters for document content. Default is 4000.
+        requests_per_second (float, optional): Overrides NCBI's documented limit (3/s, or 10/s with an API key).
+        burst (float, optional): Overrides the limiter's burst capacity.
 
     Returns:
         List[dict]: List of search responses from PubMed, one per query. Each response has format:
@@ -676,23 +814,54 @@ async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_k
             }
     """
 
+    # Imported on first use to keep the API's cold start fast
+    from langchain_community.utilities.pubmed import PubMedAPIWrapper
+
+    limiter = get_rate_limiter(
+        "pubmed_with_api_key" if api_key else "pubmed", requests_per_second, burst)
+
     async def process_single_query(query):
         try:
             # print(f"Processing PubMed query: '{query}'")
 
-            # Create PubMed wrapper for the query
+            # Create PubMed wrapper for the query. With max_retry=0 it raises 429s instead of
+            # sleeping on them in the worker thread, unseen by the limiter
             wrapper = PubMedAPIWrapper(
                 top_k_results=top_k_results,
                 doc_content_chars_max=doc_content_chars_max,
                 email=email if email else "your_email@example.com",
-                api_key=api_key if api_key else ""
+                api_key=api_key if api_key else "",
+                max_retry=0
             )
 
             # Run the synchronous wrapper in a thread pool
             loop = asyncio.get_event_loop()
 
-            # Use wrapper.lazy_load instead of load to get better visibility
-            docs = await loop.run_in_executor(None, lambda: list(wrapper.lazy_load(query)))
+            # Step wrapper.lazy_load one article at a time, taking a token before each step.
+            # The first step runs the esearch request and fetches the first article
+            articles = wrapper.lazy_load(query)
+            docs = []
+            cost = 2
+            while True:
+                await limiter.acquire(cost)
+                cost = 1
+                try:
+                    doc = await loop.run_in_executor(None, next, articles, None)
+                except Exception as e:
+                    if not is_rate_limit_error(e):
+                        raise
+                    # Pause every concurrent PubMed caller, not just this query
+                    limiter.back_off(5.0)
+                    if not docs:
+                        raise
+                    print(f"Warning: PubMed rate limited query '{query}', keeping its first {len(docs)} articles")
+                    break
+                if doc is None:
+                    break
+                docs.append(doc)
+                if len(docs) >= top_k_results:
+                    # esearch returns at most top_k_results ids; skip the token for a last empty step
+                    break
 
             print(f"Query '{query}' returned {len(docs)} results")
 
@@ -754,44 +923,8 @@ async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_k
                 'error': str(e)
             }
 
-    # Process all queries with a reasonable delay between them
-    search_docs = []
-
-    # Start with a small delay that increases if we encounter rate limiting
-    delay = 1.0  # Start with a more conservative delay
-
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests
-            if i > 0:  # Don't delay the first request
-                # print(f"Waiting {delay} seconds before next query...")
-                await asyncio.sleep(delay)
-
-            result = await process_single_query(query)
-            search_docs.append(result)
-
-            # If query was successful with results, we can slightly reduce delay (but not below minimum)
-            if result.get('results') and len(result['results']) > 0:
-                delay = max(0.5, delay * 0.9)  # Don't go below 0.5 seconds
-
-        except Exception as e:
-            # Handle exceptions gracefully
-            error_msg = f"Error in main loop processing PubMed query '{query}': {str(e)}"
-            print(error_msg)
-
-            search_docs.append({
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            })
-
-            # If we hit an exception, increase delay for next query
-            delay = min(5.0, delay * 1.5)  # Don't exceed 5 seconds
-
-    return search_docs
+    # Process all queries concurrently; the shared limiter enforces the rate
+    return await asyncio.gather(*(process_single_query(query) for query in search_queries))
 
 
 async def linkup_search(search_queries, depth: Optional[str] = "standard"):
@@ -815,7 +948,7 @@ async def linkup_search(search_queries, depth: Optional[str] = "standard"):
                 ]
             }
     """
-    client = LinkupClient()
+    client = get_linkup_client()
     search_tasks = []
     for query in search_queries:
         search_tasks.append(
@@ -841,7 +974,8 @@ async def linkup_search(search_queries, depth: Optional[str] = "standard"):
     return search_results
 
 
-async def google_search_async(search_queries: Union[str, List[str]], max_results: int = 5, include_raw_content: bool = True):
+async def google_search_async(search_queries: Union[str, List[str]], max_results: int = 5, include_raw_content: bool = True,
+                              raw_content_top_k: Optional[int] = None):
     """
     Performs concurrent web searches using Google.
     Uses Google Custom Search API if environment variables are set, otherwise falls back to web scraping.
@@ -850,6 +984,8 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
         search_queries (List[str]): List of search queries to process
         max_results (int): Maximum number of results to return per query
         include_raw_content (bool): Whether to fetch full page content
+        raw_content_top_k (Optional[int]): Only fetch full content for the first top_k results
+            of each query, None for all
 
     Returns:
         List[dict]: List of search responses from Google, one per query
@@ -864,6 +1000,10 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
     if isinstance(search_queries, str):
         search_queries = [search_queries]
 
+    # Imported on first use to keep the API's cold start fast
+    import requests
+    from bs4 import BeautifulSoup
+
     # Define user agent generator
     def get_useragent():
         """Generates a random user agent string."""
@@ -873,9 +1013,8 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
         openssl_version = f"OpenSSL/{random.randint(1, 3)}.{random.randint(0, 4)}.{random.randint(0, 9)}"
         return f"{lynx_version} {libwww_version} {ssl_mm_version} {openssl_version}"
 
-    # Create executor for running synchronous operations
-    executor = None if use_api else concurrent.futures.ThreadPoolExecutor(
-        max_workers=5)
+    # Shared executor for running synchronous scraping operations
+    executor = None if use_api else get_scraping_executor()
 
     # Use a semaphore to limit concurrent requests
     semaphore = asyncio.Semaphore(5 if use_api else 2)
@@ -903,26 +1042,26 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                         print(
                             f"Requesting {num} results for '{query}' from Google API...")
 
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
-                                if response.status != 200:
-                                    error_text = await response.text()
-                                    print(
-                                        f"API error: {response.status}, {error_text}")
-                                    break
-
-                                data = await response.json()
-
-                                # Process search results
-                                for item in data.get('items', []):
-                                    result = {
-                                        "title": item.get('title', ''),
-                                        "url": item.get('link', ''),
-                                        "content": item.get('snippet', ''),
-                                        "score": None,
-                                        "raw_content": item.get('snippet', '')
-                                    }
-                                    results.append(result)
+                        session = get_aiohttp_session()
+                        async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
+                            if response.status != 200:
+                                error_text = await response.text()
+                                print(
+                                    f"API error: {response.status}, {error_text}")
+                                break
+
+                            data = await response.json()
+
+                            # Process search results
+                            for item in data.get('items', []):
+                                result = {
+                                    "title": item.get('title', ''),
+                                    "url": item.get('link', ''),
+                                    "content": item.get('snippet', ''),
+                                    "score": None,
+                                    "raw_content": item.get('snippet', '')
+                                }
+                                results.append(result)
 
                         # Respect API quota with a small delay
                         await asyncio.sleep(0.2)
@@ -1033,56 +1172,29 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
 
                 # If requested, fetch full page content asynchronously (for both API and web scraping)
                 if include_raw_content and results:
-                    content_semaphore = asyncio.Semaphore(3)
-
-                    async with aiohttp.ClientSession() as session:
-                        fetch_tasks = []
-
-                        async def fetch_full_content(result):
-                            async with content_semaphore:
-                                url = result['url']
-                                headers = {
-                                    'User-Agent': get_useragent(),
-                                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-                                }
+                    headers = {
+                        'User-Agent': get_useragent(),
+                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+                    }
+                    # The shared scheduler paces requests per host across all queries; pages
+                    # in the page cache skip the network and the parser
+                    to_fetch = results if raw_content_top_k is None else results[:raw_content_top_k]
+                    pages = await fetch_and_extract(
+                        [result['url'] for result in to_fetch], "text", headers=headers)
+
+                    for result, page in zip(to_fetch, pages):
+                        if page.text is not None:
+                            result['raw_content'] = page.text
+                        elif page.fetch.error is not None:
+                            print(
+                                f"Warning: Failed to fetch content for {page.url}: {page.fetch.error}")
+                            result['raw_content'] = f"[Error fetching content: {page.fetch.error}]"
+                        elif page.fetch.skipped is not None:
+                            # PDFs, other binary files and oversized pages are not downloaded
+                            result['raw_content'] = f"[Content not downloaded: {page.fetch.skipped}. Content extraction not supported for this file.]"
 
-                                try:
-                                    await asyncio.sleep(0.2 + random.random() * 0.6)
-                                    async with session.get(url, headers=headers, timeout=10) as response:
-                                        if response.status == 200:
-                                            # Check content type to handle binary files
-                                            content_type = response.headers.get(
-                                                'Content-Type', '').lower()
-
-                                            # Handle PDFs and other binary files
-                                            if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
-                                                # For PDFs, indicate that content is binary and not parsed
-                                                result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
-                                            else:
-                                                try:
-                                                    # Try to decode as UTF-8 with replacements for non-UTF8 characters
-                                                    html = await response.text(errors='replace')
-                                                    soup = BeautifulSoup(
-                                                        html, 'html.parser')
-                                                    result['raw_content'] = soup.get_text(
-                                                    )
-                                                except UnicodeDecodeError as ude:
-                                                    # Fallback if we still have decoding issues
-                                                    result[
-                                                        'raw_content'] = f"[Could not decode content: {str(ude)}]"
-                                except Exception as e:
-                                    print(
-                                        f"Warning: Failed to fetch content for {url}: {str(e)}")
-                                    result['raw_content'] = f"[Error fetching content: {str(e)}]"
-                                return result
-
-                        for result in results:
-                            fetch_tasks.append(fetch_full_content(result))
-
-                        updated_results = await asyncio.gather(*fetch_tasks)
-                        results = updated_results
-                        print(
-                            f"Fetched full content for {len(results)} results")
+                    print(
+                        f"Fetched full content for {len(to_fetch)} of {len(results)} results")
 
                 return {
                     "query": query,
@@ -1098,21 +1210,21 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                     "follow_up_questions": None,
                     "answer": None,
                     "images": [],
-                    "results": []
+                    "results": [],
+                    "error": str(e)
                 }
 
-    try:
-        # Create tasks for all search queries
-        search_tasks = [search_single_query(query) for query in search_queries]
+    # Create tasks for all search queries
+    search_tasks = [search_single_query(query) for query in search_queries]
+
+    # Execute all searches concurrently
+    search_results = await asyncio.gather(*search_tasks)
+
+    return search_results
 
-        # Execute all searches concurrently
-        search_results = await asyncio.gather(*search_tasks)
 
-        return search_results
-    finally:
-        # Only shut down executor if it was created
-        if executor:
-            executor.shutdown(wait=False)
+# Connect and per-read timeout of scrape_pages, as before it went through the shared scheduler
+SCRAPE_TIMEOUT = 30.0
 
 
 async def scrape_pages(titles: List[str], urls: List[str]) -> str:
@@ -1121,8 +1233,9 @@ async def scrape_pages(titles: List[str], urls: List[str]) -> str:
 
     This function:
     1. Takes a list of page titles and URLs
-    2. Makes asynchronous HTTP requests to each URL
-    3. Converts HTML content to markdown
+    2. Fetches every URL concurrently through the shared fetch scheduler, serving
+       cached pages from the page cache
+    3. Converts HTML content to markdown in the extraction process pool
     4. Formats all content with clear source attribution
 
     Args:
@@ -1134,47 +1247,25 @@ async def scrape_pages(titles: List[str], urls: List[str]) -> str:
              with clear section dividers and source attribution
     """
 
-    # Create an async HTTP client
-    async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-        pages = []
-
-        # Fetch each URL and convert to markdown
-        for url in urls:
-            try:
-                # Fetch the content
-                response = await client.get(url)
-                response.raise_for_status()
-
-                # Convert HTML to markdown if successful
-                if response.status_code == 200:
-                    # Handle different content types
-                    content_type = response.headers.get('Content-Type', '')
-                    if 'text/html' in content_type:
-                        # Convert HTML to markdown
-                        markdown_content = markdownify(response.text)
-                        pages.append(markdown_content)
-                    else:
-                        # For non-HTML content, just mention the content type
-                        pages.append(
-                            f"Content type: {content_type} (not converted to markdown)")
-                else:
-                    pages.append(
-                        f"Error: Received status code {response.status_code}")
+    # Fetch all URLs concurrently through the shared per-host scheduler and page cache
+    def to_page_content(page):
+        if page.text is not None:
+            return page.text
+        fetch = page.fetch
+        if fetch.error is not None:
+            # Handle any exceptions during fetch
+            return f"Error fetching URL: {fetch.error}"
+        if fetch.skipped is not None:
+            return f"Content not downloaded: {fetch.skipped}"
+        if fetch.status_code != 200:
+            return f"Error: Received status code {fetch.status_code}"
+        # For non-HTML content, just mention the content type
+        return f"Content type: {fetch.content_type} (not converted to markdown)"
 
-            except Exception as e:
-                # Handle any exceptions during fetch
-                pages.append(f"Error fetching URL: {str(e)}")
+    pages = [to_page_content(page) for page in
+             await fetch_and_extract(urls, "markdown", timeout=SCRAPE_TIMEOUT)]
 
-        # Create formatted output
-        formatted_output = f"Search results: \n\n"
-
-        for i, (title, url, page) in enumerate(zip(titles, urls, pages)):
-            formatted_output += f"\n\n--- SOURCE {i+1}: {title} ---\n"
-            formatted_output += f"URL: {url}\n\n"
-            formatted_output += f"FULL CONTENT:\n {page}"
-            formatted_output += "\n\n" + "-" * 80 + "\n"
-
-    return formatted_output
+    return format_scraped_pages(titles, urls, pages)
 
 
 @tool
@@ -1188,48 +1279,87 @@ async def tavily_search(queries: List[str]) -> str:
     Returns:
         str: A formatted string of search results
     """
-    # Use tavily_search_async with include_raw_content=True to get content directly
-    search_results = await tavily_search_async(
+    # Full content only for the best results, per the default raw content policy
+    search_results = await tavily_search_with_policy(
         queries,
+        get_raw_content_policy("tavily", None),
         max_results=5,
-        topic="general",
-        include_raw_content=True
+        topic="general"
     )
 
-    # Format the search results directly using the raw_content already provided
-    formatted_output = f"Search results: \n\n"
-
-    # Deduplicate results by URL
-    unique_results = {}
-    for response in search_results:
-        for result in response['results']:
-            url = result['url']
-            if url not in unique_results:
-                unique_results[url] = result
-
-    # Format the unique results
-    for i, (url, result) in enumerate(unique_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            # Limit content size
-            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:30000]}"
-        formatted_output += "\n\n" + "-" * 80 + "\n"
-
-    if unique_results:
-        return formatted_output
+    return format_search_results(search_results, max_chars_per_source=30000)
+
+
+SEARCH_APIS = ("tavily", "perplexity", "exa", "arxiv", "pubmed", "linkup", "googlesearch")
+
+
+async def execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                         raw_content_policy: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Runs the queries on a single search API and returns its raw search responses.
+
+    When a cassette is configured (CASSETTE_MODE), the call is recorded to or replayed from it.
+    """
+    cassette = get_cassette()
+    if cassette is not None:
+        return await cassette.search(
+            search_api, query_list, {**params_to_pass, "raw_content_policy": raw_content_policy},
+            lambda: _run_search(search_api, query_list, params_to_pass, raw_content_policy))
+    return await _run_search(search_api, query_list, params_to_pass, raw_content_policy)
+
+
+async def _run_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                      raw_content_policy: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if search_api == "tavily":
+        return await tavily_search_with_policy(query_list, raw_content_policy, **params_to_pass)
+    elif search_api == "perplexity":
+        return await perplexity_search(query_list, **params_to_pass)
+    elif search_api == "exa":
+        return await exa_search(query_list, **params_to_pass)
+    elif search_api == "arxiv":
+        return await arxiv_search_async(query_list, **params_to_pass)
+    elif search_api == "pubmed":
+        return await pubmed_search_async(query_list, **params_to_pass)
+    elif search_api == "linkup":
+        return await linkup_search(query_list, **params_to_pass)
+    elif search_api == "googlesearch":
+        mode = raw_content_policy.get("mode", "eager")
+        return await google_search_async(
+            query_list, include_raw_content=mode != "off",
+            raw_content_top_k=raw_content_policy.get("top_k") if mode == "lazy" else None,
+            **params_to_pass)
     else:
-        return "No valid search results found. Please try different search queries or use a different search API."
+        raise ValueError(f"Unsupported search API: {search_api}")
+
+
+def format_search_response(search_api: str, search_results: List[Dict[str, Any]]) -> str:
+    """Formats a search API's raw responses for the writer."""
+    if search_api == "tavily":
+        return format_search_results(search_results, max_chars_per_source=30000)
+    return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
 
 
-async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict) -> str:
+async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                                    raw_content_policy: Optional[Dict[str, Any]] = None,
+                                    fallback_search_apis: Optional[List[str]] = None,
+                                    search_api_config: Optional[Dict[str, Any]] = None,
+                                    raw_content_policies: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
     """Select and execute the appropriate search API.
 
+    Every API is guarded by its circuit breaker. A call that raises or times out counts
+    as a failure, and the next API in fallback_search_apis is tried; APIs whose breaker
+    is open are skipped without a request. A call without results is also passed on to
+    the next API, but only counts as a failure if every query reported an error.
+
     Args:
         search_api: Name of the search API to use
         query_list: List of search queries to execute
         params_to_pass: Parameters to pass to the search API
+        raw_content_policy: How to retrieve full page content (see get_raw_content_policy);
+            defaults to the API's default policy
+        fallback_search_apis: Search APIs to try in order when search_api fails or is unavailable
+        search_api_config: Search API configuration, filtered for each fallback API
+        raw_content_policies: Per-API raw content policy overrides from the configuration,
+            resolved for each fallback API
 
     Returns:
         Formatted string containing search results
@@ -1237,26 +1367,58 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
     Raises:
         ValueError: If an unsupported search API is specified
     """
-    if search_api == "tavily":
-        # Tavily search tool used with both workflow and agent
-        return await tavily_search.ainvoke({'queries': query_list}, **params_to_pass)
-    elif search_api == "perplexity":
-        search_results = perplexity_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "exa":
-        search_results = await exa_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "arxiv":
-        search_results = await arxiv_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "pubmed":
-        search_results = await pubmed_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "linkup":
-        search_results = await linkup_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "googlesearch":
-        search_results = await google_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    else:
-        raise ValueError(f"Unsupported search API: {search_api}")
+    candidates = [search_api] + [api for api in fallback_search_apis or [] if api != search_api]
+    for api in candidates:
+        if api not in SEARCH_APIS:
+            raise ValueError(f"Unsupported search API: {api}")
+    last_error = None
+    empty_response = None
+
+    for api in candidates:
+        breaker = get_circuit_breaker(api)
+        ticket = breaker.allow_request()
+        if ticket is None:
+            print(f"Warning: Skipping {api} search, its circuit is open")
+            continue
+
+        if api == search_api:
+            params, policy = params_to_pass, raw_content_policy or get_raw_content_policy(api, None)
+        else:
+            params = get_search_params(api, search_api_config)
+            policy = get_raw_content_policy(api, raw_content_policies)
+
+        start = time.perf_counter()
+        try:
+            with start_span(f"search {api}", {"search.api": api, "search.queries": len(query_list)}):
+                search_results = await execute_search(api, query_list, params, policy)
+            # Inside the try, so that a response that cannot be formatted still settles the ticket
+            formatted = format_search_response(api, search_results)
+        except asyncio.CancelledError:
+            breaker.release(ticket)
+            raise
+        except Exception as e:
+            breaker.record_failure(ticket)
+            print(f"Warning: {api} search failed: {str(e)}")
+            last_error = e
+            continue
+
+        if not any(response.get('results') for response in search_results):
+            # exa, pubmed and google report errors as empty results with an error; a quiet
+            # query that legitimately found nothing says nothing about the provider's health
+            if search_results and all(response.get('error') for response in search_results):
+                breaker.record_failure(ticket)
+            else:
+                breaker.record_success(ticket, time.perf_counter() - start)
+            print(f"Warning: {api} search returned no results")
+            empty_response = formatted
+            continue
+
+        breaker.record_success(ticket, time.perf_counter() - start)
+        return formatted
+
+    if empty_response is not None:
+        return empty_response
+    if last_error is not None:
+        raise last_error
+    print(f"Warning: No search API available, circuits open for {', '.join(candidates)}")
+    return "No valid search results found. Every configured search API is temporarily unavailable."
@@ -0,0 +1,414 @@
+"""
+Writing-style variants of reports, generated on demand.
+
+A report used to be written eagerly in all eight writing styles, although most
+combinations are rarely read. A report is now stored once with its brief, and
+only the most popular styles among users (VARIANT_PREWARM_TOP_N, at least one)
+are written right away. Any other (report, style) combination requested from
+/articles or /articles/{id} is queued for background generation, and then
+persisted; the read endpoints serve the closest existing style meanwhile.
+
+Generation runs on a small thread pool and is single-flight per combination
+within the process. Across processes, a worker first claims the combination with
+a row in variant_jobs, whose primary key lets only one worker write each variant.
+The backfill queue is submitted to that pool at VARIANT_BACKFILL_PER_MINUTE per
+process, so browsing cannot fan out into unbounded LLM calls.
+"""
+
+import concurrent.futures
+import functools
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from postgrest.exceptions import APIError
+
+from backend.agent.cassette import install_cassette
+from backend.agent.clients import shared_client
+from backend.agent.final_writer_prompts import (
+    final_writer_messages,
+    format_report_brief,
+    report_brief_messages,
+    variant_source,
+    writing_style_instructions,
+)
+from backend.agent.formats import FinalNewsArticle, ReportBrief
+from backend.agent.instrumentation import LLMUsageRecorder, pipeline_callback
+from backend.db import supabase
+from backend.tracing import start_span, tracing_callback
+
+# Each writing style picks one option per axis:
+# Short summaries vs in-depth detailed analysis/report ("short" or "depth")
+# Informal vs. formal ("informal" or "formal")
+# Satirical / humorous vs. straight-laced ("satirical" or "straight")
+WRITING_STYLE_AXES = (("short", "depth"), ("informal", "formal"), ("satirical", "straight"))
+DEFAULT_WRITING_STYLE = ["depth", "formal", "straight"]
+
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", 2))
+VARIANT_PREWARM_TOP_N = max(1, int(os.getenv("VARIANT_PREWARM_TOP_N", 1)))
+# Reports per /articles request whose missing variant is queued
+VARIANT_BACKFILL_LIMIT = int(os.getenv("VARIANT_BACKFILL_LIMIT", 10))
+# Queued variants generated per minute per process; further requests wait in the queue
+VARIANT_BACKFILL_PER_MINUTE = float(os.getenv("VARIANT_BACKFILL_PER_MINUTE", 6))
+VARIANT_BACKFILL_QUEUE_SIZE = int(os.getenv("VARIANT_BACKFILL_QUEUE_SIZE", 200))
+# Seconds after which a claim is considered abandoned (e.g. its worker crashed) and can be taken over
+VARIANT_CLAIM_TTL = float(os.getenv("VARIANT_CLAIM_TTL", 600))
+
+# Postgres unique_violation
+UNIQUE_VIOLATION = "23505"
+
+
+# The models are built on first use, so that serving stored variants does not load the Anthropic SDK.
+# Variants can be written before the report pipeline is ever imported, so the cassette is installed here too.
+@functools.lru_cache(maxsize=None)
+def get_final_writer_model():
+    from langchain_anthropic import ChatAnthropic
+
+    install_cassette()
+
+    # Streams so that time to first token can be measured
+    return ChatAnthropic(
+        model="claude-3-7-sonnet-latest",
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        max_tokens=64000,
+        streaming=True
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_brief_writer_model():
+    from langchain_anthropic import ChatAnthropic
+
+    install_cassette()
+
+    return ChatAnthropic(
+        model="claude-3-5-sonnet-latest",
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        max_tokens=8192
+    )
+
+
+def usage_config(recorder: LLMUsageRecorder, writing_style: list, thread_id: Optional[str] = None) -> dict:
+    """Run config recording a final-writer call's token usage under its writing style.
+
+    With thread_id, the call is also counted in that report run's pipeline summary.
+    """
+    metadata = {"usage_label": ",".join(writing_style), "pipeline_stage": "final_writer"}
+    if thread_id:
+        metadata["thread_id"] = thread_id
+    return {"callbacks": [recorder, pipeline_callback, tracing_callback], "metadata": metadata}
+
+
+def distill_report(report: str, recorder: LLMUsageRecorder) -> str:
+    """Distills a report into a markdown fact sheet (key claims, quotes, numbers, sources)."""
+    brief = get_brief_writer_model().with_structured_output(ReportBrief).invoke(
+        report_brief_messages(report), config=usage_config(recorder, ["brief"]))
+    return format_report_brief(brief)
+
+
+def write_article(source: str, writing_style: List[str], recorder: LLMUsageRecorder,
+                  thread_id: Optional[str] = None) -> FinalNewsArticle:
+    """Writes a news article in the given writing style from a report or its brief."""
+    final_writer = get_final_writer_model().with_structured_output(FinalNewsArticle)
+    messages = final_writer_messages(source, writing_style_instructions(writing_style))
+    with start_span("final_writer", {"writing_style": ",".join(writing_style)}):
+        return final_writer.invoke(messages, config=usage_config(recorder, writing_style, thread_id))
+
+
+def save_article(report_id: int, news_article: FinalNewsArticle, writing_style: List[str],
+                 topic_bias: Optional[str]) -> Dict[str, Any]:
+    """Inserts an article variant of a report and returns the stored row."""
+    article_res = supabase.table("articles_new").insert({
+        "report_id": report_id,
+        "title": news_article.title,
+        "summary": news_article.summary,
+        "content": news_article.content,
+        "opposite_view": news_article.opposite_view,
+        "preferred_writing_style": writing_style,
+        "bias": news_article.bias,
+        "topic_bias": topic_bias,
+        "relevant_topics": news_article.relevant_topics
+    }).execute()
+    return article_res.data[0]
+
+
+def normalize_writing_style(writing_style: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """
+    Puts a writing style in canonical axis order.
+
+    Args:
+        writing_style: Style options in any order
+
+    Returns:
+        Optional[List[str]]: One option per axis in WRITING_STYLE_AXES order, or None if
+            the style does not pick exactly one option on every axis
+    """
+    if not writing_style:
+        return None
+    normalized = []
+    for options in WRITING_STYLE_AXES:
+        picked = [option for option in options if option in writing_style]
+        if len(picked) != 1:
+            return None
+        normalized.append(picked[0])
+    return normalized
+
+
+def closest_variant(variants: List[Dict[str, Any]], writing_style: Optional[List[str]]) -> Dict[str, Any]:
+    """Returns the variant sharing the most style options with writing_style (the first one on ties)."""
+    wanted = set(writing_style or [])
+    return max(variants, key=lambda variant: len(wanted & set(variant.get("preferred_writing_style") or [])))
+
+
+def find_variant_id(report_id: int, writing_style: List[str]) -> Optional[int]:
+    """Returns the id of the stored article of a report in the given writing style, if there is one."""
+    res = supabase.table("articles_new").select("id, preferred_writing_style").eq("report_id", report_id).execute()
+    return next((article["id"] for article in res.data or []
+                 if normalize_writing_style(article["preferred_writing_style"]) == writing_style), None)
+
+
+_inflight: Dict[Any, concurrent.futures.Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key: Any, fn: Callable[[], Any]) -> Any:
+    """Runs fn, unless a call with the same key is already running, in which case its result is shared."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = concurrent.futures.Future()
+    if not owner:
+        return future.result()
+
+    try:
+        result = fn()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _report_brief(report_id: int, report: Dict[str, Any], recorder: LLMUsageRecorder) -> str:
+    def distill():
+        brief = distill_report(report["content"], recorder)
+        supabase.table("reports").update({"brief": brief}).eq("id", report_id).execute()
+        return brief
+
+    return report.get("brief") or _single_flight(("brief", report_id), distill)
+
+
+def _claim_variant(report_id: int, writing_style: List[str]) -> bool:
+    """
+    Claims a (report, style) combination for this worker, across processes.
+
+    Args:
+        report_id: The report's id
+        writing_style: A normalized writing style
+
+    Returns:
+        bool: True if this worker should write the variant, False if another worker holds the claim
+    """
+    style_key = ",".join(writing_style)
+    try:
+        supabase.table("variant_jobs").insert({"report_id": report_id, "writing_style": style_key}).execute()
+        return True
+    except APIError as e:
+        if e.code != UNIQUE_VIOLATION:
+            raise
+
+    # Take over a claim only if it is older than any real generation; the filter makes it atomic
+    now = datetime.now(timezone.utc)
+    res = supabase.table("variant_jobs").update({"claimed_at": now.isoformat()}).eq(
+        "report_id", report_id).eq("writing_style", style_key).lt(
+        "claimed_at", (now - timedelta(seconds=VARIANT_CLAIM_TTL)).isoformat()).execute()
+    return bool(res.data)
+
+
+def _release_claim(report_id: int, writing_style: List[str]) -> None:
+    supabase.table("variant_jobs").delete().eq("report_id", report_id).eq(
+        "writing_style", ",".join(writing_style)).execute()
+
+
+def _generate_variant(report_id: int, writing_style: List[str]) -> Optional[Dict[str, Any]]:
+    existing_id = find_variant_id(report_id, writing_style)
+    if existing_id is not None:
+        return supabase.table("articles_new").select("*").eq("id", existing_id).single().execute().data
+    if not _claim_variant(report_id, writing_style):
+        print(f"Variant {writing_style} of report {report_id} is being written by another worker")
+        return None
+
+    try:
+        report = supabase.table("reports").select("content, brief, topic_bias").eq(
+            "id", report_id).single().execute().data
+        recorder = LLMUsageRecorder()
+        # Only the non-depth variants are written from the brief
+        brief = _report_brief(report_id, report, recorder) if "depth" not in writing_style else report.get("brief")
+        news_article = write_article(variant_source(report["content"], brief, writing_style), writing_style,
+                                     recorder)
+        article = save_article(report_id, news_article, writing_style, report.get("topic_bias"))
+    except BaseException:
+        # Let the next request retry; a successful claim is kept, so the variant is never written twice
+        _release_claim(report_id, writing_style)
+        raise
+    print(f"Wrote {writing_style} variant of report {report_id}: {recorder.summary()}")
+    return article
+
+
+def _variant_executor() -> concurrent.futures.ThreadPoolExecutor:
+    return shared_client("variant_executor", lambda: concurrent.futures.ThreadPoolExecutor(
+        max_workers=VARIANT_WORKERS, thread_name_prefix="variants"))
+
+
+def _log_failure(report_id: int, writing_style: List[str]) -> Callable[[concurrent.futures.Future], None]:
+    def log(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Warning: Failed to write {writing_style} variant of report {report_id}: "
+                  f"{str(future.exception())}")
+    return log
+
+
+def request_variant(report_id: int, writing_style: List[str]) -> concurrent.futures.Future:
+    """
+    Schedules generation of a report's variant in the given writing style, once per combination.
+
+    Args:
+        report_id: The report's id
+        writing_style: A normalized writing style (see normalize_writing_style)
+
+    Returns:
+        concurrent.futures.Future: Resolves to the stored article row, or None if another
+            worker holds the claim; requests for a combination already being generated
+            share its future
+    """
+    key = ("variant", report_id, tuple(writing_style))
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        future = _inflight[key] = _variant_executor().submit(_generate_variant, report_id, writing_style)
+
+    def forget(_):
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+    future.add_done_callback(forget)
+    future.add_done_callback(_log_failure(report_id, writing_style))
+    return future
+
+
+_backfill_queue: "queue.Queue[tuple]" = queue.Queue(maxsize=VARIANT_BACKFILL_QUEUE_SIZE)
+_backfill_pending: set = set()
+_backfill_lock = threading.Lock()
+
+
+def _forget_backfill(key: tuple) -> Callable[[concurrent.futures.Future], None]:
+    def forget(_):
+        with _backfill_lock:
+            _backfill_pending.discard(key)
+    return forget
+
+
+def _backfill_worker() -> None:
+    """
+    Submits queued variants to the variant pool, at most VARIANT_BACKFILL_PER_MINUTE per minute.
+
+    Only submissions are paced: the worker does not wait for a variant to be written,
+    so generation runs on all VARIANT_WORKERS threads.
+    """
+    interval = 60 / VARIANT_BACKFILL_PER_MINUTE
+    while True:
+        key = _backfill_queue.get()
+        report_id, writing_style = key
+        try:
+            # Failures are logged by request_variant
+            request_variant(report_id, list(writing_style)).add_done_callback(_forget_backfill(key))
+        except RuntimeError as e:
+            # The pool is shutting down
+            print(f"Warning: Could not queue {list(writing_style)} variant of report {report_id}: {str(e)}")
+            _forget_backfill(key)(None)
+        time.sleep(interval)
+
+
+def _start_backfill_worker() -> threading.Thread:
+    thread = threading.Thread(target=_backfill_worker, name="variant-backfill", daemon=True)
+    thread.start()
+    return thread
+
+
+def schedule_variant(report_id: int, writing_style: List[str]) -> bool:
+    """
+    Queues a report's missing variant for background generation, once per combination.
+
+    Args:
+        report_id: The report's id
+        writing_style: A normalized writing style
+
+    Returns:
+        bool: True if the variant is queued, False if the queue is full
+    """
+    if VARIANT_BACKFILL_PER_MINUTE <= 0:
+        return False
+    shared_client("variant_backfill_worker", _start_backfill_worker)
+    key = (report_id, tuple(writing_style))
+    with _backfill_lock:
+        if key in _backfill_pending:
+            return True
+        try:
+            _backfill_queue.put_nowait(key)
+        except queue.Full:
+            return False
+        _backfill_pending.add(key)
+    return True
+
+
+def popular_writing_styles(top_n: int) -> List[List[str]]:
+    """
+    Returns the writing styles held by the most users.
+
+    Args:
+        top_n: Number of styles to return
+
+    Returns:
+        List[List[str]]: Up to top_n normalized styles, most popular first; the default
+            style if no user has a valid one
+    """
+    res = supabase.table("users").select("preferred_writing_style").execute()
+    counts = Counter(
+        tuple(style) for style in (normalize_writing_style(user.get("preferred_writing_style"))
+                                   for user in res.data or [])
+        if style
+    )
+    return [list(style) for style, _ in counts.most_common(top_n)] or [DEFAULT_WRITING_STYLE]
+
+
+def prewarm_variants(report_id: int, top_n: int = VARIANT_PREWARM_TOP_N) -> List[Dict[str, Any]]:
+    """
+    Writes a new report's variants in the most popular writing styles and waits for them.
+
+    Args:
+        report_id: The report's id
+        top_n: Number of popular styles to write, at least one
+
+    Returns:
+        List[Dict[str, Any]]: The stored article rows
+    """
+    futures = [request_variant(report_id, style) for style in popular_writing_styles(max(1, top_n))]
+    articles = []
+    for future in futures:
+        try:
+            article = future.result()
+        except Exception:
+            # Already logged by request_variant; the variant is written on first request
+            continue
+        if article:
+            articles.append(article)
+    return articles
@@ -11,11 +11,24 @@
 This module handles FastAPI app initialization and configuration.
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-app = FastAPI(title="The Fourth Branch API")
+from backend.agent.clients import close_clients
+from backend.metrics import PrometheusMiddleware
+from backend.tracing import TracingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release pooled search provider clients when the server shuts down."""
+    yield
+    await close_clients()
+
+
+app = FastAPI(title="The Fourth Branch API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -30,3 +43,9 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+
+# Middleware added later wraps the earlier ones. Metrics wrap CORS so that preflight
+# responses are timed too, and tracing wraps everything so that every span of a
+# request descends from its root span.
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(TracingMiddleware)
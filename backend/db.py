@@ -1,10 +1,71 @@
 import os
+import time
+from typing import Any, Optional
+
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from backend.metrics import record_supabase_call
+from backend.tracing import start_span
+
 load_dotenv()
 
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 
-supabase: Client = create_client(url, key)
+# Query builder methods that set the operation of a query
+OPERATIONS = ("select", "insert", "update", "upsert", "delete")
+
+
+class _TimedQuery:
+    """Wraps a query builder chain so that execute() is counted and timed per table and operation."""
+
+    def __init__(self, builder: Any, table: str, operation: Optional[str] = None):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _TimedQuery(result, self._table, name if name in OPERATIONS else self._operation)
+            return result
+        return call
+
+    def execute(self) -> Any:
+        started_at = time.perf_counter()
+        error = None
+        try:
+            with start_span(f"supabase {self._operation or 'unknown'} {self._table}",
+                            {"db.table": self._table, "db.operation": self._operation}):
+                return self._builder.execute()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            record_supabase_call(self._table, self._operation or "unknown",
+                                 time.perf_counter() - started_at, error)
+
+
+class InstrumentedClient:
+    """Supabase client proxy recording the count and latency of every table query."""
+
+    def __init__(self, client: Client):
+        self._client = client
+
+    def table(self, table_name: str) -> _TimedQuery:
+        return _TimedQuery(self._client.table(table_name), table_name)
+
+    def rpc(self, fn: str, *args, **kwargs) -> _TimedQuery:
+        return _TimedQuery(self._client.rpc(fn, *args, **kwargs), f"rpc:{fn}", "rpc")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+supabase: InstrumentedClient = InstrumentedClient(create_client(url, key))
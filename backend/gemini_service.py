@@ -1,5 +1,4 @@
 import os
-import google.generativeai as genai
 from typing import Optional
 
 
@@ -9,6 +8,9 @@ def get_gemini_client():
     if not api_key:
         raise ValueError("GEMINI_API_KEY environment variable is not set")
 
+    # Imported on first use, the SDK is slow to import and only this endpoint needs it
+    import google.generativeai as genai
+
     genai.configure(api_key=api_key)
     return genai
 
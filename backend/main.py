@@ -14,14 +14,24 @@ This module is the main entry point for the API.
 from fastapi import HTTPException, Depends, Request
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 import json
 
-from backend.agent import topic_generator
-from backend.agent.run import stream_report_generation
+# The report generation stack (LangGraph, model clients, search SDKs) is imported by
+# the endpoints that use it, so that the read endpoints start serving without it
+from backend.agent.circuit_breaker import get_circuit_states
+from backend.agent.instrumentation import get_pipeline_metrics
+from backend.agent.variants import (
+    VARIANT_BACKFILL_LIMIT,
+    closest_variant,
+    find_variant_id,
+    normalize_writing_style,
+    schedule_variant,
+)
 from backend.app import app
 from backend.security import get_api_key
 from backend.db import supabase
+from backend.metrics import SSE_STREAMS, render_metrics
 from backend.gemini_service import generate_impact_analysis
 from backend.voice_service import generate_podcast_audio
 
@@ -155,6 +165,27 @@ def list_articles_display(request: Request, api_key: str = Depends(get_api_key))
     # Sort articles by created_at in descending order
     articles_with_created_at.sort(key=lambda x: x["created_at"], reverse=True)
 
+    # Pick each report's variant in the user's writing style. Variants are written on
+    # demand: a missing one is queued for background generation and the report is shown
+    # in its closest existing style meanwhile.
+    user_writing_style = normalize_writing_style(preferred_writing_style)
+    variants_by_report = {}
+    for article in articles_with_created_at:
+        variants_by_report.setdefault(article["report_id"], []).append(article)
+
+    shown_articles = []
+    scheduled = 0
+    for report_id, variants in variants_by_report.items():
+        article = next((variant for variant in variants
+                        if normalize_writing_style(variant["preferred_writing_style"]) == user_writing_style), None)
+        if article is None:
+            # Only backfill the most recent reports on each request
+            if user_writing_style and scheduled < VARIANT_BACKFILL_LIMIT:
+                schedule_variant(report_id, user_writing_style)
+                scheduled += 1
+            article = closest_variant(variants, user_writing_style)
+        shown_articles.append(article)
+
     # Define mapping for topic_bias to political_leaning
     bias_to_leaning = {
         "liberal": "left",
@@ -162,12 +193,11 @@ def list_articles_display(request: Request, api_key: str = Depends(get_api_key))
         "conservative": "right"
     }
 
-    # Filter articles into user_preferred and explore
+    # Filter articles into user_preferred and explore (one article per report)
     user_preferred = []
     explore = []
-    seen_report_ids = set()  # Track report_ids to avoid duplicates in explore
 
-    for article in articles_with_created_at:
+    for article in shown_articles:
         # Translate topic_bias to political_leaning
         article_political_leaning = bias_to_leaning.get(
             article.get("topic_bias"))
@@ -176,17 +206,11 @@ def list_articles_display(request: Request, api_key: str = Depends(get_api_key))
         matches_topics = any(
             topic in preferred_topics for topic in article.get("relevant_topics"))
         matches_political_leaning = article_political_leaning == political_leaning
-        matches_writing_style = article.get(
-            "preferred_writing_style") == preferred_writing_style
 
-        if matches_topics and matches_political_leaning and matches_writing_style:
+        if matches_topics and matches_political_leaning:
             user_preferred.append(article)
         else:
-            # For explore: only include if writing style matches AND report_id not seen before
-            report_id = article.get("report_id")
-            if matches_writing_style and report_id not in seen_report_ids:
-                explore.append(article)
-                seen_report_ids.add(report_id)
+            explore.append(article)
 
     print("user_preferred: ", len(user_preferred))
     print("explore: ", len(explore))
@@ -196,7 +220,7 @@ def list_articles_display(request: Request, api_key: str = Depends(get_api_key))
 
 
 @app.get("/articles/{article_id}", response_model=ArticleDetail)
-def get_article(article_id: int, api_key: str = Depends(get_api_key)):
+def get_article(article_id: int, request: Request, api_key: str = Depends(get_api_key)):
     # Increment page view counter robustly
     res = supabase.table("global_metrics").select("value").eq(
         "key", "total_page_views").limit(1).execute()
@@ -213,6 +237,24 @@ def get_article(article_id: int, api_key: str = Depends(get_api_key)):
         "*", count="exact").eq("id", article_id).single().execute()
     if not res.data:
         raise HTTPException(status_code=404, detail="Article not found")
+
+    # Serve the report in the signed-in user's writing style if it is written already;
+    # otherwise serve the requested article and queue the user's style in the background
+    user_email = request.headers.get("user_email")
+    if user_email:
+        user_res = supabase.table("users").select("preferred_writing_style").eq(
+            "email", user_email).limit(1).execute()
+        user_writing_style = normalize_writing_style(
+            user_res.data[0]["preferred_writing_style"]) if user_res.data else None
+        if user_writing_style and normalize_writing_style(res.data["preferred_writing_style"]) != user_writing_style:
+            variant_id = find_variant_id(res.data["report_id"], user_writing_style)
+            if variant_id is not None:
+                # The same report in the user's style, served under its own id
+                res = supabase.table("articles_new").select(
+                    "*", count="exact").eq("id", variant_id).single().execute()
+            else:
+                schedule_variant(res.data["report_id"], user_writing_style)
+
     report_res = supabase.table("reports").select("created_at").eq(
         "id", res.data["report_id"]).single().execute()
     if report_res.data:
@@ -223,6 +265,13 @@ def get_article(article_id: int, api_key: str = Depends(get_api_key)):
     return res.data
 
 
+@app.get("/metrics")
+def get_metrics(api_key: str = Depends(get_api_key)):
+    """Prometheus metrics of the API in text exposition format"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/metrics/page_views")
 def get_page_views(api_key: str = Depends(get_api_key)):
     res = supabase.table("global_metrics").select("value").eq(
@@ -232,6 +281,18 @@ def get_page_views(api_key: str = Depends(get_api_key)):
     return {"value": res.data[0]["value"]}
 
 
+@app.get("/metrics/search")
+def get_search_metrics(api_key: str = Depends(get_api_key)):
+    from backend.agent.hedging import get_hedging_stats
+
+    return {"hedging": get_hedging_stats(), "circuits": get_circuit_states()}
+
+
+@app.get("/metrics/pipeline")
+def get_pipeline_metrics_endpoint(api_key: str = Depends(get_api_key)):
+    return get_pipeline_metrics()
+
+
 @app.post("/subscribe")
 def subscribe(request: SubscribeRequest, api_key: str = Depends(get_api_key)):
     # Validate email format
@@ -257,6 +318,8 @@ def subscribe(request: SubscribeRequest, api_key: str = Depends(get_api_key)):
 @app.get("/gen_news")
 def gen_news(api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
     """Generate a topic for a news article"""
+    from backend.agent import topic_generator
+
     for _ in range(3):
         topic_generator()
     return {"message": "Generated news article"}
@@ -266,6 +329,8 @@ def gen_news(api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
 def gen_news_with_request(request: GenNewsWithRequestRequest,
                           api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
     """Generate a topic for a news article with a user request"""
+    from backend.agent import topic_generator
+
     article_ids = []
     for _ in range(3):
         article_id = topic_generator(user_request=request.user_request)
@@ -278,6 +343,8 @@ def gen_news_with_request(request: GenNewsWithRequestRequest,
 @app.post("/gen_news_stream")
 async def gen_news_stream(request: GenNewsWithRequestRequest, api_key: str = Depends(get_api_key)):
     """Generate a news article with a user request and stream the process."""
+    from backend.agent.run import stream_report_generation
+
     user_id = -1
     if request.user_email:
         try:
@@ -289,8 +356,9 @@ async def gen_news_stream(request: GenNewsWithRequestRequest, api_key: str = Dep
             print(f"Error looking up user: {e}, using anonymous mode")
 
     async def event_stream():
-        async for event in stream_report_generation(user_id=user_id, user_request=request.user_request):
-            yield f"data: {json.dumps(event)}\n\n"
+        with SSE_STREAMS.track_inprogress():
+            async for event in stream_report_generation(user_id=user_id, user_request=request.user_request):
+                yield f"data: {json.dumps(event)}\n\n"
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
@@ -0,0 +1,129 @@
+# **************************************************************************
+#  * Copyright (c) 2025 The Fourth Branch
+#  * All Rights Reserved.
+#  *
+#  * This software contains proprietary and confidential information of The Fourth Branch.
+#  * By using this software you agree to the terms of the associated License Agreement.
+#  * Third party components are distributed under their respective licenses.
+#  **************************************************************************
+
+"""
+This module defines the Prometheus metrics of the API.
+
+PrometheusMiddleware records request counts, latency, in-flight requests and
+response sizes per route. Routes are labelled by their template (e.g.
+/articles/{article_id}), never the raw path, so label cardinality stays bounded.
+SSE_STREAMS counts the report streams that are open. Supabase calls are counted
+and timed per table and operation by backend.db. All metrics are exported in
+Prometheus text format at /metrics.
+"""
+
+import functools
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+UNMATCHED_ROUTE = "unmatched"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time until the response body was fully sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled", ["method", "route"])
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS)
+
+SSE_STREAMS = Gauge("sse_streams_active", "Report generation event streams open")
+
+SUPABASE_REQUESTS = Counter(
+    "supabase_requests_total", "Supabase queries executed", ["table", "operation", "outcome"])
+SUPABASE_REQUEST_DURATION = Histogram(
+    "supabase_request_duration_seconds", "Supabase query latency", ["table", "operation"],
+    buckets=LATENCY_BUCKETS)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Returns the template of the route a request goes to.
+
+    Matching scans the app's routes, so the result is cached per method and path.
+
+    Args:
+        scope: The request's ASGI scope; the app is read from scope["app"]
+
+    Returns:
+        str: The route's path template, or UNMATCHED_ROUTE if no route matches
+    """
+    return _match_route(scope.get("app"), scope["method"], scope["path"], scope.get("root_path", ""))
+
+
+# Bounded, since unmatched paths (e.g. from scanners) are unbounded
+@functools.lru_cache(maxsize=4096)
+def _match_route(app: Any, method: str, path: str, root_path: str) -> str:
+    scope = {"type": "http", "method": method, "path": path, "root_path": root_path}
+    partial = None
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            # The path matches but not the method
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording HTTP request metrics by route template.
+
+    A pure ASGI middleware rather than BaseHTTPMiddleware, so streamed responses
+    are not buffered and their latency covers the whole stream.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status: Dict[str, Any] = {"code": 500, "size": 0}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                status["size"] += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started_at)
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(status["size"])
+            HTTP_REQUESTS.labels(method, route, str(status["code"])).inc()
+
+
+def record_supabase_call(table: str, operation: str, seconds: float, error: Optional[BaseException]) -> None:
+    """Records an executed Supabase query."""
+    SUPABASE_REQUESTS.labels(table, operation, "error" if error else "ok").inc()
+    SUPABASE_REQUEST_DURATION.labels(table, operation).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Returns the exposition body and content type of every registered metric."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,294 @@
+# **************************************************************************
+#  * Copyright (c) 2025 The Fourth Branch
+#  * All Rights Reserved.
+#  *
+#  * This software contains proprietary and confidential information of The Fourth Branch.
+#  * By using this software you agree to the terms of the associated License Agreement.
+#  * Third party components are distributed under their respective licenses.
+#  **************************************************************************
+
+"""
+This module provides lightweight, OpenTelemetry-style tracing.
+
+A span covers one unit of work (a request, a graph node, a search provider call,
+an LLM call, a Supabase query) and records its parent, so a slow report run can be
+broken down into its stages. The current span is held in a contextvar. asyncio
+tasks copy the context when they are created, so the spans of the sections fanned
+out with Send are children of the request's root span. Sync endpoints run in the
+threadpool and their spans are children of it too.
+
+TracingMiddleware opens a root span per request, traced_node wraps graph nodes,
+and TracingCallbackHandler records LLM calls. Finished spans go to the configured
+exporter: TRACE_EXPORTER=jsonl appends them as JSON lines to TRACE_FILE for
+offline analysis, from a background thread so that the event loop never waits on
+the disk; the default, "none", drops them. Other exporters can be
+installed with set_exporter().
+"""
+
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.metrics import route_template
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+
+class Span:
+    """A timed unit of work within a trace.
+
+    Args:
+        name: What the span covers, e.g. "node generate_queries"
+        parent: The enclosing span; a span without a parent starts a new trace
+        attributes: Initial attributes
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._started_at = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Ends the span, marking it failed if error is given, and exports it."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started_at
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+        get_exporter().export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_seconds": round(self.duration, 6) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives finished spans. Subclasses must be thread-safe."""
+
+    def export(self, span: Span) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """Appends each finished span to a file as one JSON object per line.
+
+    Spans are queued and written by a background thread. If the writer falls more
+    than max_queue spans behind, further spans are dropped rather than held in memory.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._file = open(path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._write, name="span-exporter", daemon=True)
+        self._writer.start()
+        # Writes out the spans still queued when the process exits
+        atexit.register(self.shutdown)
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1:
+                print(f"Warning: Span exporter for {self.path} is falling behind, dropping spans")
+
+    def _write(self) -> None:
+        while True:
+            spans = [self._queue.get()]
+            while not self._queue.empty():
+                spans.append(self._queue.get_nowait())
+            done = None in spans
+            self._file.write("".join(json.dumps(span, default=str) + "\n" for span in spans if span is not None))
+            self._file.flush()
+            if done:
+                return
+
+    def shutdown(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._file.close()
+
+
+def _exporter_from_env() -> SpanExporter:
+    if TRACE_EXPORTER == "jsonl":
+        return JsonLinesExporter(TRACE_FILE)
+    if TRACE_EXPORTER not in ("none", ""):
+        print(f"Warning: Unknown TRACE_EXPORTER {TRACE_EXPORTER}, spans are not exported")
+    return SpanExporter()
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def get_exporter() -> SpanExporter:
+    """Returns the span exporter, creating it from TRACE_EXPORTER on first use."""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = _exporter_from_env()
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter) -> None:
+    """Replaces the span exporter, shutting down the previous one."""
+    global _exporter
+    with _exporter_lock:
+        previous, _exporter = _exporter, exporter
+    if previous is not None:
+        previous.shutdown()
+
+
+@contextlib.contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+    """
+    Runs the block in a span that is a child of the current span.
+
+    Args:
+        name: What the span covers
+        attributes: Initial attributes
+
+    Yields:
+        Span: The span, current for the duration of the block
+    """
+    span = Span(name, current_span.get(), attributes)
+    token = current_span.set(span)
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        current_span.reset(token)
+        span.end(error)
+
+
+def traced_node(fn: Callable) -> Callable:
+    """Wraps a graph node so that each of its runs is recorded in a span.
+
+    The span is named after the node and carries the section being researched,
+    when there is one, so fanned-out sections can be told apart.
+    """
+    def attributes(state: Any) -> Dict[str, Any]:
+        section = state.get("section") if isinstance(state, dict) else None
+        return {"section": section.name} if section is not None else {}
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            with start_span(f"node {fn.__name__}", attributes(state)):
+                return await fn(state, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        with start_span(f"node {fn.__name__}", attributes(state)):
+            return fn(state, *args, **kwargs)
+    return wrapper
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records each chat model call as a span under the span current when it started."""
+
+    # Must run in the caller's context to see its current span
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[UUID, Span] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        model = (metadata or {}).get("ls_model_name") or (serialized.get("kwargs") or {}).get("model")
+        span = Span(f"llm {model or 'chat_model'}", current_span.get(), {"model": model})
+        with self._lock:
+            self._spans[run_id] = span
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    span.set_attribute("input_tokens", usage.get("input_tokens"))
+                    span.set_attribute("output_tokens", usage.get("output_tokens"))
+                    span.set_attribute("cache_read_input_tokens",
+                                       (usage.get("input_token_details") or {}).get("cache_read"))
+        span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error)
+
+
+tracing_callback = TracingCallbackHandler()
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the root span of each request, named by route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with start_span(f"{scope['method']} {route_template(scope)}",
+                        {"http.method": scope["method"], "http.path": scope["path"]}) as span:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,111 @@
+"""
+Benchmark for HTML extraction on a saved corpus of news pages.
+
+Runs two strategies over every *.html file in the corpus directory:
+
+- inline: BeautifulSoup(html, "html.parser").get_text() and markdownify() on the
+  event loop, as search used to do
+- pool: backend.agent.extract.extract_text / extract_markdown in the process pool
+
+For each it reports pages per second and how long the event loop was stalled,
+measured by a ticker coroutine that expects to wake every 5 ms.
+
+Usage:
+    python -m benchmarks.bench_extraction CORPUS_DIR [--concurrency 8] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import time
+
+from backend.agent.extract import EXTRACTION_WORKERS, extract_markdown, extract_text
+
+TICK_SECONDS = 0.005
+
+
+async def inline_extract(html: str) -> None:
+    from bs4 import BeautifulSoup
+    from markdownify import markdownify
+
+    BeautifulSoup(html, "html.parser").get_text()
+    markdownify(html)
+
+
+async def pool_extract(html: str) -> None:
+    await asyncio.gather(extract_text(html), extract_markdown(html))
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_strategy(extract, pages, concurrency: int, repeat: int):
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            expected = time.perf_counter() + TICK_SECONDS
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(html):
+        async with semaphore:
+            await extract(html)
+
+    # Warm up (starts pool workers, imports parsers)
+    await extract(pages[0])
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await asyncio.gather(*(one(html) for html in pages))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker_task
+
+    lags.sort()
+    return {
+        "pages_per_second": round(len(pages) * repeat / elapsed, 2),
+        "wall_seconds": round(elapsed, 3),
+        "loop_stall_max_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+        "loop_stall_p99_ms": round(percentile(lags, 0.99) * 1000, 2) if lags else 0.0,
+        "loop_stall_mean_ms": round(statistics.fmean(lags) * 1000, 3) if lags else 0.0,
+    }
+
+
+async def main_async(args):
+    paths = sorted(pathlib.Path(args.corpus).glob("*.html"))
+    if not paths:
+        raise SystemExit(f"No *.html files found in {args.corpus}")
+    pages = [path.read_text(encoding="utf-8", errors="replace") for path in paths]
+
+    report = {
+        "corpus": {"pages": len(pages), "total_kb": round(sum(map(len, pages)) / 1024, 1)},
+        "concurrency": args.concurrency,
+        "repeat": args.repeat,
+        "extraction_workers": EXTRACTION_WORKERS,
+        "results": {
+            "inline": await run_strategy(inline_extract, pages, args.concurrency, args.repeat),
+            "pool": await run_strategy(pool_extract, pages, args.concurrency, args.repeat),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", help="Directory of saved *.html news pages")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Microbenchmark for the prompt-context formatters in backend/agent/formatting.py.
+
+Compares the current formatters against the previous ``+=`` implementations
+on a realistic payload (5 queries x 5 results, tens of KB of raw content per
+result) and reports CPU time and peak allocation for each. Near-duplicate
+collapsing is disabled so both sides produce identical output.
+
+Usage:
+    python -m benchmarks.bench_formatting [--queries 5] [--results 5] [--raw-kb 40] [--repeat 50]
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from backend.agent.formatting import deduplicate_and_format_sources, format_search_results
+
+WORDS = ("senate vote budget court ruling governor election tariff market inflation "
+         "report analysts official statement climate storm wildfire health agency \u201csaid\u201d \u2014").split()
+
+
+def make_payload(num_queries: int, num_results: int, raw_kb: int, seed: int = 7):
+    """Builds Tavily-shaped search responses with overlapping URLs across queries."""
+    rng = random.Random(seed)
+
+    def text(n_chars):
+        words = []
+        size = 0
+        while size < n_chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)
+
+    responses = []
+    for q in range(num_queries):
+        results = []
+        for r in range(num_results):
+            # Roughly one in five results repeats a URL from another query
+            url_id = r if rng.random() < 0.2 else f"{q}-{r}"
+            results.append({
+                "title": f"Result {q}-{r}",
+                "url": f"https://news.example.com/article/{url_id}",
+                "content": text(400),
+                "score": rng.random(),
+                "raw_content": text(raw_kb * 1024),
+            })
+        responses.append({"query": f"query {q}", "results": results})
+    return responses
+
+
+def legacy_deduplicate_and_format_sources(search_response, max_tokens_per_source=5000, include_raw_content=True):
+    """The previous ``+=`` implementation, kept here as the baseline."""
+    sources_list = []
+    for response in search_response:
+        sources_list.extend(response['results'])
+    unique_sources = {source['url']: source for source in sources_list}
+    formatted_text = "Content from sources:\n"
+    for i, source in enumerate(unique_sources.values(), 1):
+        formatted_text += f"{'='*80}\n"
+        formatted_text += f"Source: {source['title']}\n"
+        formatted_text += f"{'-'*80}\n"
+        formatted_text += f"URL: {source['url']}\n===\n"
+        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
+        if include_raw_content:
+            char_limit = max_tokens_per_source * 4
+            raw_content = source.get('raw_content', '') or ''
+            if len(raw_content) > char_limit:
+                raw_content = raw_content[:char_limit] + "... [truncated]"
+            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
+        formatted_text += f"{'='*80}\n\n"
+    return formatted_text.strip()
+
+
+def legacy_format_search_results(search_results, max_chars_per_source=30000):
+    """The previous ``+=`` implementation of the tavily_search tool output."""
+    formatted_output = "Search results: \n\n"
+    unique_results = {}
+    for response in search_results:
+        for result in response['results']:
+            if result['url'] not in unique_results:
+                unique_results[result['url']] = result
+    for i, (url, result) in enumerate(unique_results.items()):
+        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
+        formatted_output += f"URL: {url}\n\n"
+        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
+        if result.get('raw_content'):
+            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:max_chars_per_source]}"
+        formatted_output += "\n\n" + "-" * 80 + "\n"
+    return formatted_output
+
+
+def measure(fn, payload, repeat):
+    """Returns CPU milliseconds per call and peak traced allocation in KB."""
+    fn(payload)  # warm-up
+
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(payload)
+    cpu_per_call = (time.process_time() - start) / repeat
+
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"cpu_ms_per_call": round(cpu_per_call * 1000, 3), "peak_alloc_kb": round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--results", type=int, default=5)
+    parser.add_argument("--raw-kb", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    payload = make_payload(args.queries, args.results, args.raw_kb)
+
+    cases = {
+        "deduplicate_and_format_sources": (
+            lambda p: legacy_deduplicate_and_format_sources(p, max_tokens_per_source=4000),
+            lambda p: deduplicate_and_format_sources(p, max_tokens_per_source=4000, near_duplicate_distance=None)),
+        "format_search_results": (
+            legacy_format_search_results,
+            lambda p: format_search_results(p, near_duplicate_distance=None)),
+    }
+
+    report = {"payload": vars(args), "results": {}}
+    for name, (legacy, current) in cases.items():
+        assert legacy(payload) == current(payload), f"{name}: output differs from baseline"
+        report["results"][name] = {
+            "legacy": measure(legacy, payload, args.repeat),
+            "current": measure(current, payload, args.repeat),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
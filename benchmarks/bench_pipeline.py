@@ -0,0 +1,241 @@
+"""
+Offline benchmark of the report graph with fake chat models and fake search.
+
+Runs the LangGraph report graph in backend/agent/graph.py (planning, section
+fan-out, search, writing, grading, final sections) without calling Claude or any
+search provider. Only the graph is measured: topic generation, the final news
+writer, variant generation and the database writes around it in
+stream_report_generation (backend/agent/run.py) are not run.
+
+- init_chat_model in the graph returns FakeChatModel, a deterministic chat model
+  that sleeps for a configurable latency (plus output tokens / tokens per second)
+  and returns plausible structured output: the requested number of sections,
+  queries, and a pass/fail grade at a fixed fail rate
+- execute_search in backend.agent.utils returns Tavily-shaped responses built by
+  bench_formatting.make_payload after a configurable latency, so formatting,
+  circuit breakers, hedging and instrumentation run as in production
+
+For each section count and concurrency level (reports run at once) it reports
+throughput, end-to-end report latency, per-node latency from the pipeline
+instrumentation, and peak traced memory, as JSON. With --llm-latency 0 and
+--search-latency 0 the report latency is pure orchestration overhead.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sections 3 5 8] [--concurrency 1 4 16] [--rounds 2]
+        [--llm-latency 0.2] [--search-latency 0.1] [--output-tokens 300] [--fail-rate 0.3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List, Optional
+
+# The pipeline imports the database and model clients at import time; they are
+# never called here, but need well-formed settings to be constructed
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+
+import backend.agent.graph as graph_module  # noqa: E402
+import backend.agent.utils as utils_module  # noqa: E402
+from backend.agent.instrumentation import current_thread_id, pipeline_callback, pop_run_summary  # noqa: E402
+from backend.agent.state import Feedback, Queries, SearchQuery, Section, Sections  # noqa: E402
+from benchmarks.bench_formatting import WORDS, make_payload  # noqa: E402
+
+SOURCE_URLS = ("https://news.example.com/article/0", "https://news.example.com/article/1")
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with simulated latency and token output."""
+
+    latency: float = 0.2
+    tokens_per_second: float = 0.0  # 0 streams instantly
+    output_tokens: int = 300
+    num_sections: int = 5
+    fail_rate: float = 0.0
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _delay(self) -> float:
+        stream_seconds = self.output_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+        return self.latency + stream_seconds
+
+    def _result(self) -> ChatResult:
+        rng = random.Random(self.seed)
+        body = " ".join(rng.choice(WORDS) for _ in range(self.output_tokens))
+        sources = "\n".join(f"- {url}" for url in SOURCE_URLS)
+        message = AIMessage(
+            content=f"{body}\n\n### Sources\n{sources}",
+            usage_metadata={"input_tokens": 2000, "output_tokens": self.output_tokens,
+                            "total_tokens": 2000 + self.output_tokens})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result()
+
+    def _structured(self, schema: Any, rng: random.Random) -> Any:
+        if schema is Sections:
+            sections = [Section(name="Introduction", description="Overview of the topic",
+                                research=False, content="")]
+            sections += [Section(name=f"Body section {i}", description=f"Subtopic {i} of the story",
+                                 research=True, content="")
+                         for i in range(1, max(1, self.num_sections - 2) + 1)]
+            sections.append(Section(name="Conclusion", description="Summary of the findings",
+                                    research=False, content=""))
+            return Sections(sections=sections)
+        if schema is Queries:
+            return Queries(queries=[SearchQuery(search_query=f"query {rng.randrange(1000)}")])
+        if schema is Feedback:
+            failed = rng.random() < self.fail_rate
+            return Feedback(grade="fail" if failed else "pass",
+                            follow_up_queries=[SearchQuery(search_query="follow up")] if failed else [])
+        raise ValueError(f"FakeChatModel has no structured output for {schema}")
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        rng = random.Random(self.seed)
+
+        def parse(message: AIMessage) -> Any:
+            return self._structured(schema, rng)
+
+        # Calls the model itself so that callbacks and instrumentation still fire
+        return self | RunnableLambda(parse)
+
+
+def install_fakes(args: argparse.Namespace, num_sections: int) -> None:
+    """Swaps the graph's chat models and the search providers for fakes."""
+    seeds = iter(range(1_000_000))
+
+    def fake_init_chat_model(model: Optional[str] = None, model_provider: Optional[str] = None, **kwargs):
+        return FakeChatModel(latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                             output_tokens=args.output_tokens, num_sections=num_sections,
+                             fail_rate=args.fail_rate, seed=next(seeds))
+
+    payload = make_payload(1, args.results, args.raw_kb)
+
+    async def fake_execute_search(search_api: str, query_list: List[str], params_to_pass: dict,
+                                  raw_content_policy: Dict[str, Any]) -> List[Dict[str, Any]]:
+        await asyncio.sleep(args.search_latency)
+        return [{**payload[0], "query": query} for query in query_list]
+
+    graph_module.init_chat_model = fake_init_chat_model
+    utils_module.execute_search = fake_execute_search
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    return {
+        "mean": round(statistics.fmean(values), 4) if values else None,
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+async def run_report(graph, args: argparse.Namespace) -> Dict[str, Any]:
+    thread_id = str(uuid.uuid4())
+    current_thread_id.set(thread_id)
+    config = {"configurable": {
+        "thread_id": thread_id,
+        "search_api": "tavily",
+        "max_search_depth": args.max_search_depth,
+        "number_of_queries": 1,
+        "auto_approve_plan": True,
+        "reuse_planning_search": args.reuse_planning_search,
+    }, "callbacks": [pipeline_callback]}
+
+    started_at = time.perf_counter()
+    async for _ in graph.astream({"topic": "Benchmark topic"}, config, stream_mode="updates"):
+        pass
+    return {"seconds": time.perf_counter() - started_at, "summary": pop_run_summary(thread_id)}
+
+
+async def run_scenario(args: argparse.Namespace, num_sections: int, concurrency: int) -> Dict[str, Any]:
+    install_fakes(args, num_sections)
+    graph = graph_module.builder.compile()
+
+    await run_report(graph, args)  # warm-up
+    tracemalloc.start()
+    runs = []
+    started_at = time.perf_counter()
+    for _ in range(args.rounds):
+        runs += await asyncio.gather(*(run_report(graph, args) for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    node_seconds: Dict[str, List[float]] = {}
+    for run in runs:
+        for node, totals in run["summary"]["nodes"].items():
+            node_seconds.setdefault(node, []).append(totals["seconds"])
+
+    return {
+        "sections": num_sections,
+        "concurrency": concurrency,
+        "reports": len(runs),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_reports_per_second": round(len(runs) / wall_seconds, 3),
+        "report_latency": latency_summary([run["seconds"] for run in runs]),
+        # Per report: a node's total time across its executions (e.g. all sections)
+        "stage_latency": {node: latency_summary(values) for node, values in sorted(node_seconds.items())},
+        "llm_calls_per_report": statistics.fmean(run["summary"]["llm"]["calls"] for run in runs),
+        "search_calls_per_report": statistics.fmean(run["summary"]["search"]["calls"] for run in runs),
+        "peak_traced_memory_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--results", type=int, default=5)
+    parser.add_argument("--raw-kb", type=int, default=8)
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    parser.add_argument("--max-search-depth", type=int, default=2)
+    parser.add_argument("--reuse-planning-search", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    async def run_all():
+        return [await run_scenario(args, sections, concurrency)
+                for sections in args.sections for concurrency in args.concurrency]
+
+    report = {"params": vars(args), "scenarios": asyncio.run(run_all())}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Import-time budget check for the API process.
+
+Imports backend.main in a fresh interpreter under ``python -X importtime`` and
+fails (exit code 1) if the import takes longer than the budget, or if it loads any
+module that should only be imported on first use: the report generation stack
+(LangGraph, the Anthropic client, LangChain community), the search provider SDKs
+and the Gemini and OpenAI SDKs. The read endpoints must be able to serve without
+them, which is what keeps cold starts on autoscaled instances short.
+
+Reports the best of --repeat runs, with the slowest top-level imports, as JSON.
+
+Usage:
+    python -m benchmarks.import_budget [--budget-ms 1500] [--repeat 3] [--module backend.main]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+
+# Loaded on first use only; importing any of them (or a submodule) fails the check
+FORBIDDEN_MODULES = (
+    "langgraph",
+    "langchain_anthropic",
+    "anthropic",
+    "langchain_community",
+    "exa_py",
+    "linkup",
+    "tavily",
+    "arxiv",
+    "bs4",
+    "markdownify",
+    "google.generativeai",
+    "openai",
+)
+
+# Settings the API reads at import time; no service is contacted
+DUMMY_ENV = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "bench.bench.bench",
+}
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def measure_import(module: str) -> Dict[str, Any]:
+    """Imports module in a fresh interpreter and parses its -X importtime output."""
+    env = {**DUMMY_ENV, **os.environ}
+    started_at = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env)
+    wall_ms = (time.perf_counter() - started_at) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    modules: List[str] = []
+    top_level: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        modules.append(name)
+        # Top-level imports are indented by a single space
+        if len(indent) == 1:
+            top_level[name] = int(cumulative_us) / 1000
+
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(sum(top_level.values()), 1),
+        "modules": modules,
+        "slowest": sorted(top_level.items(), key=lambda item: item[1], reverse=True),
+    }
+
+
+def forbidden_imports(modules: List[str]) -> List[str]:
+    return sorted({name for name in modules
+                   for forbidden in FORBIDDEN_MODULES
+                   if name == forbidden or name.startswith(forbidden + ".")})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # The first run also warms the bytecode cache, so the best run is the steady cold start
+    runs = [measure_import(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run["import_ms"])
+    forbidden = forbidden_imports(best["modules"])
+    over_budget = best["import_ms"] > args.budget_ms
+
+    report = {
+        "module": args.module,
+        "budget_ms": args.budget_ms,
+        "import_ms": best["import_ms"],
+        "interpreter_wall_ms": best["wall_ms"],
+        "modules_imported": len(best["modules"]),
+        "slowest_top_level_ms": dict((name, round(ms, 1)) for name, ms in best["slowest"][:args.top]),
+        "forbidden_imports": forbidden,
+        "passed": not forbidden and not over_budget,
+    }
+    print(json.dumps(report, indent=2))
+
+    if forbidden:
+        print(f"FAIL: {args.module} imports {', '.join(forbidden)}, which must be imported on first use",
+              file=sys.stderr)
+    if over_budget:
+        print(f"FAIL: importing {args.module} took {best['import_ms']} ms, over the {args.budget_ms} ms budget",
+              file=sys.stderr)
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
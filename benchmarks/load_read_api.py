@@ -0,0 +1,304 @@
+"""
+Load test of the read API (/articles and /articles/{article_id}) on synthetic data.
+
+Seeds an in-memory fake of the Supabase client with users and reports, each report
+written in all eight writing styles across the topics and leanings, and installs
+it under backend.db's instrumented client before the API is imported. The
+endpoints are driven in-process through httpx's ASGI transport, so the full
+middleware stack (metrics, tracing) and the threadpool for sync endpoints are
+exercised without a network or a database.
+
+For every endpoint and concurrency level it reports p50/p95/p99 latency,
+throughput, errors and peak traced memory as JSON with sorted keys, tagged with
+the git commit, so runs on different commits can be diffed or compared with
+--compare.
+
+Usage:
+    python -m benchmarks.load_read_api [--users 200] [--reports 300] [--concurrency 1 8 32 64]
+        [--requests 200] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Settings the API reads at import time; no service is contacted
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+os.environ.setdefault("NEXT_PUBLIC_API_KEY", "bench-api-key")
+
+import httpx  # noqa: E402
+
+TOPICS = ("politics", "economy", "technology", "health", "climate", "world", "science", "sports")
+LEANINGS = {"left": "liberal", "neutral": "neutral", "right": "conservative"}
+WRITING_STYLES = [list(style) for style in itertools.product(("short", "depth"), ("informal", "formal"),
+                                                              ("satirical", "straight"))]
+ENDPOINTS = ("/articles", "/articles/{article_id}")
+
+_EMBED_RE = re.compile(r"(\w+)(?:!inner)?\(([^)]*)\)")
+
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """The subset of the postgrest query builder used by the API, over in-memory rows."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._columns = "*"
+        self._filters: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._single = False
+        self._count = False
+        self._write: Optional[tuple] = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "FakeQuery":
+        self._columns = columns
+        self._count = count is not None
+        return self
+
+    def insert(self, row: Dict[str, Any]) -> "FakeQuery":
+        self._write = ("insert", row)
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "FakeQuery":
+        self._write = ("update", values)
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self._filters.append((column, value))
+        return self
+
+    def limit(self, n: int) -> "FakeQuery":
+        self._limit = n
+        return self
+
+    def single(self) -> "FakeQuery":
+        self._single = True
+        return self
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self._columns.strip() == "*":
+            return dict(row)
+        projected = {}
+        columns = _EMBED_RE.sub("", self._columns)
+        for name, embedded in _EMBED_RE.findall(self._columns):
+            # Embedded resources join on their singular foreign key, e.g. reports -> report_id
+            joined = self._db.by_id(name, row.get(f"{name.rstrip('s')}_id"))
+            projected[name] = {col.strip(): joined.get(col.strip()) for col in embedded.split(",")} if joined else None
+        for column in (c.strip() for c in columns.split(",")):
+            if column:
+                projected[column] = row.get(column)
+        return projected
+
+    def execute(self) -> FakeResponse:
+        rows = self._db.tables.setdefault(self._table, [])
+        if self._write and self._write[0] == "insert":
+            row = {"id": len(rows) + 1, **self._write[1]}
+            rows.append(row)
+            return FakeResponse([row])
+
+        matched = [row for row in rows if all(row.get(column) == value for column, value in self._filters)]
+        if self._write:
+            for row in matched:
+                row.update(self._write[1])
+            return FakeResponse(matched)
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        data = [self._project(row) for row in matched]
+        if self._single:
+            return FakeResponse(data[0] if data else None, 1 if data else 0)
+        return FakeResponse(data, len(data) if self._count else None)
+
+
+class FakeSupabase:
+    """In-memory stand-in for the Supabase client, seeded with synthetic users and articles."""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._index: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def by_id(self, table: str, row_id: Any) -> Optional[Dict[str, Any]]:
+        index = self._index.get(table)
+        if index is None or len(index) != len(self.tables.get(table, [])):
+            index = self._index[table] = {row["id"]: row for row in self.tables.get(table, [])}
+        return index.get(row_id)
+
+    def seed(self, num_users: int, num_reports: int, content_words: int, seed: int = 7) -> None:
+        rng = random.Random(seed)
+        words = "senate vote budget court ruling governor election tariff market inflation report".split()
+        started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        self.tables["users"] = [{
+            "id": i,
+            "email": f"user{i}@example.com",
+            "preferred_topics": rng.sample(TOPICS, 3),
+            "political_leaning": rng.choice(list(LEANINGS)),
+            "preferred_writing_style": rng.choice(WRITING_STYLES),
+        } for i in range(1, num_users + 1)]
+        self.tables["reports"] = [{
+            "id": i,
+            "created_at": (started + timedelta(hours=i)).isoformat(),
+            "topic_bias": rng.choice(list(LEANINGS)),
+        } for i in range(1, num_reports + 1)]
+        self.tables["articles_new"] = []
+        for report in self.tables["reports"]:
+            topics = rng.sample(TOPICS, 2)
+            bias = LEANINGS[report["topic_bias"]]
+            for style in WRITING_STYLES:
+                self.tables["articles_new"].append({
+                    "id": len(self.tables["articles_new"]) + 1,
+                    "report_id": report["id"],
+                    "title": f"Report {report['id']} ({','.join(style)})",
+                    "summary": " ".join(rng.choice(words) for _ in range(40)),
+                    "content": " ".join(rng.choice(words) for _ in range(content_words)),
+                    "relevant_topics": topics,
+                    "topic_bias": bias,
+                    "bias": bias,
+                    "opposite_view": " ".join(rng.choice(words) for _ in range(60)),
+                    "preferred_writing_style": style,
+                })
+        self.tables["global_metrics"] = [{"id": 1, "key": "total_page_views", "value": 0}]
+
+
+def load_app(db: FakeSupabase):
+    """Imports the API with the fake database behind backend.db's instrumented client."""
+    import backend.db
+
+    backend.db.supabase = backend.db.InstrumentedClient(db)
+    from backend.main import app
+    return app
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+
+async def drive(client: httpx.AsyncClient, endpoint: str, concurrency: int, num_requests: int,
+                db: FakeSupabase, rng: random.Random) -> Dict[str, Any]:
+    emails = [user["email"] for user in db.tables["users"]]
+    article_ids = [article["id"] for article in db.tables["articles_new"]]
+    headers = {"Authorization": f"Bearer {os.environ['NEXT_PUBLIC_API_KEY']}"}
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(num_requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            path = endpoint.format(article_id=rng.choice(article_ids))
+            started_at = time.perf_counter()
+            response = await client.get(path, headers={**headers, "user_email": rng.choice(emails)})
+            latencies.append(time.perf_counter() - started_at)
+            errors += response.status_code != 200
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall_seconds, 2),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "peak_traced_memory_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change of p95 latency and throughput per endpoint and concurrency level."""
+    changes = {}
+    for endpoint, levels in current["results"].items():
+        for level, result in levels.items():
+            before = baseline["results"].get(endpoint, {}).get(level)
+            if not before:
+                continue
+            changes[f"{endpoint} @ {level}"] = {
+                metric: f"{(result[metric] - before[metric]) / before[metric]:+.1%}"
+                for metric in ("p95_ms", "throughput_rps") if before.get(metric)
+            }
+    return {"baseline_commit": baseline.get("commit"), "commit": current.get("commit"), "changes": changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--reports", type=int, default=300)
+    parser.add_argument("--content-words", type=int, default=800)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--compare", help="A previous JSON report to compare against")
+    args = parser.parse_args()
+
+    db = FakeSupabase()
+    db.seed(args.users, args.reports, args.content_words)
+    app = load_app(db)
+    rng = random.Random(11)
+
+    async def run_all():
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for endpoint in ENDPOINTS:
+                # Warm-up
+                await drive(client, endpoint, 1, 5, db, rng)
+                results[endpoint] = {
+                    str(concurrency): await drive(client, endpoint, concurrency, args.requests, db, rng)
+                    for concurrency in args.concurrency
+                }
+        return results
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": asyncio.run(run_all()),
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            print(json.dumps(compare(json.load(f), report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
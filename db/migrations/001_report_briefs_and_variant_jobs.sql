@@ -0,0 +1,16 @@
+-- Brings a database created from an earlier schema.sql up to date; safe to run more than once.
+
+-- Distilled fact sheet the short writing-style variants are written from
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS brief TEXT;
+
+-- Claims on writing-style variants being written, so that only one worker writes each
+CREATE TABLE IF NOT EXISTS variant_jobs (
+    report_id INTEGER NOT NULL,
+    writing_style TEXT NOT NULL,
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (report_id, writing_style),
+    CONSTRAINT fk_report
+        FOREIGN KEY(report_id)
+        REFERENCES reports(id)
+        ON DELETE CASCADE
+);
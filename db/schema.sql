@@ -1,3 +1,5 @@
+-- Schema for a new database; existing databases are upgraded with the scripts in db/migrations, in order.
+
 CREATE TABLE users (
     id SERIAL PRIMARY KEY,
     email TEXT NOT NULL UNIQUE,
@@ -11,6 +13,7 @@ CREATE TABLE users (
 CREATE TABLE reports (
     id SERIAL PRIMARY KEY,
     content TEXT NOT NULL,
+    brief TEXT,
     topic_bias TEXT,
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
 );
@@ -31,3 +34,15 @@ CREATE TABLE articles_new (
         REFERENCES reports(id)
         ON DELETE CASCADE
 );
+
+-- Claims on writing-style variants being written, so that only one worker writes each
+CREATE TABLE variant_jobs (
+    report_id INTEGER NOT NULL,
+    writing_style TEXT NOT NULL,
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (report_id, writing_style),
+    CONSTRAINT fk_report
+        FOREIGN KEY(report_id)
+        REFERENCES reports(id)
+        ON DELETE CASCADE
+);
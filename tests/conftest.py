@@ -0,0 +1,6 @@
+import os
+
+# backend.db creates the Supabase client at import time; tests never reach it
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test.test.test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
@@ -0,0 +1,82 @@
+import asyncio
+
+from langchain_core.language_models import FakeListChatModel
+
+from backend.agent.cassette import Cassette, CassetteLLMCache
+
+RESPONSES = {"senate budget vote": {"query": "senate budget vote", "results": [{"url": "https://a.example/1"}]},
+             "storm damage report": {"query": "storm damage report", "results": [{"url": "https://b.example/2"}]}}
+
+
+def _record_searches(path):
+    cassette = Cassette(str(path), "record")
+    calls = []
+
+    async def run():
+        calls.append(list(RESPONSES))
+        return list(RESPONSES.values())
+
+    responses = asyncio.run(cassette.search("tavily", list(RESPONSES), {"max_results": 5}, run))
+    cassette.close()
+    assert responses == list(RESPONSES.values()) and len(calls) == 1
+
+
+def test_search_round_trip_replays_without_calling_the_api(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    _record_searches(path)
+    cassette = Cassette(str(path), "replay_fast")
+
+    async def live():
+        raise AssertionError("searched live")
+
+    replayed = asyncio.run(cassette.search("tavily", list(RESPONSES), {"max_results": 5}, live))
+
+    assert replayed == list(RESPONSES.values())
+
+
+def test_unrecorded_query_gets_the_nearest_call_to_the_same_api_only(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    _record_searches(path)
+    cassette = Cassette(str(path), "replay_fast")
+    live_calls = []
+
+    async def live():
+        live_calls.append(True)
+        return [{"query": "live", "results": []}]
+
+    # A different depth or query count changes the request; the closest recording is served
+    nearest = asyncio.run(cassette.search("tavily", ["storm damage"], {"max_results": 3}, live))
+    other_api = asyncio.run(cassette.search("exa", ["storm damage report"], {"max_results": 5}, live))
+
+    assert nearest[0]["results"] == RESPONSES["storm damage report"]["results"]
+    assert nearest[0]["query"] == "storm damage"
+    assert other_api == [{"query": "live", "results": []}]
+    assert live_calls == [True]
+
+
+def test_identical_requests_replay_in_recorded_order(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    recorder = Cassette(str(path), "record")
+    for answer in ("first", "second"):
+        recorder.record("tool", "search", "same-key", "same request", answer, 0.0)
+    recorder.close()
+
+    cassette = Cassette(str(path), "replay_fast")
+    served = [cassette.lookup("tool", "search", "same-key", "same request")["response"] for _ in range(3)]
+
+    assert served == ["first", "second", "second"]
+
+
+def test_llm_round_trip_through_the_cache(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    recorder = Cassette(str(path), "record")
+    recording_model = FakeListChatModel(responses=["Recorded answer"], cache=CassetteLLMCache(recorder))
+    assert recording_model.invoke("Summarize the budget vote").content == "Recorded answer"
+    recorder.close()
+
+    replaying_model = FakeListChatModel(responses=["Recorded answer"],
+                                        cache=CassetteLLMCache(Cassette(str(path), "replay_fast")))
+    message = asyncio.run(replaying_model.ainvoke("Summarize the budget vote"))
+
+    assert message.content == "Recorded answer"
+    assert replaying_model.i == 0  # Served from the cassette, not the model
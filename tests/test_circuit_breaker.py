@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from backend.agent import circuit_breaker, utils
+from backend.agent.circuit_breaker import CLOSED, CLOSED_TICKET, HALF_OPEN, OPEN, CircuitBreaker
+
+RESULTS = [{"query": "q", "results": [{"title": "t", "url": "https://a.example/1", "content": "c",
+                                       "score": 0.9, "raw_content": "body"}]}]
+
+
+@pytest.fixture
+def breakers(monkeypatch):
+    registry = {}
+    monkeypatch.setattr(circuit_breaker, "_breakers", registry)
+    return registry
+
+
+def _open_breaker(name: str, open_seconds: float) -> CircuitBreaker:
+    breaker = CircuitBreaker(name, min_calls=2, open_seconds=open_seconds)
+    for _ in range(2):
+        breaker.record_failure(breaker.allow_request())
+    assert breaker.times_opened == 1
+    return breaker
+
+
+def test_breaker_opens_probes_once_and_closes_on_success():
+    breaker = _open_breaker("tavily", open_seconds=60)
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is None
+
+    breaker.open_seconds = 0
+    assert breaker.state == HALF_OPEN
+    probe = breaker.allow_request()
+    assert probe not in (None, CLOSED_TICKET)
+    assert breaker.allow_request() is None  # One probe at a time
+
+    breaker.record_success(CLOSED_TICKET, 0.1)  # A call admitted before opening does not decide
+    assert breaker.allow_request() is None
+    breaker.record_success(probe, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() == CLOSED_TICKET
+
+
+def test_formatting_failure_settles_half_open_probe(breakers, monkeypatch):
+    tavily = breakers["tavily"] = _open_breaker("tavily", open_seconds=0)
+    calls = []
+
+    async def fake_execute_search(api, query_list, params, policy):
+        calls.append(api)
+        return RESULTS
+
+    def fake_format(api, search_results):
+        if api == "tavily":
+            raise KeyError("title")
+        return f"formatted by {api}"
+
+    monkeypatch.setattr(utils, "execute_search", fake_execute_search)
+    monkeypatch.setattr(utils, "format_search_response", fake_format)
+
+    result = asyncio.run(utils.select_and_execute_search("tavily", ["q"], {}, fallback_search_apis=["exa"]))
+
+    assert result == "formatted by exa"
+    assert calls == ["tavily", "exa"]
+    # The probe counted as a failure and reopened the breaker instead of staying in flight
+    assert tavily.times_opened == 2
+    assert tavily.allow_request() is not None
+
+
+def test_fallback_uses_configured_raw_content_policy(breakers, monkeypatch):
+    policies = {}
+
+    async def fake_execute_search(api, query_list, params, policy):
+        policies[api] = policy
+        if api == "tavily":
+            raise TimeoutError("slow")
+        return RESULTS
+
+    monkeypatch.setattr(utils, "execute_search", fake_execute_search)
+
+    asyncio.run(utils.select_and_execute_search(
+        "tavily", ["q"], {}, fallback_search_apis=["googlesearch"],
+        raw_content_policies={"googlesearch": {"mode": "lazy", "top_k": 2}}))
+
+    assert policies["googlesearch"]["mode"] == "lazy"
+    assert policies["googlesearch"]["top_k"] == 2
@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.agent import clients
+
+
+def test_tavily_client_requires_api_key(monkeypatch):
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+
+    with pytest.raises(ValueError, match="TAVILY_API_KEY"):
+        clients.get_tavily_client()
+
+
+def test_tavily_auth_reads_the_current_key_per_request(monkeypatch):
+    sent = []
+
+    def handler(request):
+        sent.append(request.headers["Authorization"])
+        return httpx.Response(200, json={})
+
+    async def run():
+        async with httpx.AsyncClient(base_url=clients.TAVILY_API_URL, auth=clients._tavily_auth,
+                                     transport=httpx.MockTransport(handler)) as client:
+            for key in ("first-key", "rotated-key"):
+                monkeypatch.setenv("TAVILY_API_KEY", key)
+                await client.post("/search", json={})
+
+    asyncio.run(run())
+
+    assert sent == ["Bearer first-key", "Bearer rotated-key"]
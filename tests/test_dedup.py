@@ -0,0 +1,58 @@
+import random
+
+from backend.agent.dedup import collapse_near_duplicates
+
+WORDS = ("senate vote budget court ruling governor election tariff market inflation report city "
+         "council school water energy housing police health climate trade").split()
+
+
+def _paragraphs(seed: int, count: int, words: int = 40) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+# Navigation and footer text repeated on every page of the outlet; the header alone
+# is longer than the signed prefix
+TEMPLATE = _paragraphs(0, 90)
+
+
+def _page(url: str, body: list, score: float = 0.5) -> dict:
+    text = "\n".join(TEMPLATE[:80] + body + TEMPLATE[80:])
+    return {"title": url, "url": url, "content": "", "raw_content": text, "score": score}
+
+
+def test_different_articles_from_same_outlet_are_kept():
+    sources = [
+        _page("https://www.outlet.example/politics/budget-vote", _paragraphs(1, 6), 0.9),
+        _page("https://outlet.example/world/trade-talks", _paragraphs(2, 6), 0.8),
+    ]
+
+    collapsed = collapse_near_duplicates(sources)
+
+    assert [source["url"] for source in collapsed] == [source["url"] for source in sources]
+
+
+def test_same_article_from_same_outlet_is_collapsed():
+    body = _paragraphs(3, 6)
+    sources = [
+        _page("https://outlet.example/politics/budget-vote", body, 0.9),
+        _page("https://outlet.example/politics/budget-vote-live", body, 0.8),
+    ]
+
+    collapsed = collapse_near_duplicates(sources)
+
+    assert len(collapsed) == 1
+    assert collapsed[0]["duplicate_urls"] == ["https://outlet.example/politics/budget-vote-live"]
+
+
+def test_syndicated_copies_across_outlets_are_collapsed():
+    text = "\n".join(_paragraphs(4, 8))
+    sources = [
+        {"title": "a", "url": "https://a.example/story", "content": "", "raw_content": text, "score": 0.7},
+        {"title": "b", "url": "https://b.example/wire/story", "content": "", "raw_content": text, "score": 0.9},
+    ]
+
+    collapsed = collapse_near_duplicates(sources)
+
+    assert [source["url"] for source in collapsed] == ["https://b.example/wire/story"]
+    assert collapsed[0]["duplicate_urls"] == ["https://a.example/story"]
@@ -0,0 +1,59 @@
+import pytest
+
+from backend.agent import grading
+from backend.agent.grading import pop_grading_stats, record_graded, record_skipped, should_grade
+
+SOURCES = "URL: https://a.example/1\nURL: https://b.example/2"
+BODY = " ".join(["word"] * grading.HEURISTIC_MIN_WORDS)
+GOOD_DRAFT = f"{BODY}\n\n### Sources\n- https://a.example/1\n- https://b.example/2."
+
+
+def test_always_and_never_ignore_budget_and_content():
+    assert should_grade("always", "", "", 5, 2) == (True, None)
+    assert should_grade("never", GOOD_DRAFT, SOURCES, 0, 2) == (False, "policy")
+
+
+def test_budget_aware_skips_only_when_searches_are_spent():
+    assert should_grade("budget_aware", GOOD_DRAFT, SOURCES, 1, 2) == (True, None)
+    assert should_grade("budget_aware", GOOD_DRAFT, SOURCES, 2, 2) == (False, "budget_exhausted")
+
+
+def test_heuristic_first_publishes_drafts_citing_enough_known_sources():
+    assert should_grade("heuristic_first", GOOD_DRAFT, SOURCES, 0, 2) == (False, "heuristic_pass")
+
+    short = GOOD_DRAFT.replace(BODY, "too short")
+    invented = GOOD_DRAFT.replace("https://b.example/2", "https://c.example/3")
+    no_sources = BODY
+    for draft in (short, invented, no_sources):
+        assert should_grade("heuristic_first", draft, SOURCES, 0, 2) == (True, None)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown grading policy"):
+        should_grade("sometimes", "", "", 0, 2)
+
+
+def test_graded_and_skipped_calls_are_accounted_per_run(monkeypatch):
+    monkeypatch.setattr(grading, "_grader_calls", 0)
+    monkeypatch.setattr(grading, "_grader_seconds", 0.0)
+
+    record_graded("run-1", 4.0)
+    record_graded("run-1", 2.0)
+    record_graded("run-2", 6.0)
+    record_skipped("run-1", "budget_exhausted")
+    record_skipped("run-1", "budget_exhausted")
+    record_skipped("run-1", "heuristic_pass")
+    record_skipped(None, "policy")  # Outside a report run: not counted
+
+    stats = pop_grading_stats("run-1")
+
+    assert stats == {
+        "graded": 2,
+        "grader_seconds": 6.0,
+        "skipped": 3,
+        "skipped_by_reason": {"budget_exhausted": 2, "heuristic_pass": 1},
+        # Three skips at the process-wide mean of 4s per grader call
+        "estimated_seconds_saved": 12.0,
+    }
+    assert pop_grading_stats("run-1")["graded"] == 0  # Forgotten once popped
+    pop_grading_stats("run-2")
@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+import pytest
+
+from backend.agent import page_cache
+from backend.agent.fetch import FetchResult
+from backend.agent.page_cache import PageCache, canonicalize_url
+
+URL = "https://News.Example.com:443/story?utm_source=feed&b=2&a=1#comments"
+
+
+def test_canonicalize_url_drops_tracking_defaults_and_fragments():
+    assert canonicalize_url(URL) == "https://news.example.com/story?a=1&b=2"
+    assert canonicalize_url("HTTP://example.com:8080?fbclid=x") == "http://example.com:8080/"
+    assert canonicalize_url("https://example.com/a?q=") == "https://example.com/a?q="
+
+
+def test_put_tracks_size_and_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path), max_bytes=25)
+    cache.put("https://a.example/", "text", "a" * 10)
+    cache.put("https://b.example/", "text", "b" * 10)
+    cache.get("https://a.example/", "text")
+    cache.put("https://c.example/", "text", "c" * 10)
+
+    assert cache.get("https://b.example/", "text") is None
+    assert cache.get("https://a.example/", "text").text == "a" * 10
+    assert cache._total_bytes == 20
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_cache_refuses_directory_writable_by_others(tmp_path):
+    tmp_path.chmod(0o777)
+
+    with pytest.raises(PermissionError):
+        PageCache(str(tmp_path))
+
+
+class FakeScheduler:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def fetch(self, url, headers=None, timeout=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def _fetch(monkeypatch, cache, scheduler):
+    extracted = []
+
+    async def extract_text(html):
+        extracted.append(html)
+        return f"text of {html}"
+
+    monkeypatch.setattr(page_cache, "get_page_cache", lambda: cache)
+    monkeypatch.setattr(page_cache, "get_fetch_scheduler", lambda: scheduler)
+    monkeypatch.setattr(page_cache, "extract_text", extract_text)
+    pages = asyncio.run(page_cache.fetch_and_extract([URL], "text"))
+    return pages[0], extracted
+
+
+def test_stale_page_is_revalidated_and_304_serves_cached_text(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path), max_age=0)
+    ok = FetchResult(url=URL, status_code=200, content_type="text/html", text="<p>v1</p>",
+                     headers={"etag": '"v1"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    scheduler = FakeScheduler([ok, FetchResult(url=URL, status_code=304)])
+
+    first, extracted = _fetch(monkeypatch, cache, scheduler)
+    assert first.text == "text of <p>v1</p>" and not first.from_cache
+
+    second, extracted = _fetch(monkeypatch, cache, scheduler)
+    assert second.text == "text of <p>v1</p>" and second.from_cache
+    assert extracted == []  # Not parsed again
+    assert scheduler.requests[1] == {"If-None-Match": '"v1"',
+                                     "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+
+def test_fresh_page_is_served_without_a_request(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path), max_age=3600)
+    cache.put(canonicalize_url(URL), "text", "cached text")
+    scheduler = FakeScheduler([])
+
+    page, _ = _fetch(monkeypatch, cache, scheduler)
+
+    assert page.text == "cached text" and page.from_cache
+    assert scheduler.requests == []
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import httpx
+
+from backend.agent import utils
+
+
+def _answer(query):
+    return {"choices": [{"message": {"content": f"Answer to {query}"}}],
+            "citations": ["https://a.example/1", "https://b.example/2"]}
+
+
+def _search(monkeypatch, handler, queries, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setattr(utils, "get_http_client", lambda name="default", **options: client)
+            return await utils.perplexity_search(queries, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_queries_run_concurrently_up_to_the_limit(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        query = json.loads(request.content)["messages"][-1]["content"]
+        return httpx.Response(200, json=_answer(query))
+
+    queries = [f"query {i}" for i in range(5)]
+    responses = _search(monkeypatch, handler, queries, max_concurrency=2)
+
+    assert peak == 2
+    assert [response["query"] for response in responses] == queries
+    assert responses[0]["results"][0]["raw_content"] == "Answer to query 0"
+    assert responses[0]["results"][1]["raw_content"] is None
+
+
+def test_rate_limited_request_is_retried_after_retry_after(monkeypatch):
+    statuses = []
+
+    def handler(request):
+        status = 429 if not statuses else 200
+        statuses.append(status)
+        if status == 429:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=_answer("q"))
+
+    responses = _search(monkeypatch, handler, ["q"])
+
+    assert statuses == [429, 200]
+    assert responses[0]["results"][0]["content"] == "Answer to q"
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import urllib.error
+
+import pytest
+from langchain_community.utilities.pubmed import PubMedAPIWrapper
+
+from backend.agent import utils
+from backend.agent.rate_limit import AsyncTokenBucket
+
+
+def test_bucket_spends_burst_then_paces_in_arrival_order():
+    bucket = AsyncTokenBucket(rate=50.0, capacity=2.0)
+
+    async def run():
+        return await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+
+    waits = asyncio.run(run())
+
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.015 <= waits[2] < waits[3] <= 0.06
+
+
+def test_back_off_requeues_waiting_callers_behind_the_pause():
+    bucket = AsyncTokenBucket(rate=100.0, capacity=1.0)
+
+    async def run():
+        await bucket.acquire()
+        waiting = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)  # Let it take its 10ms reservation
+        bucket.back_off(0.1)
+        return await waiting
+
+    start = time.monotonic()
+    waited = asyncio.run(run())
+
+    # Paused for 0.1s, then queued for a token refilled after the pause
+    assert waited >= 0.1
+    assert time.monotonic() - start >= 0.11
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = []
+        self.back_offs = []
+
+    async def acquire(self, tokens=1.0):
+        self.acquired.append(tokens)
+        return 0.0
+
+    def back_off(self, seconds):
+        self.back_offs.append(seconds)
+
+
+def _article(uid):
+    return {"uid": uid, "Title": f"Article {uid}", "Published": "2024-01-01",
+            "Copyright Information": "", "Summary": "Abstract"}
+
+
+def _too_many_requests():
+    return urllib.error.HTTPError("https://eutils.example", 429, "Too Many Requests", {}, None)
+
+
+def _run_pubmed(monkeypatch, lazy_load, top_k_results=3):
+    pytest.importorskip("xmltodict")  # Checked when PubMedAPIWrapper is created
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(utils, "get_rate_limiter", lambda *args, **kwargs: limiter)
+    monkeypatch.setattr(PubMedAPIWrapper, "lazy_load", lazy_load)
+    responses = asyncio.run(utils.pubmed_search_async(["query"], top_k_results=top_k_results))
+    return limiter, responses[0]
+
+
+def test_pubmed_takes_a_token_per_request(monkeypatch):
+    steps = []
+
+    def lazy_load(self, query):
+        assert self.max_retry == 0  # 429s must reach the limiter instead of sleeping in the wrapper
+        for uid in ("1", "2", "3"):
+            steps.append(uid)
+            yield _article(uid)
+
+    limiter, response = _run_pubmed(monkeypatch, lazy_load)
+
+    # esearch and the first efetch, then one efetch per article
+    assert limiter.acquired == [2, 1, 1]
+    assert [result["url"] for result in response["results"]] == [
+        f"https://pubmed.ncbi.nlm.nih.gov/{uid}/" for uid in ("1", "2", "3")]
+
+
+def test_pubmed_429_backs_off_and_keeps_fetched_articles(monkeypatch):
+    def lazy_load(self, query):
+        yield _article("1")
+        raise _too_many_requests()
+
+    limiter, response = _run_pubmed(monkeypatch, lazy_load)
+
+    assert limiter.back_offs == [5.0]
+    assert [result["title"] for result in response["results"]] == ["Article 1"]
+
+
+def test_pubmed_429_on_search_reports_error(monkeypatch):
+    def lazy_load(self, query):
+        raise _too_many_requests()
+        yield
+
+    limiter, response = _run_pubmed(monkeypatch, lazy_load)
+
+    assert limiter.back_offs == [5.0]
+    assert response["results"] == []
+    assert "429" in response["error"]
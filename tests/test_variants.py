@@ -0,0 +1,148 @@
+import concurrent.futures
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from postgrest.exceptions import APIError
+
+from backend.agent import variants
+from backend.agent.variants import closest_variant, normalize_writing_style
+
+
+class FakeQuery:
+    """Just enough of the postgrest query builder for the variant_jobs claims."""
+
+    def __init__(self, table, operation, values=None):
+        self._table = table
+        self._operation = operation
+        self._values = values
+        self._filters = []
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row[column] == value)
+        return self
+
+    def lt(self, column, value):
+        self._filters.append(lambda row: row[column] < value)
+        return self
+
+    def execute(self):
+        rows = self._table.rows
+        if self._operation == "insert":
+            key = (self._values["report_id"], self._values["writing_style"])
+            if any((row["report_id"], row["writing_style"]) == key for row in rows):
+                raise APIError({"code": variants.UNIQUE_VIOLATION, "message": "duplicate key"})
+            rows.append({"claimed_at": datetime.now(timezone.utc).isoformat(), **self._values})
+            return SimpleNamespace(data=[rows[-1]])
+        matched = [row for row in rows if all(match(row) for match in self._filters)]
+        if self._operation == "update":
+            for row in matched:
+                row.update(self._values)
+        elif self._operation == "delete":
+            self._table.rows = [row for row in rows if row not in matched]
+        return SimpleNamespace(data=matched)
+
+
+class FakeTable:
+    def __init__(self):
+        self.rows = []
+
+    def insert(self, values):
+        return FakeQuery(self, "insert", values)
+
+    def update(self, values):
+        return FakeQuery(self, "update", values)
+
+    def delete(self):
+        return FakeQuery(self, "delete")
+
+
+@pytest.fixture
+def variant_jobs(monkeypatch):
+    table = FakeTable()
+    monkeypatch.setattr(variants, "supabase", SimpleNamespace(table=lambda name: table))
+    return table
+
+
+def test_normalize_writing_style_orders_axes_and_rejects_partial_styles():
+    assert normalize_writing_style(["straight", "short", "formal"]) == ["short", "formal", "straight"]
+    assert normalize_writing_style(["short", "depth", "formal", "straight"]) is None
+    assert normalize_writing_style(["short", "formal"]) is None
+    assert normalize_writing_style(None) is None
+
+
+def test_closest_variant_shares_most_options_and_keeps_first_on_ties():
+    stored = [
+        {"id": 1, "preferred_writing_style": ["depth", "formal", "straight"]},
+        {"id": 2, "preferred_writing_style": ["short", "informal", "straight"]},
+        {"id": 3, "preferred_writing_style": ["short", "formal", "satirical"]},
+    ]
+
+    assert closest_variant(stored, ["short", "informal", "satirical"])["id"] == 2
+    assert closest_variant(stored, ["depth", "informal", "satirical"])["id"] == 1
+
+
+def test_only_one_worker_claims_a_variant(variant_jobs):
+    style = ["short", "formal", "straight"]
+
+    assert variants._claim_variant(1, style) is True
+    assert variants._claim_variant(1, style) is False
+    assert variants._claim_variant(1, ["short", "formal", "satirical"]) is True
+
+    variants._release_claim(1, style)
+    assert variants._claim_variant(1, style) is True
+
+
+def test_stale_claim_is_taken_over_once(variant_jobs):
+    style = ["short", "formal", "straight"]
+    assert variants._claim_variant(1, style)
+    stale = datetime.now(timezone.utc) - timedelta(seconds=variants.VARIANT_CLAIM_TTL + 60)
+    variant_jobs.rows[0]["claimed_at"] = stale.isoformat()
+
+    assert variants._claim_variant(1, style) is True
+    assert variants._claim_variant(1, style) is False
+
+
+def test_concurrent_requests_share_one_generation(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def generate(report_id, writing_style):
+        calls.append((report_id, writing_style))
+        release.wait(5)
+        return {"id": 7}
+
+    monkeypatch.setattr(variants, "_generate_variant", generate)
+    style = ["short", "formal", "straight"]
+
+    first = variants.request_variant(99, style)
+    second = variants.request_variant(99, style)
+    release.set()
+
+    assert first is second
+    assert first.result(5) == {"id": 7}
+    assert calls == [(99, style)]
+
+
+def test_backfill_submits_without_waiting_for_generation(monkeypatch):
+    submitted = []
+    pending = concurrent.futures.Future()  # Never finishes during the test
+
+    def request_variant(report_id, writing_style):
+        submitted.append(report_id)
+        return pending
+
+    monkeypatch.setattr(variants, "request_variant", request_variant)
+    monkeypatch.setattr(variants, "VARIANT_BACKFILL_PER_MINUTE", 60000)
+    monkeypatch.setattr(variants, "_backfill_queue", variants.queue.Queue())
+    for report_id in (1, 2, 3):
+        variants._backfill_queue.put((report_id, ("short", "formal", "straight")))
+
+    threading.Thread(target=variants._backfill_worker, daemon=True).start()
+    deadline = time.monotonic() + 2
+    while len(submitted) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert submitted == [1, 2, 3]